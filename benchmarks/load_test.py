@@ -0,0 +1,337 @@
+"""Concurrent-session load test for the Streamlit app.
+
+Each load level runs in a fresh interpreter. It drives N simulated
+participants through Streamlit's AppTest at the same time, one thread per
+session, against local storage in a temporary directory and a stubbed
+scraper (synthetic biomarkers behind the real browser scheduler, so the
+BIOSNAP_MAX_BROWSERS limit still applies). Imports go through the scrape
+job client's in-process stand-in, so the app side of the job round trip is
+measured but no worker is needed. Every session:
+
+* logs in (the authenticator's session state is seeded; bcrypt and the
+  cookie component are not what is being sized) and renders the app,
+* switches tabs: Streamlit renders all tabs on every run and switching is
+  client-side, so this is modelled as idle reruns,
+* imports Function Health data through the real form and upload queue,
+* uploads a Prenuvo PDF: AppTest cannot drive ``st.file_uploader``, so the
+  real redaction engine runs on a generated PDF and the review page is
+  rendered from its output, then the redaction is approved.
+
+Reported per level: rerun latency percentiles (overall and per action),
+reruns per second, RSS per session, session-state payload per session, the
+session data store's resident/spilled bytes and errors. The throughput limit is the largest level whose p95 rerun latency
+stays under ``--target-p95`` without errors.
+
+Usage:
+    python benchmarks/load_test.py [--sessions 1,5,10,20] [--target-p95 1.0]
+        [--scrape-seconds 2] [--think 0.5] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "streamlit_app.py")
+
+sys.path.insert(0, ROOT)
+from benchmarks.startup_profile import STUB_CONFIG  # noqa: E402
+
+BIOMARKER_ROWS = 120
+PDF_PAGES = 6
+
+
+# === Fixtures ===
+def synthetic_biomarkers(rows=BIOMARKER_ROWS):
+    import pandas as pd
+    statuses = ["In Range", "Out of Range", "Above Range", "Below Range"]
+    return pd.DataFrame({
+        "category": [f"Category {i // 12}" for i in range(rows)],
+        "name": [f"Biomarker {i}" for i in range(rows)],
+        "status": [statuses[i % len(statuses)] for i in range(rows)],
+        "value": [f"{(i * 7) % 200 + 0.5}" for i in range(rows)],
+        "units": ["mg/dL" if i % 2 else "ng/mL" for i in range(rows)],
+    })
+
+
+def synthetic_prenuvo_pdf(path, pages=PDF_PAGES):
+    import fitz
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        lines = [
+            "Patient: Jane Example Doe",
+            "Date of Birth: 1980-01-01",
+            "Sex: Female",
+            "Facility: Example Imaging Center",
+            f"Findings page {number + 1}: no acute abnormality.",
+        ] + [f"Observation {number}.{i}: unremarkable." for i in range(30)]
+        page.insert_text((50, 60), "\n".join(lines), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def install_stub_scraper(scrape_seconds):
+    """Replace biosnap.scraper so imports take ``scrape_seconds`` without a browser."""
+    import types
+
+    from biosnap.scheduler import get_scheduler
+
+    def scrape_function_health(user_email, user_pass, progress=None):
+        with get_scheduler().slot():
+            if progress:
+                progress.stage("extract", "Importing biomarkers...", 30, 80, total=BIOMARKER_ROWS)
+            for _ in range(BIOMARKER_ROWS):
+                time.sleep(scrape_seconds / BIOMARKER_ROWS)
+                if progress:
+                    progress.advance()
+        return synthetic_biomarkers()
+
+    module = types.ModuleType("biosnap.scraper")
+    module.scrape_function_health = scrape_function_health
+    sys.modules["biosnap.scraper"] = module
+
+
+# === Measurement helpers ===
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def session_payload_bytes(session_state):
+    from biosnap.session_data import payload
+
+    if hasattr(session_state, "filtered_state"):
+        values = session_state.filtered_state.values()
+    else:
+        values = (session_state[key] for key in session_state)
+    total = 0
+    for value in map(payload, values):
+        if isinstance(value, (bytes, bytearray)):
+            total += len(value)
+        elif hasattr(value, "memory_usage"):
+            total += int(value.memory_usage(deep=True).sum())
+    return total
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+# === One simulated participant ===
+class Session:
+    def __init__(self, index, pdf_path, think, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.username = f"load{index:03d}"
+        self.pdf_path = pdf_path
+        self.think = think
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.samples = []  # (action, seconds)
+        self.errors = []
+
+    def _run(self, action, step):
+        start = time.perf_counter()
+        step()
+        self.samples.append((action, time.perf_counter() - start))
+        for exc in self.app.exception:
+            self.errors.append(f"{action}: {exc.value}")
+        if self.think:
+            time.sleep(random.uniform(0, self.think))
+
+    def _button(self, label=None, key=None):
+        for button in self.app.button:
+            if (key and button.key == key) or (label and button.label == label):
+                return button
+        raise LookupError(f"button {key or label!r} not rendered")
+
+    def login(self):
+        state = self.app.session_state
+        state["authentication_status"] = True
+        state["username"] = self.username
+        state["name"] = self.username
+        self._run("login", self.app.run)
+
+    def switch_tabs(self, count=4):
+        for _ in range(count):
+            self._run("tab_switch", self.app.run)
+
+    def import_function_health(self):
+        self.app.text_input(key="function_email").input(f"{self.username}@example.com")
+        self.app.text_input(key="function_password").input("not-a-real-password")
+        self._run("import_submit", self._button(label="Connect & Import Data").click().run)
+        # The submit handler reruns itself until the data view renders
+        self._run("import_view", self.app.run)
+
+    def upload_pdf(self):
+        from biosnap.redaction import redact_prenuvo_pdf
+
+        output_path = f"{self.pdf_path}.{self.username}.redacted.pdf"
+        start = time.perf_counter()
+        report = redact_prenuvo_pdf(self.pdf_path, output_path)
+        self.samples.append(("pdf_redaction", time.perf_counter() - start))
+        with open(output_path, "rb") as f:
+            self.app.session_state["redacted_pdf_for_review"] = f.read()
+        self.app.session_state["redaction_report"] = report
+        os.remove(output_path)
+
+        self._run("pdf_review", self.app.run)
+        self._run("pdf_approve", self._button(key="approve_redaction").click().run)
+
+    def scenario(self):
+        try:
+            self.login()
+            self.switch_tabs()
+            self.import_function_health()
+            self.switch_tabs(2)
+            self.upload_pdf()
+            self.switch_tabs(2)
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+
+def run_level(sessions, scrape_seconds, think, timeout):
+    """Worker body: runs in its own interpreter, prints one JSON line."""
+    workdir = tempfile.mkdtemp(prefix="biosnap_load_")
+    os.environ.update({
+        "BIOSNAP_STORAGE": "local",
+        "BIOSNAP_STORAGE_DIR": os.path.join(workdir, "storage"),
+        "BIOSNAP_UPLOAD_JOURNAL": os.path.join(workdir, "journal"),
+        "BIOSNAP_CACHE_PATH": os.path.join(workdir, "cache.sqlite"),
+    })
+    os.environ.pop("BIOSNAP_BACKEND_URL", None)
+    os.chdir(workdir)
+    with open("config.yaml", "w") as f:
+        f.write(STUB_CONFIG)
+    pdf_path = os.path.join(workdir, "prenuvo.pdf")
+    synthetic_prenuvo_pdf(pdf_path)
+    install_stub_scraper(scrape_seconds)
+
+    # Warm imports and caches with one throwaway session so the baseline
+    # RSS covers the process, not the first participant.
+    Session(-1, pdf_path, 0, timeout).login()
+    baseline = rss_mb()
+
+    participants = [Session(i, pdf_path, think, timeout) for i in range(sessions)]
+    threads = [threading.Thread(target=p.scenario, name=p.username) for p in participants]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    from biosnap.session_data import usage as session_usage
+    from biosnap.uploads import get_upload_queue
+    drained = get_upload_queue().drain(timeout=60)
+    loaded = rss_mb()
+
+    reruns = [seconds for p in participants for action, seconds in p.samples if action != "pdf_redaction"]
+    by_action = {}
+    for p in participants:
+        for action, seconds in p.samples:
+            by_action.setdefault(action, []).append(seconds)
+
+    return {
+        "sessions": sessions,
+        "seconds": round(elapsed, 3),
+        "reruns": len(reruns),
+        "reruns_per_second": round(len(reruns) / elapsed, 2) if elapsed else None,
+        "p50_seconds": percentile(reruns, 0.50),
+        "p95_seconds": percentile(reruns, 0.95),
+        "p99_seconds": percentile(reruns, 0.99),
+        "max_seconds": max(reruns) if reruns else None,
+        "actions": {
+            action: {"count": len(s), "p50_seconds": percentile(s, 0.50), "p95_seconds": percentile(s, 0.95)}
+            for action, s in sorted(by_action.items())
+        },
+        "rss_baseline_mb": round(baseline, 1),
+        "rss_loaded_mb": round(loaded, 1),
+        "rss_per_session_mb": round((loaded - baseline) / sessions, 2) if sessions else None,
+        "session_state_kb": round(statistics.median(
+            session_payload_bytes(p.app.session_state) for p in participants
+        ) / 1024, 1) if participants else None,
+        "session_data": {k: v for k, v in session_usage().items() if k != "sessions"},
+        "uploads_drained": drained,
+        "errors": [e for p in participants for e in p.errors][:20],
+    }
+
+
+# === Driver ===
+def measure_level(sessions, args):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", str(sessions),
+         "--scrape-seconds", str(args.scrape_seconds), "--think", str(args.think),
+         "--timeout", str(args.timeout)],
+        capture_output=True, text=True, cwd=ROOT
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {"sessions": sessions, "error": lines[-1] if lines else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def throughput_limit(levels, target_p95):
+    ok = [lvl for lvl in levels
+          if "error" not in lvl and not lvl["errors"] and lvl["p95_seconds"] is not None
+          and lvl["p95_seconds"] <= target_p95]
+    return max((lvl["sessions"] for lvl in ok), default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", default="1,5,10,20", help="comma-separated concurrent session counts")
+    parser.add_argument("--target-p95", type=float, default=1.0, help="rerun latency budget in seconds")
+    parser.add_argument("--scrape-seconds", type=float, default=2.0, help="duration of a stubbed scrape")
+    parser.add_argument("--think", type=float, default=0.5, help="max random pause between actions")
+    parser.add_argument("--timeout", type=float, default=120, help="AppTest per-run timeout")
+    parser.add_argument("--json", action="store_true", help="print a single JSON document")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_level(args.worker, args.scrape_seconds, args.think, args.timeout)))
+        return
+
+    levels = [measure_level(int(n), args) for n in args.sessions.split(",") if n.strip()]
+    report = {
+        "target_p95_seconds": args.target_p95,
+        "levels": levels,
+        "max_sessions_within_target": throughput_limit(levels, args.target_p95),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'sessions':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'MB/session':>11} {'state KB':>9}  errors")
+    for lvl in levels:
+        if "error" in lvl:
+            print(f"{lvl['sessions']:>8}  error: {lvl['error']}")
+            continue
+        print(f"{lvl['sessions']:>8} {lvl['reruns_per_second']:>9} {lvl['p50_seconds'] * 1000:>8.0f} "
+              f"{lvl['p95_seconds'] * 1000:>8.0f} {lvl['p99_seconds'] * 1000:>8.0f} "
+              f"{lvl['rss_per_session_mb']:>11} {lvl['session_state_kb']:>9}  {len(lvl['errors'])}")
+        for error in lvl["errors"][:3]:
+            print(f"{'':>10}{error}")
+
+    limit = report["max_sessions_within_target"]
+    print(f"\nLargest level with p95 <= {args.target_p95:.2f}s and no errors: {limit if limit else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Cold-start profile for the Streamlit app.
+
+Reports, each measured in a fresh interpreter:
+
+* import time and peak RSS of every heavy dependency on its own,
+* import time of the app's module-level imports (what every rerun pays for),
+* first-render latency of the login page through Streamlit's AppTest, plus
+  which heavy dependencies that render actually loaded.
+
+Usage:
+    python benchmarks/startup_profile.py [--runs 5] [--json]
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "streamlit_app.py")
+
+HEAVY_MODULES = [
+    "selenium.webdriver",
+    "webdriver_manager.chrome",
+    "fitz",
+    "supabase",
+    "streamlit_authenticator",
+    "pandas",
+]
+
+IMPORT_SNIPPET = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+RENDER_SNIPPET = """
+import json, os, resource, sys, time
+sys.path.insert(0, {root!r})
+os.chdir({workdir!r})
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter() - start
+at = AppTest.from_file({app!r}, default_timeout=120)
+start = time.perf_counter()
+at.run()
+rendered = time.perf_counter() - start
+print(json.dumps({{
+    "streamlit_import_seconds": imported,
+    "first_render_seconds": rendered,
+    "exceptions": [str(e.value) for e in at.exception],
+    "heavy_loaded": [m for m in {heavy!r} if m in sys.modules],
+    "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+STUB_CONFIG = """\
+credentials:
+  usernames:
+    bench:
+      email: bench@example.com
+      name: Bench User
+      password: $2b$12$KIXQJ1y8QO2lQb6O9u0iUe3lH1cO4g3b8p0h4x7Q9yGk1Jm2Zr1aW
+cookie:
+  name: biosnap_bench
+  key: biosnap_bench_key
+  expiry_days: 1
+"""
+
+
+def app_top_level_imports(path=APP_PATH):
+    """Modules imported at module level of the app, i.e. on every rerun."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def _run_snippet(snippet, args=()):
+    proc = subprocess.run(
+        [sys.executable, "-c", snippet, *args],
+        capture_output=True, text=True, cwd=ROOT
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure_imports(modules, runs):
+    samples = [_run_snippet(IMPORT_SNIPPET.format(root=ROOT), modules) for _ in range(runs)]
+    errors = [s["error"] for s in samples if "error" in s]
+    if errors:
+        return {"error": errors[0]}
+    return {
+        "median_seconds": statistics.median(s["seconds"] for s in samples),
+        "maxrss_mb": max(s["maxrss_mb"] for s in samples),
+    }
+
+
+def measure_first_render(runs):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "config.yaml"), "w") as f:
+            f.write(STUB_CONFIG)
+        snippet = RENDER_SNIPPET.format(root=ROOT, workdir=workdir, app=APP_PATH, heavy=HEAVY_MODULES)
+        for _ in range(runs):
+            results.append(_run_snippet(snippet))
+
+    errors = [r["error"] for r in results if "error" in r]
+    if errors:
+        return {"error": errors[0]}
+    return {
+        "median_first_render_seconds": statistics.median(r["first_render_seconds"] for r in results),
+        "median_streamlit_import_seconds": statistics.median(r["streamlit_import_seconds"] for r in results),
+        "maxrss_mb": max(r["maxrss_mb"] for r in results),
+        "heavy_loaded": results[-1]["heavy_loaded"],
+        "exceptions": results[-1]["exceptions"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="samples per measurement (median is reported)")
+    parser.add_argument("--json", action="store_true", help="print a single JSON document")
+    args = parser.parse_args()
+
+    top_level = app_top_level_imports()
+    report = {
+        "python": sys.version.split()[0],
+        "heavy_modules": {name: measure_imports([name], args.runs) for name in HEAVY_MODULES},
+        "app_top_level_imports": {"modules": top_level, **measure_imports(top_level, args.runs)},
+        "first_render": measure_first_render(args.runs),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Python {report['python']}, {args.runs} run(s) per measurement\n")
+    print("Cold import per heavy dependency:")
+    for name, result in report["heavy_modules"].items():
+        if "error" in result:
+            print(f"  {name:<26} error: {result['error']}")
+        else:
+            print(f"  {name:<26} {result['median_seconds'] * 1000:8.1f} ms  {result['maxrss_mb']:7.1f} MB RSS")
+
+    app = report["app_top_level_imports"]
+    print(f"\nApp module-level imports ({', '.join(app['modules'])}):")
+    if "error" in app:
+        print(f"  error: {app['error']}")
+    else:
+        print(f"  {app['median_seconds'] * 1000:.1f} ms  {app['maxrss_mb']:.1f} MB RSS")
+
+    render = report["first_render"]
+    print("\nFirst render (login page, AppTest):")
+    if "error" in render:
+        print(f"  error: {render['error']}")
+    else:
+        print(f"  streamlit import  {render['median_streamlit_import_seconds'] * 1000:8.1f} ms")
+        print(f"  first render      {render['median_first_render_seconds'] * 1000:8.1f} ms")
+        print(f"  peak RSS          {render['maxrss_mb']:8.1f} MB")
+        print(f"  heavy deps loaded {', '.join(render['heavy_loaded']) or 'none'}")
+        for exc in render["exceptions"]:
+            print(f"  exception: {exc}")
+
+
+if __name__ == "__main__":
+    main()
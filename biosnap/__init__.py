@@ -0,0 +1 @@
+"""Shared modules behind the BioSnap Streamlit app and Flask backend."""
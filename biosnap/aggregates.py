@@ -0,0 +1,417 @@
+"""Materialized cohort biomarker aggregates.
+
+The layer keeps one long table of numeric values (one row per participant
+and biomarker, Function Health and Biostarks) and three derived tables:
+
+* ``distributions`` – count, mean, std, min/max and p10–p90 per biomarker
+* ``status_counts`` – participants per (category, biomarker, status), with
+  an ``out_of_range`` flag
+* ``percentiles``   – each participant's percentile within each biomarker
+
+When one participant's data changes only the biomarkers they touch are
+recomputed. Storage holds each participant's rows as their own object,
+``_cohort/aggregates/contributions/<source>/<glc_id>.parquet``, written by
+whichever process saved that participant's upload and removed when the
+upload is deleted (``on_upload_removed``). No object is shared between
+writers, so replicas cannot lose each other's updates. Every process (the
+Flask backend, each app replica) combines the contributions into the layer
+it keeps in memory: a refresh lists them and downloads only those whose etag
+changed, and a cold start takes the combined tables from the shared cache
+(``biosnap.cache``) when another process has already built that state.
+
+Usage:
+    python -m biosnap.aggregates --rebuild-from exports/cohort
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from biosnap.metrics import timed
+
+logger = logging.getLogger("biosnap.aggregates")
+
+PREFIX = "_cohort/aggregates"
+CONTRIBUTIONS = f"{PREFIX}/contributions"
+SOURCE_FILES = {"functionhealth.parquet": "functionhealth", "biostarks.csv": "biostarks"}
+SOURCES = tuple(SOURCE_FILES.values())
+LIST_OPTIONS = {"limit": 10000, "sortBy": {"column": "name", "order": "asc"}}
+TABLES = ["values", "distributions", "status_counts", "percentiles"]
+GROUP = ["source", "name", "unit_code"]
+VALUE_COLUMNS = ["glc_id", "source", "category", "name", "status", "value_num", "unit_code"]
+QUANTILES = {"p10": 0.1, "p25": 0.25, "p50": 0.5, "p75": 0.75, "p90": 0.9}
+IN_RANGE_STATUSES = {"", "in range", "normal", "optimal"}
+REFRESH_SECONDS = float(os.getenv("BIOSNAP_AGGREGATES_REFRESH", "30"))
+CACHE_TTL = float(os.getenv("BIOSNAP_CACHE_AGGREGATES_SECONDS", "86400"))
+
+
+# === Per-participant rows ===
+def functionhealth_values(glc_id, typed_df):
+    return pd.DataFrame({
+        "glc_id": glc_id,
+        "source": "functionhealth",
+        "category": typed_df["category"].astype(str),
+        "name": typed_df["name"].astype(str),
+        "status": typed_df["status"].astype(str),
+        "value_num": typed_df["value_num"].astype("float64"),
+        "unit_code": typed_df["unit_code"].astype(str),
+    })
+
+
+def biostarks_values(glc_id, biostarks_df):
+    return pd.DataFrame({
+        "glc_id": glc_id,
+        "source": "biostarks",
+        "category": "Biostarks",
+        "name": biostarks_df["Metric"].astype(str),
+        "status": "",
+        "value_num": pd.to_numeric(biostarks_df["Value"], errors="coerce"),
+        "unit_code": "",
+    })
+
+
+# === Vectorized builders (run on the full table or an affected subset) ===
+def build_distributions(values):
+    numeric = values.dropna(subset=["value_num"])
+    if numeric.empty:
+        return pd.DataFrame(columns=GROUP + ["count", "mean", "std", "min", "max", *QUANTILES])
+    grouped = numeric.groupby(GROUP, sort=False)["value_num"]
+    stats = grouped.agg(["count", "mean", "std", "min", "max"])
+    quantiles = grouped.quantile(list(QUANTILES.values())).unstack()
+    quantiles.columns = list(QUANTILES)
+    return stats.join(quantiles).reset_index()
+
+
+def build_status_counts(values):
+    fh = values.loc[values["source"].eq("functionhealth")]
+    if fh.empty:
+        return pd.DataFrame(columns=["category", "name", "status", "count", "out_of_range"])
+    counts = fh.groupby(["category", "name", "status"], sort=False).size().rename("count").reset_index()
+    counts["out_of_range"] = ~counts["status"].str.strip().str.lower().isin(IN_RANGE_STATUSES)
+    return counts
+
+
+def build_percentiles(values):
+    numeric = values.dropna(subset=["value_num"])
+    result = numeric[["glc_id"] + GROUP + ["value_num"]].copy()
+    result["percentile"] = numeric.groupby(GROUP, sort=False)["value_num"].rank(pct=True, method="average") * 100
+    return result.reset_index(drop=True)
+
+
+def _concat(frames):
+    # Empty pieces are left out: pandas is deprecating their say in the result dtypes
+    kept = [frame for frame in frames if not frame.empty]
+    return pd.concat(kept, ignore_index=True) if kept else frames[0].reset_index(drop=True)
+
+
+def _in_groups(frame, keys, columns):
+    if frame.empty or keys.empty:
+        return pd.Series(False, index=frame.index)
+    index = pd.MultiIndex.from_frame(frame[columns].astype(str))
+    return pd.Series(index.isin(pd.MultiIndex.from_frame(keys[columns].astype(str))), index=frame.index)
+
+
+class CohortAggregates:
+    def __init__(self, values=None, derived=None):
+        if values is None:
+            values = _empty_values()
+        self.values = values
+        if derived:
+            self.distributions = derived["distributions"]
+            self.status_counts = derived["status_counts"]
+            self.percentiles = derived["percentiles"]
+        else:
+            self.rebuild()
+
+    def rebuild(self):
+        with timed("aggregates.rebuild"):
+            self.distributions = build_distributions(self.values)
+            self.status_counts = build_status_counts(self.values)
+            self.percentiles = build_percentiles(self.values)
+
+    def update_participant(self, glc_id, source, rows):
+        """Replace one participant's rows for ``source`` and recompute what they touch."""
+        with timed("aggregates.update", source=source):
+            mine = self.values["glc_id"].eq(glc_id) & self.values["source"].eq(source)
+            touched = _concat([self.values.loc[mine], rows])
+            self.values = _concat([self.values.loc[~mine], rows])
+
+            groups = touched[GROUP].drop_duplicates()
+            subset = self.values.loc[_in_groups(self.values, groups, GROUP)]
+            self.distributions = _concat([
+                self.distributions.loc[~_in_groups(self.distributions, groups, GROUP)],
+                build_distributions(subset),
+            ])
+            self.percentiles = _concat([
+                self.percentiles.loc[~_in_groups(self.percentiles, groups, GROUP)],
+                build_percentiles(subset),
+            ])
+
+            biomarkers = touched.loc[touched["source"].eq("functionhealth"), ["category", "name"]].drop_duplicates()
+            if not biomarkers.empty:
+                subset = self.values.loc[_in_groups(self.values, biomarkers, ["category", "name"])]
+                self.status_counts = _concat([
+                    self.status_counts.loc[~_in_groups(self.status_counts, biomarkers, ["category", "name"])],
+                    build_status_counts(subset),
+                ])
+
+    # === Queries ===
+    def distribution(self, name=None, source=None):
+        df = self.distributions
+        if name is not None:
+            df = df.loc[df["name"].eq(name)]
+        if source is not None:
+            df = df.loc[df["source"].eq(source)]
+        return df
+
+    def out_of_range(self, by="category"):
+        """Participant counts per ``by`` ("category" or "name") and status."""
+        keys = ["category"] if by == "category" else ["category", "name"]
+        counts = self.status_counts.groupby(keys + ["status", "out_of_range"], sort=True)["count"].sum()
+        return counts.reset_index()
+
+    def participant_percentiles(self, glc_id):
+        return self.percentiles.loc[self.percentiles["glc_id"].eq(glc_id)].sort_values(GROUP)
+
+
+# === Persistence in storage ===
+def contribution_path(source, glc_id):
+    return f"{CONTRIBUTIONS}/{source}/{glc_id}.parquet"
+
+
+def _participant(path):
+    source, name = path[len(CONTRIBUTIONS) + 1:].split("/", 1)
+    return name[:-len(".parquet")], source
+
+
+def _empty_values():
+    return pd.DataFrame(columns=VALUE_COLUMNS).astype({"value_num": "float64"})
+
+
+def _read(bucket, path, upload_queue=None):
+    """Object bytes, preferring this process's queued write; None only when the object does not exist."""
+    from biosnap.storage import ObjectNotFound
+
+    data = upload_queue.pending_data(path) if upload_queue else None
+    if data is not None:
+        return data
+    try:
+        return bucket.download(path)
+    except ObjectNotFound:
+        return None
+
+
+def _parse_table(data):
+    if not isinstance(data, bytes) or not data:
+        return None
+    return pd.read_parquet(io.BytesIO(data))
+
+
+def _frame_bytes(frame):
+    buffer = io.BytesIO()
+    frame.to_parquet(buffer, engine="pyarrow", compression="zstd", index=False)
+    return buffer.getvalue()
+
+
+def _assemble(read_table):
+    values = read_table("values")
+    if values is None:
+        return CohortAggregates()
+
+    derived = {table: read_table(table) for table in TABLES[1:]}
+    if any(df is None for df in derived.values()):
+        return CohortAggregates(values)
+    return CohortAggregates(values, derived)
+
+
+def _listing(bucket):
+    """{contribution path: etag} for every participant's published rows."""
+    from biosnap.storage import object_etag
+
+    listing = {}
+    for source in SOURCES:
+        for entry in bucket.list(f"{CONTRIBUTIONS}/{source}", LIST_OPTIONS):
+            if entry.get("id") is not None:
+                listing[f"{CONTRIBUTIONS}/{source}/{entry['name']}"] = object_etag(entry)
+    return listing
+
+
+def _combine(bucket, listing, upload_queue=None):
+    """The layer built from every contribution in ``listing``.
+
+    The tables are kept in the shared cache under a hash of the listing, so
+    each state of the cohort is downloaded and built once, not once per
+    replica or restart.
+    """
+    from biosnap.cache import get_cache
+
+    namespace = getattr(bucket, "cache_namespace", None)
+    key = None
+    if listing and namespace is not None:
+        digest = hashlib.sha256(json.dumps(listing, sort_keys=True).encode()).hexdigest()
+        key = f"aggregates:{namespace}:{digest}"
+        cached = {table: get_cache().get(f"{key}:{table}") for table in TABLES}
+        if all(data is not None for data in cached.values()):
+            return _assemble(lambda table: _parse_table(cached[table]))
+
+    frames = [rows for rows in (_parse_table(_read(bucket, path, upload_queue)) for path in listing)
+              if rows is not None]
+    aggregates = CohortAggregates(_concat(frames) if frames else None)
+    if key:
+        for table in TABLES:
+            get_cache().set(f"{key}:{table}", _frame_bytes(getattr(aggregates, table)), CACHE_TTL)
+    return aggregates
+
+
+# === Process-wide layer ===
+_lock = threading.Lock()
+_state = {"aggregates": None, "seen": {}, "checked": 0.0}
+
+
+def _bucket():
+    from biosnap.storage import get_storage
+    return get_storage()
+
+
+def _refresh(bucket, upload_queue=None):
+    # Callers hold _lock. Only contributions whose etag changed since the last
+    # refresh are downloaded; "seen" maps each applied contribution to its etag
+    # (None while this process's own write of it is still queued).
+    listing = _listing(bucket)
+    if _state["aggregates"] is None:
+        _state["aggregates"] = _combine(bucket, listing, upload_queue)
+        _state["seen"] = dict(listing)
+    else:
+        aggregates, seen = _state["aggregates"], _state["seen"]
+        for path, etag in listing.items():
+            if seen.get(path, "") != etag:
+                rows = _parse_table(_read(bucket, path, upload_queue))
+                aggregates.update_participant(*_participant(path), _empty_values() if rows is None else rows)
+                seen[path] = etag
+        for path in [path for path in seen if path not in listing]:
+            if upload_queue is not None and upload_queue.pending_ticket(path) is not None:
+                continue
+            aggregates.update_participant(*_participant(path), _empty_values())
+            del seen[path]
+    _state["checked"] = time.monotonic()
+    return _state["aggregates"]
+
+
+def get_aggregates(bucket=None, max_age=REFRESH_SECONDS, upload_queue=None):
+    """The cached layer, brought up to date with other processes' contributions."""
+    bucket = bucket or _bucket()
+    with _lock:
+        if _state["aggregates"] is not None and time.monotonic() - _state["checked"] < max_age:
+            return _state["aggregates"]
+        return _refresh(bucket, upload_queue)
+
+
+def _apply(glc_id, source, rows, bucket, upload_queue):
+    """Replace one participant's rows; empty ``rows`` remove their contribution."""
+    path = contribution_path(source, glc_id)
+    with _lock:
+        aggregates = _refresh(bucket, upload_queue)
+        aggregates.update_participant(glc_id, source, rows)
+        if rows.empty:
+            upload_queue.cancel(path)
+            bucket.remove([path])
+            _state["seen"].pop(path, None)
+        else:
+            upload_queue.submit(path, _frame_bytes(rows[VALUE_COLUMNS]), "application/vnd.apache.parquet")
+            _state["seen"][path] = None
+
+
+def _source(path):
+    """(glc_id, source) for a participant upload that feeds the layer, else None."""
+    glc_id, _, name = path.partition("/")
+    if glc_id.startswith(("_", ".")) or name not in SOURCE_FILES:
+        return None
+    return glc_id, SOURCE_FILES[name]
+
+
+def on_upload_saved(path, data):
+    """Upload-queue listener: refresh the layer when a participant's data changes."""
+    participant = _source(path)
+    if participant is None:
+        return
+
+    from biosnap.uploads import get_upload_queue
+
+    glc_id, source = participant
+    if source == "functionhealth":
+        from biosnap.biomarkers import read_parquet_bytes
+        rows = functionhealth_values(glc_id, read_parquet_bytes(data))
+    else:
+        rows = biostarks_values(glc_id, pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False))
+    _apply(glc_id, source, rows, _bucket(), get_upload_queue())
+
+
+def on_upload_removed(path):
+    """Call after deleting a participant's upload: drops their rows from the layer."""
+    participant = _source(path)
+    if participant is None:
+        return
+
+    from biosnap.uploads import get_upload_queue
+    _apply(*participant, _empty_values(), _bucket(), get_upload_queue())
+
+
+def rebuild_from_export(out_dir, bucket=None, upload_queue=None):
+    """Full rebuild from the cohort tables written by biosnap.cohort_export.
+
+    Rewrites every participant's contribution and removes those of
+    participants the export no longer has.
+    """
+    frames = []
+    fh_path = os.path.join(out_dir, "cohort_functionhealth.parquet")
+    if os.path.exists(fh_path):
+        fh = pd.read_parquet(fh_path)
+        frames.append(functionhealth_values(fh["glc_id"].astype(str), fh))
+    bs_path = os.path.join(out_dir, "cohort_biostarks.parquet")
+    if os.path.exists(bs_path):
+        bs = pd.read_parquet(bs_path)
+        frames.append(biostarks_values(bs["glc_id"].astype(str), bs))
+
+    values = pd.concat(frames, ignore_index=True) if frames else None
+    aggregates = CohortAggregates(values)
+
+    bucket = bucket or _bucket()
+    if upload_queue is None:
+        from biosnap.uploads import get_upload_queue
+        upload_queue = get_upload_queue()
+    with _lock:
+        seen = {}
+        for (glc_id, source), rows in aggregates.values.groupby(["glc_id", "source"], sort=False):
+            path = contribution_path(source, glc_id)
+            upload_queue.submit(path, _frame_bytes(rows[VALUE_COLUMNS]), "application/vnd.apache.parquet")
+            seen[path] = None
+        stale = [path for path in _listing(bucket) if path not in seen]
+        if stale:
+            bucket.remove(stale)
+        _state.update(aggregates=aggregates, seen=seen, checked=time.monotonic())
+    return aggregates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild cohort aggregates from a cohort export.")
+    parser.add_argument("--rebuild-from", required=True, help="directory written by biosnap.cohort_export")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from biosnap.uploads import get_upload_queue
+    aggregates = rebuild_from_export(args.rebuild_from)
+    get_upload_queue().drain()
+    print(f"{len(aggregates.values)} values, {len(aggregates.distributions)} biomarkers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Process-wide cache of config.yaml for the login widget.
+
+The file is parsed once per process and re-read only when its mtime or
+size changes (checked at most every ``CHECK_SECONDS``); a changed stat with
+identical content keeps the cached snapshot. Each snapshot holds the
+credentials indexed by lower-cased username (passwords hashed up front so
+stauth never hashes on a rerun) and a ``version`` derived from the file's
+hash.
+
+``streamlit_authenticator.Authenticate`` itself is still created per run:
+its cookie manager is a component that has to render in every script run.
+What it is given is prepared data, so construction no longer scales with
+the size of the participant list beyond a shallow copy.
+"""
+
+import copy
+import hashlib
+import os
+import threading
+import time
+
+import yaml
+from yaml.loader import SafeLoader
+
+CONFIG_PATH = os.getenv("BIOSNAP_AUTH_CONFIG", "config.yaml")
+CHECK_SECONDS = 2.0
+
+
+class AuthConfig:
+    def __init__(self, raw, version):
+        self.version = version
+        self.cookie = raw["cookie"]
+        usernames = (raw.get("credentials") or {}).get("usernames") or {}
+        self.usernames = {str(name).lower(): dict(user) for name, user in usernames.items()}
+        self._hash_plaintext_passwords()
+
+    def _hash_plaintext_passwords(self):
+        plaintext = [user for user in self.usernames.values()
+                     if user.get("password") and not _is_hash(user["password"])]
+        if plaintext:
+            from streamlit_authenticator import Hasher
+            for user in plaintext:
+                user["password"] = Hasher.hash(user["password"])
+
+    def credentials(self):
+        """A per-run copy for stauth, which writes login state into the user entries."""
+        return {"usernames": {name: copy.copy(user) for name, user in self.usernames.items()}}
+
+
+def _is_hash(password):
+    return isinstance(password, str) and password.startswith(("$2a$", "$2b$", "$2y$")) and len(password) == 60
+
+
+_lock = threading.Lock()
+_state = {"config": None, "stat": None, "digest": None, "checked": 0.0, "path": None}
+
+
+def load_auth_config(path=CONFIG_PATH):
+    """The cached snapshot of ``path``, rebuilt only when the file changed."""
+    now = time.monotonic()
+    with _lock:
+        if (_state["config"] is not None and _state["path"] == path
+                and now - _state["checked"] < CHECK_SECONDS):
+            return _state["config"]
+
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        _state["checked"] = now
+        if _state["config"] is not None and _state["path"] == path and _state["stat"] == signature:
+            return _state["config"]
+
+        with open(path, "rb") as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        _state["stat"] = signature
+        if _state["config"] is not None and _state["path"] == path and _state["digest"] == digest:
+            return _state["config"]
+
+        _state.update(
+            config=AuthConfig(yaml.load(content, Loader=SafeLoader), digest[:12]),
+            digest=digest,
+            path=path,
+        )
+        return _state["config"]
+
+
+def build_authenticator(config=None):
+    import streamlit_authenticator as stauth
+
+    config = config or load_auth_config()
+    return stauth.Authenticate(
+        config.credentials(),
+        config.cookie["name"],
+        config.cookie["key"],
+        config.cookie["expiry_days"],
+        auto_hash=False,
+    )
@@ -0,0 +1,214 @@
+"""Admin batch runner for scheduled Function Health re-imports.
+
+Runs a list of jobs through a bounded pool of browser workers, spacing
+logins to the source site with a per-host token bucket. Progress is
+checkpointed after every job (credentials are never written), so a rerun
+with the same checkpoint only retries jobs that did not succeed. Scrapes
+and results go through the same path as an import from the app: the
+backend worker when ``BIOSNAP_BACKEND_URL`` is set, then app storage. A job
+only counts as done once its uploads are saved; one that fails or is still
+pending after ``BIOSNAP_BATCH_UPLOAD_SECONDS`` fails the job.
+
+Usage:
+    python -m biosnap.batch_scrape jobs.json [--workers 2] [--per-minute 6]
+        [--checkpoint batch_checkpoint.json]
+
+``jobs.json`` is a list of ``{"glc_id": ..., "email": ..., "password": ...}``.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from biosnap.metrics import timed
+
+logger = logging.getLogger("biosnap.batch_scrape")
+
+SOURCE_HOST = "my.functionhealth.com"
+WORKERS = int(os.getenv("BIOSNAP_BATCH_WORKERS", "2"))
+PER_MINUTE = float(os.getenv("BIOSNAP_BATCH_PER_MINUTE", "6"))
+UPLOAD_SECONDS = float(os.getenv("BIOSNAP_BATCH_UPLOAD_SECONDS", "300"))
+
+
+class HostRateLimiter:
+    """Token bucket per host: ``per_minute`` sustained, ``burst`` back to back."""
+
+    def __init__(self, per_minute=PER_MINUTE, burst=1):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}  # host -> (tokens, last refill)
+
+    def acquire(self, host):
+        """Block until a request to ``host`` is allowed; returns seconds waited."""
+        if not self.interval:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (float(self.burst), now))
+                tokens = min(float(self.burst), tokens + (now - last) / self.interval)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return waited
+                self._buckets[host] = (tokens, now)
+                delay = (1 - tokens) * self.interval
+            time.sleep(delay)
+            waited += delay
+
+
+class BatchCheckpoint:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.results = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.results = {}
+
+    def done(self, glc_id):
+        return self.results.get(glc_id, {}).get("status") == "ok"
+
+    def record(self, glc_id, result):
+        with self._lock:
+            self.results[glc_id] = result
+            payload = json.dumps(self.results, indent=1, sort_keys=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(payload)
+        os.replace(tmp, self.path)
+
+
+def _default_scrape(email, password):
+    from biosnap.scrape_jobs import run_import
+    return run_import(email, password)
+
+
+def _default_save(glc_id, function_df, upload_queue, bucket=None):
+    """Queue the import; returns (history summary, upload tickets)."""
+    from biosnap.history import latest_path
+    from biosnap.imports import function_health_paths, save_function_health_import
+
+    _, _, history = save_function_health_import(glc_id, function_df, upload_queue=upload_queue, bucket=bucket)
+    paths = [*function_health_paths(glc_id), latest_path(glc_id), history["snapshot"]]
+    # Saved writes have no pending ticket left; failed ones keep theirs
+    tickets = [upload_queue.pending_ticket(path) for path in paths if path]
+    return history, [ticket for ticket in tickets if ticket]
+
+
+class BatchScrapeRunner:
+    def __init__(self, jobs, checkpoint_path, workers=WORKERS, rate_limiter=None,
+                 scrape=_default_scrape, save=_default_save, upload_queue=None,
+                 upload_timeout=UPLOAD_SECONDS):
+        self.jobs = jobs
+        self.checkpoint = BatchCheckpoint(checkpoint_path)
+        self.workers = workers
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.scrape = scrape
+        self.save = save
+        self.upload_queue = upload_queue
+        self.upload_timeout = upload_timeout
+
+    def _upload_failures(self, upload_queue, tickets):
+        """Why the job's uploads did not all save; empty once they have."""
+        from biosnap.uploads import FAILED
+
+        if not upload_queue.wait(tickets, timeout=self.upload_timeout):
+            return [f"uploads still pending after {self.upload_timeout:g}s"]
+        return [upload_queue.error(t) or "upload failed" for t in tickets if upload_queue.status(t) == FAILED]
+
+    def _run_job(self, job):
+        glc_id = job["glc_id"]
+        result = {"started_at": time.time()}
+        start = time.perf_counter()
+        try:
+            result["rate_limited_seconds"] = round(self.rate_limiter.acquire(SOURCE_HOST), 3)
+            with timed("batch.scrape"):
+                function_df = self.scrape(job.pop("email"), job.pop("password"))
+            history, tickets = self.save(glc_id, function_df, self.upload_queue)
+            failures = self._upload_failures(self.upload_queue, tickets)
+            if failures:
+                # Not "ok", so a rerun with this checkpoint imports it again
+                result.update(status="failed", rows=len(function_df), error="; ".join(failures))
+            else:
+                result.update(status="ok", rows=len(function_df), history=history)
+        except ValueError as e:
+            # Raised by the scraper for rejected credentials; retrying will not help
+            result.update(status="auth_failed", error=str(e))
+        except Exception as e:
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+        finally:
+            job.pop("email", None)
+            job.pop("password", None)
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        self.checkpoint.record(glc_id, result)
+        return glc_id, result
+
+    def run(self):
+        started = time.perf_counter()
+        pending = [job for job in self.jobs if not self.checkpoint.done(job["glc_id"])]
+        skipped = len(self.jobs) - len(pending)
+        if self.upload_queue is None:
+            from biosnap.uploads import get_upload_queue
+            self.upload_queue = get_upload_queue()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="biosnap-batch") as pool:
+            futures = [pool.submit(self._run_job, job) for job in pending]
+            for future in as_completed(futures):
+                glc_id, result = future.result()
+                logger.info("%s: %s in %.1fs", glc_id, result["status"], result["seconds"])
+
+        return summarize(self.checkpoint.results, skipped, time.perf_counter() - started)
+
+
+def summarize(results, skipped=0, seconds=0.0):
+    durations = sorted(r["seconds"] for r in results.values() if r.get("status") == "ok")
+    failures = {glc_id: r.get("error") for glc_id, r in results.items() if r.get("status") != "ok"}
+    return {
+        "total": len(results),
+        "succeeded": len(durations),
+        "failed": len(failures),
+        "skipped": skipped,
+        "seconds": round(seconds, 3),
+        "p50_seconds": round(statistics.median(durations), 3) if durations else None,
+        "max_seconds": durations[-1] if durations else None,
+        "failures": failures,
+        "per_user": {glc_id: {k: r.get(k) for k in ("status", "seconds", "rows")} for glc_id, r in results.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-import Function Health data for many participants.")
+    parser.add_argument("jobs", help="JSON list of {glc_id, email, password}")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="concurrent browsers")
+    parser.add_argument("--per-minute", type=float, default=PER_MINUTE, help="logins per minute to the source site")
+    parser.add_argument("--checkpoint", default="batch_checkpoint.json", help="progress file; reuse to resume")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    with open(args.jobs) as f:
+        jobs = json.load(f)
+
+    runner = BatchScrapeRunner(
+        jobs, args.checkpoint, workers=args.workers,
+        rate_limiter=HostRateLimiter(per_minute=args.per_minute),
+    )
+    summary = runner.run()
+
+    from biosnap.uploads import get_upload_queue
+    get_upload_queue().drain()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
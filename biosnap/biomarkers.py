@@ -0,0 +1,149 @@
+"""Typed biomarker tables.
+
+``functionhealth.csv`` keeps the scraper's raw strings ("<0.5", "12.3",
+"Negative", free-text units). ``normalize_biomarkers`` turns that into a
+typed frame once, right after scraping:
+
+* ``comparator`` – "", "<", ">", "<=" or ">=" (categorical)
+* ``value_num``  – the numeric part as float64, NaN for qualitative results
+* ``result``     – the qualitative result ("Negative", "Detected", ...)
+* ``unit_code``  – canonical unit code, so "mg/dl" and "MG/DL" compare equal
+
+The typed frame is stored as ``functionhealth.parquet`` next to the CSV.
+"""
+
+import io
+import re
+
+import pandas as pd
+
+PARQUET_NAME = "functionhealth.parquet"
+CSV_NAME = "functionhealth.csv"
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+
+RAW_COLUMNS = ["category", "name", "status", "value", "units"]
+
+_VALUE_RE = (
+    r"^\s*(?P<comparator><=|>=|≤|≥|<|>)?\s*"
+    r"(?P<number>[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|[-+]?\.\d+)\s*$"
+)
+_COMPARATORS = ["", "<", ">", "<=", ">="]
+
+# Lowercased, whitespace-free, micro-sign-folded spelling -> canonical code
+UNIT_CODES = {
+    "%": "%",
+    "ratio": "ratio",
+    "mg/dl": "mg/dL",
+    "g/dl": "g/dL",
+    "ug/dl": "ug/dL",
+    "mcg/dl": "ug/dL",
+    "ng/dl": "ng/dL",
+    "ng/ml": "ng/mL",
+    "pg/ml": "pg/mL",
+    "ug/ml": "ug/mL",
+    "mcg/ml": "ug/mL",
+    "mg/l": "mg/L",
+    "ug/l": "ug/L",
+    "nmol/l": "nmol/L",
+    "pmol/l": "pmol/L",
+    "umol/l": "umol/L",
+    "mmol/l": "mmol/L",
+    "meq/l": "mEq/L",
+    "u/l": "U/L",
+    "iu/l": "IU/L",
+    "iu/ml": "IU/mL",
+    "miu/l": "mIU/L",
+    "miu/ml": "mIU/mL",
+    "uiu/ml": "uIU/mL",
+    "fl": "fL",
+    "pg": "pg",
+    "sec": "s",
+    "seconds": "s",
+    "mm/h": "mm/h",
+    "mm/hr": "mm/h",
+    "ml/min/1.73m2": "mL/min/1.73m2",
+    "ml/min/1.73": "mL/min/1.73m2",
+    "cells/ul": "cells/uL",
+    "/ul": "cells/uL",
+    "x10e3/ul": "10^3/uL",
+    "thousand/ul": "10^3/uL",
+    "k/ul": "10^3/uL",
+    "x10e6/ul": "10^6/uL",
+    "million/ul": "10^6/uL",
+    "m/ul": "10^6/uL",
+    "ng/mlfeu": "ng/mL FEU",
+    "nmol/mincm": "nmol/min/mL",
+}
+
+
+def canonical_unit(text):
+    """Canonical code for a free-text unit; unknown units pass through trimmed."""
+    if text is None or (isinstance(text, float) and pd.isna(text)):
+        return ""
+    stripped = str(text).strip()
+    key = re.sub(r"\s+", "", stripped.replace("µ", "u").replace("μ", "u")).lower()
+    return UNIT_CODES.get(key, stripped)
+
+
+def normalize_biomarkers(raw_df):
+    """Typed copy of a scraped Function Health frame (see module docstring)."""
+    df = raw_df.reindex(columns=RAW_COLUMNS)
+    raw_value = df["value"].fillna("").astype(str).str.strip()
+
+    parts = raw_value.str.extract(_VALUE_RE)
+    value_num = pd.to_numeric(parts["number"].str.replace(",", "", regex=False), errors="coerce")
+    is_numeric = value_num.notna()
+
+    comparator = (
+        parts["comparator"].fillna("").astype(str)
+        .replace({"≤": "<=", "≥": ">="})
+        .where(is_numeric, "")
+    )
+    result = raw_value.where(~is_numeric & raw_value.ne(""))
+
+    units = df["units"].fillna("").astype(str).str.strip()
+    unit_codes = units.map({u: canonical_unit(u) for u in units.unique()})
+
+    return pd.DataFrame({
+        "category": df["category"].fillna("").astype("category"),
+        "name": df["name"].fillna("").astype("category"),
+        "status": df["status"].fillna("").astype(str).str.strip().astype("category"),
+        "value": raw_value.astype("string"),
+        "comparator": pd.Categorical(comparator, categories=_COMPARATORS),
+        "value_num": value_num.astype("float64"),
+        "result": result.astype("category"),
+        "units": units.astype("category"),
+        "unit_code": unit_codes.astype("category"),
+    })
+
+
+# === Parquet round trip ===
+def to_parquet_bytes(typed_df):
+    buffer = io.BytesIO()
+    typed_df.to_parquet(buffer, engine="pyarrow", compression="zstd", index=False)
+    return buffer.getvalue()
+
+
+def read_parquet_bytes(data):
+    return pd.read_parquet(io.BytesIO(data), engine="pyarrow")
+
+
+def load_biomarkers(bucket, username):
+    """Typed biomarkers for a user: Parquet when present, else parse the CSV.
+
+    Only listed objects count, so a file that is still being deleted is not
+    restored. The Parquet goes through ``biosnap.dashboard.read_frame`` (shared
+    cache, no per-process copy: callers keep the frame in session data).
+    Returns None when the user has not imported Function Health data.
+    """
+    from biosnap.dashboard import read_frame
+    from biosnap.storage import object_etag
+
+    files = {f["name"]: f for f in bucket.list(path=f"{username}/")}
+    if PARQUET_NAME in files:
+        return read_frame(bucket, f"{username}/{PARQUET_NAME}", object_etag(files[PARQUET_NAME]), remember=False)
+    if CSV_NAME in files:
+        data = bucket.download(f"{username}/{CSV_NAME}")
+        if isinstance(data, bytes) and data:
+            return normalize_biomarkers(pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False))
+    return None
@@ -0,0 +1,119 @@
+"""Chrome profile for scraping.
+
+The scraper only needs the DOM of the login and biomarkers pages, so by
+default the browser runs a lean profile: images, fonts and media are never
+fetched, known analytics/tracking hosts are blocked through CDP, background
+Chrome features are switched off and page loads return at DOMContentLoaded.
+Memory and CPU limits are tunable through environment variables:
+
+    BIOSNAP_CHROME_LEAN=0              use the plain profile
+    BIOSNAP_CHROME_JS_HEAP_MB=512      V8 old-space limit per renderer
+    BIOSNAP_CHROME_RENDERER_LIMIT=2    maximum renderer processes
+    BIOSNAP_CHROME_RASTER_THREADS=1    raster threads per renderer
+    BIOSNAP_CHROME_BLOCK_CSS=0         also block external stylesheets
+    BIOSNAP_CHROME_EXTRA_BLOCKED=...   comma-separated extra URL patterns
+"""
+
+import logging
+import os
+
+from selenium.webdriver.chrome.options import Options
+
+logger = logging.getLogger("biosnap.browser")
+
+LEAN = os.getenv("BIOSNAP_CHROME_LEAN", "1").lower() not in ("0", "false", "no")
+JS_HEAP_MB = int(os.getenv("BIOSNAP_CHROME_JS_HEAP_MB", "512"))
+RENDERER_LIMIT = int(os.getenv("BIOSNAP_CHROME_RENDERER_LIMIT", "2"))
+RASTER_THREADS = int(os.getenv("BIOSNAP_CHROME_RASTER_THREADS", "1"))
+# External stylesheets stay on by default: element .text depends on layout
+# (hidden nodes report no text), and the app's own styles are injected by JS.
+BLOCK_CSS = os.getenv("BIOSNAP_CHROME_BLOCK_CSS", "0").lower() in ("1", "true", "yes")
+EXTRA_BLOCKED = [p.strip() for p in os.getenv("BIOSNAP_CHROME_EXTRA_BLOCKED", "").split(",") if p.strip()]
+
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+]
+
+BLOCKED_THIRD_PARTY_HOSTS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googleadservices.com*", "*facebook.net*", "*facebook.com/tr*",
+    "*segment.io*", "*segment.com*", "*cdn.segment.com*",
+    "*hotjar.com*", "*fullstory.com*", "*mixpanel.com*", "*amplitude.com*",
+    "*intercom.io*", "*intercomcdn.com*", "*heap.io*", "*heapanalytics.com*",
+    "*clarity.ms*", "*sentry.io*", "*browser-intake-datadoghq.com*",
+    "*analytics.tiktok.com*", "*sc-static.net*", "*bat.bing.com*", "*px.ads.linkedin.com*",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*", "*use.typekit.net*",
+]
+
+DISABLED_FEATURES = [
+    "Translate", "OptimizationHints", "MediaRouter", "BackForwardCache",
+    "InterestFeedContentSuggestions", "CalculateNativeWinOcclusion",
+    "AutofillServerCommunication", "CertificateTransparencyComponentUpdater",
+]
+
+
+def build_chrome_options(lean=LEAN):
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--window-size=1920x1080")
+    if not lean:
+        return options
+
+    # Return from driver.get() at DOMContentLoaded; every step that needs
+    # an element already waits for it explicitly.
+    options.page_load_strategy = "eager"
+
+    for flag in (
+        "--disable-gpu",
+        "--disable-extensions",
+        "--disable-background-networking",
+        "--disable-background-timer-throttling",
+        "--disable-component-update",
+        "--disable-default-apps",
+        "--disable-sync",
+        "--disable-breakpad",
+        "--disable-domain-reliability",
+        "--disable-client-side-phishing-detection",
+        "--metrics-recording-only",
+        "--mute-audio",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--blink-settings=imagesEnabled=false",
+        "--disk-cache-size=1",
+        f"--disable-features={','.join(DISABLED_FEATURES)}",
+        f"--renderer-process-limit={RENDERER_LIMIT}",
+        f"--num-raster-threads={RASTER_THREADS}",
+        f"--js-flags=--max-old-space-size={JS_HEAP_MB}",
+    ):
+        options.add_argument(flag)
+
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+        "profile.default_content_setting_values.geolocation": 2,
+        "profile.default_content_setting_values.media_stream": 2,
+    })
+    return options
+
+
+def blocked_url_patterns():
+    patterns = BLOCKED_RESOURCE_PATTERNS + BLOCKED_THIRD_PARTY_HOSTS + EXTRA_BLOCKED
+    if BLOCK_CSS:
+        patterns.append("*.css")
+    return patterns
+
+
+def apply_request_blocking(driver, lean=LEAN):
+    """Block non-essential requests via CDP; call before the first driver.get()."""
+    if not lean:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_url_patterns()})
+    except Exception as e:
+        # Still scrape with the lean flags if the driver has no CDP bridge
+        logger.warning("request blocking unavailable: %s", e)
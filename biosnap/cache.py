@@ -0,0 +1,317 @@
+"""Shared cache tier.
+
+Caches inside one process are lost on restart and duplicated on every
+replica. ``get_cache()`` returns a cache that processes share, picked by
+``BIOSNAP_CACHE``:
+
+    sqlite   a file at BIOSNAP_CACHE_PATH (default); shared by every
+             process on one host or volume
+    redis    BIOSNAP_CACHE_URL (needs the ``redis`` package); shared by
+             every replica
+    memory   an in-process dict: the stand-in for Redis in development
+             and load runs
+    off      nothing is cached
+
+Entries are bytes with a TTL (``get_json`` wraps JSON). Nothing is stored
+as a pickle, which would let anyone who can write to the store run code in
+every process that reads it; frames and tables go in as Parquet. The sqlite
+and memory backends evict least recently used entries beyond
+``BIOSNAP_CACHE_MB``; Redis relies on its own ``maxmemory`` with an LRU
+policy. A failing cache is a miss, never an error for the caller.
+
+What is cached: folder listings (``ManifestCache``, wired into
+``get_storage()``), parsed DataFrames keyed by object etag
+(``biosnap.dashboard.read_frame``), redacted PDFs and their reports, minus
+the matched text, keyed by the upload's hash
+(``biosnap.redaction.redact_pdf_bytes``) and the cohort aggregate tables per
+published version.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from biosnap.metrics import record, register_gauges
+
+logger = logging.getLogger("biosnap.cache")
+
+BACKEND = os.getenv("BIOSNAP_CACHE", "sqlite").lower()
+SQLITE_PATH = os.getenv("BIOSNAP_CACHE_PATH", "/tmp/biosnap_cache.sqlite")
+URL = os.getenv("BIOSNAP_CACHE_URL", "redis://localhost:6379/0")
+MAX_BYTES = int(float(os.getenv("BIOSNAP_CACHE_MB", "256")) * 2**20)
+DEFAULT_TTL = float(os.getenv("BIOSNAP_CACHE_TTL_SECONDS", "3600"))
+MANIFEST_TTL = float(os.getenv("BIOSNAP_CACHE_MANIFEST_SECONDS", "30"))
+KEY_PREFIX = "biosnap:"
+# sqlite read hits only rewrite the access time once it is this stale
+TOUCH_SECONDS = 60.0
+
+
+class Cache:
+    name = "cache"
+
+    def get(self, key):
+        start = time.perf_counter()
+        try:
+            value = self._get(key)
+        except Exception as e:
+            logger.warning("cache get failed for %s: %s", key, e)
+            record("cache.get", time.perf_counter() - start, "error", bucket=self.name)
+            return None
+        outcome = "miss" if value is None else "hit"
+        record("cache.get", time.perf_counter() - start, outcome, len(value or b""), bucket=self.name)
+        return value
+
+    def set(self, key, value, ttl=None):
+        start = time.perf_counter()
+        try:
+            self._set(key, value, DEFAULT_TTL if ttl is None else ttl)
+            outcome = "ok"
+        except Exception as e:
+            logger.warning("cache set failed for %s: %s", key, e)
+            outcome = "error"
+        record("cache.set", time.perf_counter() - start, outcome, len(value), bucket=self.name)
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self._delete(keys)
+        except Exception as e:
+            logger.warning("cache delete failed for %s: %s", ", ".join(keys), e)
+
+    def get_json(self, key):
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def set_json(self, key, value, ttl=None):
+        self.set(key, json.dumps(value).encode(), ttl)
+
+    def usage(self):
+        return {"entries": 0, "bytes": 0}
+
+    def gauges(self):
+        usage = self.usage()
+        return {"cache_entries": usage["entries"], "cache_bytes": usage["bytes"]}
+
+    def _get(self, key):
+        return None
+
+    def _set(self, key, value, ttl):
+        pass
+
+    def _delete(self, keys):
+        pass
+
+
+class NullCache(Cache):
+    name = "off"
+
+
+class MemoryCache(Cache):
+    name = "memory"
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key -> (value, expires)
+        self._bytes = 0
+
+    def _get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                self._drop(key)
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def _set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._items[key] = (value, time.time() + ttl)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._items)))
+
+    def _delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+
+    def _drop(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._bytes -= len(item[0])
+
+    def usage(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes}
+
+
+class SqliteCache(Cache):
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+            " size INTEGER NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _db(self):
+        # One connection per thread; WAL lets readers in other processes run alongside a writer
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _get(self, key):
+        now = time.time()
+        db = self._db()
+        row = db.execute("SELECT value, expires, accessed FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires <= now:
+            db.execute("DELETE FROM entries WHERE key = ? AND expires <= ?", (key, now))
+            return None
+        if now - accessed > TOUCH_SECONDS:
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return value
+
+    def _set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                       (key, sqlite3.Binary(value), len(value), now + ttl, now))
+            self._evict(db, now)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _evict(self, db, now):
+        db.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def _delete(self, keys):
+        self._db().executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+
+    def usage(self):
+        entries, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": entries, "bytes": size}
+
+
+class RedisCache(Cache):
+    name = "redis"
+
+    def __init__(self, url=URL, prefix=KEY_PREFIX):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _get(self, key):
+        return self._redis.get(self.prefix + key)
+
+    def _set(self, key, value, ttl):
+        self._redis.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    def _delete(self, keys):
+        self._redis.delete(*(self.prefix + key for key in keys))
+
+    def usage(self):
+        return {"entries": self._redis.dbsize(), "bytes": self._redis.info("memory")["used_memory"]}
+
+
+class ManifestCache:
+    """Plain folder listings (``Storage.list`` without options); writes invalidate
+    the folder and its ancestors, whose listings show the subfolder."""
+
+    def __init__(self, cache, namespace, ttl=MANIFEST_TTL):
+        self.cache = cache
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, folder):
+        return f"manifest:{self.namespace}:{folder.strip('/')}"
+
+    def get(self, folder):
+        return self.cache.get_json(self._key(folder))
+
+    def put(self, folder, entries):
+        self.cache.set_json(self._key(folder), entries, self.ttl)
+
+    def invalidate(self, paths):
+        keys = set()
+        for path in paths:
+            parts = path.strip("/").split("/")[:-1]
+            keys.update(self._key("/".join(parts[:i])) for i in range(len(parts) + 1))
+        self.cache.delete(*keys)
+
+
+def create_cache(backend=BACKEND):
+    if backend == "sqlite":
+        return SqliteCache()
+    if backend == "redis":
+        return RedisCache()
+    if backend == "memory":
+        return MemoryCache()
+    if backend == "off":
+        return NullCache()
+    raise ValueError(f"unknown BIOSNAP_CACHE backend: {backend}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide handle on the shared cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = create_cache()
+            register_gauges(lambda: _cache.gauges())
+        return _cache
+
+
+def set_cache(cache):
+    """Swap the process-wide cache (tests, load runs)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            register_gauges(lambda: _cache.gauges())
+        _cache = cache
+        return _cache
@@ -0,0 +1,226 @@
+"""Cohort-wide export of participant artifacts.
+
+Enumerates participant folders in the ``data`` bucket, downloads their
+artifacts with a bounded thread pool and merges them into cohort tables
+keyed by ``glc_id`` (CSV and Parquet). Downloads are cached under the output
+directory together with a manifest of storage etags, so an interrupted run
+resumes where it stopped and unchanged objects are never downloaded twice.
+
+Usage:
+    python -m biosnap.cohort_export --out exports/cohort [--workers 16]
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from biosnap.metrics import timed
+from biosnap.storage import object_etag
+
+logger = logging.getLogger("biosnap.cohort_export")
+
+ARTIFACTS = ["functionhealth.csv", "biostarks.csv", "intervention_plan.csv"]
+LIST_OPTIONS = {"limit": 10000, "sortBy": {"column": "name", "order": "asc"}}
+WORKERS = int(os.getenv("BIOSNAP_EXPORT_WORKERS", "16"))
+
+
+def is_participant_folder(entry):
+    # Folders come back without an id; "_"/"." prefixes are reserved for
+    # app-level data (issue logs, caches) rather than participants.
+    name = entry["name"]
+    return entry.get("id") is None and not name.startswith(("_", "."))
+
+
+def list_participants(bucket):
+    return [e["name"] for e in bucket.list("", LIST_OPTIONS) if is_participant_folder(e)]
+
+
+class CohortExporter:
+    def __init__(self, bucket, out_dir, workers=WORKERS, artifacts=ARTIFACTS):
+        self.bucket = bucket
+        self.out_dir = out_dir
+        self.raw_dir = os.path.join(out_dir, "raw")
+        self.manifest_path = os.path.join(out_dir, "manifest.json")
+        self.workers = workers
+        self.artifacts = artifacts
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+        self._completed_since_flush = 0
+
+    # === Manifest (resume state) ===
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _flush_manifest(self):
+        with self._lock:
+            payload = json.dumps(self._manifest, indent=1, sort_keys=True)
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(payload)
+        os.replace(tmp, self.manifest_path)
+
+    def _raw_path(self, glc_id, artifact):
+        return os.path.join(self.raw_dir, glc_id, artifact)
+
+    # === Per-participant work ===
+    def _plan(self, glc_id):
+        """List one participant folder: which artifacts exist and need fetching."""
+        entries = {e["name"]: e for e in self.bucket.list(glc_id, LIST_OPTIONS)}
+        known = self._manifest.get(glc_id, {})
+        fetch, keep = [], []
+        for artifact in self.artifacts:
+            entry = entries.get(artifact)
+            if entry is None:
+                continue
+            etag = object_etag(entry)
+            if etag and known.get(artifact) == etag and os.path.exists(self._raw_path(glc_id, artifact)):
+                keep.append(artifact)
+            else:
+                fetch.append((artifact, etag))
+        gone = [a for a in known if a not in entries]
+        return fetch, keep, gone
+
+    def _download(self, glc_id, artifact, etag):
+        data = self.bucket.download(f"{glc_id}/{artifact}")
+        if not isinstance(data, bytes):
+            raise RuntimeError(f"unexpected download result for {glc_id}/{artifact}")
+
+        target = self._raw_path(glc_id, artifact)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+        with self._lock:
+            self._manifest.setdefault(glc_id, {})[artifact] = etag
+            self._completed_since_flush += 1
+            flush = self._completed_since_flush >= 25
+            if flush:
+                self._completed_since_flush = 0
+        if flush:
+            self._flush_manifest()
+        return len(data)
+
+    def _forget(self, glc_id, artifact):
+        with self._lock:
+            self._manifest.get(glc_id, {}).pop(artifact, None)
+        try:
+            os.remove(self._raw_path(glc_id, artifact))
+        except FileNotFoundError:
+            pass
+
+    # === Run ===
+    def run(self):
+        os.makedirs(self.raw_dir, exist_ok=True)
+        started = time.perf_counter()
+        summary = {"participants": 0, "downloaded": 0, "skipped": 0, "bytes": 0, "failed": []}
+
+        with timed("cohort.export") as span, ThreadPoolExecutor(max_workers=self.workers) as pool:
+            participants = list_participants(self.bucket)
+            summary["participants"] = len(participants)
+
+            for glc_id in set(self._manifest) - set(participants):
+                for artifact in list(self._manifest[glc_id]):
+                    self._forget(glc_id, artifact)
+                self._manifest.pop(glc_id, None)
+
+            plans = {pool.submit(self._plan, glc_id): glc_id for glc_id in participants}
+            downloads = {}
+            for future in as_completed(plans):
+                glc_id = plans[future]
+                try:
+                    fetch, keep, gone = future.result()
+                except Exception as e:
+                    summary["failed"].append({"glc_id": glc_id, "artifact": None, "error": str(e)})
+                    continue
+                summary["skipped"] += len(keep)
+                for artifact in gone:
+                    self._forget(glc_id, artifact)
+                for artifact, etag in fetch:
+                    downloads[pool.submit(self._download, glc_id, artifact, etag)] = (glc_id, artifact)
+
+            for future in as_completed(downloads):
+                glc_id, artifact = downloads[future]
+                try:
+                    summary["bytes"] += future.result()
+                    summary["downloaded"] += 1
+                except Exception as e:
+                    summary["failed"].append({"glc_id": glc_id, "artifact": artifact, "error": str(e)})
+
+            self._flush_manifest()
+            summary["tables"] = self.merge()
+            span.bytes = summary["bytes"]
+
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        return summary
+
+    # === Merge cached artifacts into cohort tables ===
+    def merge(self):
+        import pandas as pd
+
+        from biosnap.biomarkers import normalize_biomarkers
+
+        tables = {}
+        for artifact in self.artifacts:
+            frames = []
+            for glc_id, artifacts in sorted(self._manifest.items()):
+                if artifact not in artifacts:
+                    continue
+                try:
+                    df = pd.read_csv(self._raw_path(glc_id, artifact), dtype=str, keep_default_na=False)
+                except (OSError, pd.errors.EmptyDataError):
+                    continue
+                df.insert(0, "glc_id", glc_id)
+                frames.append(df)
+
+            stem = artifact.rsplit(".", 1)[0]
+            if not frames:
+                continue
+
+            cohort = pd.concat(frames, ignore_index=True)
+            csv_path = os.path.join(self.out_dir, f"cohort_{stem}.csv")
+            parquet_path = os.path.join(self.out_dir, f"cohort_{stem}.parquet")
+            cohort.to_csv(csv_path, index=False)
+
+            if artifact == "functionhealth.csv":
+                typed = normalize_biomarkers(cohort)
+                typed.insert(0, "glc_id", cohort["glc_id"].astype("category"))
+                typed.to_parquet(parquet_path, engine="pyarrow", compression="zstd", index=False)
+            else:
+                cohort.astype({"glc_id": "category"}).to_parquet(parquet_path, engine="pyarrow", compression="zstd", index=False)
+
+            tables[stem] = {"rows": len(cohort), "csv": csv_path, "parquet": parquet_path}
+        return tables
+
+
+def export_cohort(out_dir, workers=WORKERS, bucket=None):
+    if bucket is None:
+        from biosnap.storage import get_storage
+        bucket = get_storage()
+    return CohortExporter(bucket, out_dir, workers=workers).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export all participants' artifacts into cohort tables.")
+    parser.add_argument("--out", default="exports/cohort", help="output directory (reused to resume)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="concurrent storage requests")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    summary = export_cohort(args.out, workers=args.workers)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
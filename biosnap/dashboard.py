@@ -0,0 +1,179 @@
+"""Everything a participant has uploaded, fetched in one pass.
+
+One ``list`` of the user's folder is the manifest: it says which artifacts
+exist and their etags. Tables are then downloaded and parsed concurrently,
+and parsed frames are cached per (path, etag), in this process (bounded by
+``BIOSNAP_DASHBOARD_FRAME_CACHE_MB``) and as Parquet in the shared cache
+(``biosnap.cache``) so other replicas and restarts skip the download and
+parse; a rerun only lists the folder, and the listing itself comes from the
+shared cache. PDFs are never downloaded here; they get
+short-lived signed links.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from biosnap.cache import get_cache
+from biosnap.metrics import timed
+from biosnap.storage import object_etag
+
+logger = logging.getLogger("biosnap.dashboard")
+
+WORKERS = int(os.getenv("BIOSNAP_DASHBOARD_WORKERS", "6"))
+LINK_SECONDS = int(os.getenv("BIOSNAP_DASHBOARD_LINK_SECONDS", "600"))
+FRAME_CACHE_ENTRIES = 256
+FRAME_CACHE_BYTES = int(float(os.getenv("BIOSNAP_DASHBOARD_FRAME_CACHE_MB", "64")) * 2**20)
+FRAME_TTL = float(os.getenv("BIOSNAP_CACHE_FRAME_SECONDS", "86400"))
+
+# (file, heading, kind, message when missing)
+ARTIFACTS = [
+    ("behavioral_scores.csv", "Behavioral Data", "table", "Please add your behavioral data."),
+    ("Oregon.csv", "Oregon Data", "table", "Please add your Oregon data."),
+    ("functionhealth.csv", "Function Health Data", "table", "Please import your Function Health data."),
+    ("redacted_prenuvo_report.pdf", "Prenuvo Data", "pdf", "Please add your Prenuvo data."),
+    ("redacted_trudiagnostic_report.pdf", "Trudiagnostic Data", "pdf", "Please add your Trudiagnostic data."),
+    ("biostarks.csv", "Biostarks", "table", "Please add your Biostarks data."),
+]
+
+
+class _LRU:
+    """Bounded by entry count and, with ``size``, by the sum of ``size(value)``."""
+
+    def __init__(self, max_entries, max_bytes=None, size=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._size = size or (lambda value: 0)
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key, value):
+        size = self._size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._items[key] = (value, size)
+            self._bytes += size
+            while len(self._items) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._drop(next(iter(self._items)))
+
+    def _drop(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+
+
+def _frame_size(frame):
+    return int(frame.memory_usage(deep=True).sum())
+
+
+_frames = _LRU(FRAME_CACHE_ENTRIES, FRAME_CACHE_BYTES, _frame_size)
+_links = _LRU(FRAME_CACHE_ENTRIES)
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="biosnap-dashboard")
+
+
+def _from_shared(key):
+    data = get_cache().get(key)
+    if data is None:
+        return None
+    import pandas as pd
+    return pd.read_parquet(io.BytesIO(data))
+
+
+def _to_shared(key, path, frame, data):
+    # Parquet rather than pickle: reading a shared entry never runs code
+    if path.endswith(".parquet"):
+        get_cache().set(key, data, FRAME_TTL)
+        return
+    buffer = io.BytesIO()
+    try:
+        frame.to_parquet(buffer, engine="pyarrow", index=False)
+    except Exception as e:
+        logger.warning("not caching %s: %s", path, e)
+        return
+    get_cache().set(key, buffer.getvalue(), FRAME_TTL)
+
+
+def read_frame(storage, path, etag, remember=True):
+    """``path`` parsed as Parquet or CSV by its extension; cached per etag, so a
+    changed object is re-read.
+
+    ``remember=False`` skips this process's frame cache, for callers that keep
+    the frame themselves (session restores go through ``biosnap.session_data``).
+    """
+    cached = _frames.get((path, etag)) if etag and remember else None
+    if cached is not None:
+        return cached
+
+    # The etag only identifies content within one storage location
+    shared_key = f"frame:{storage.cache_namespace}:{path}:{etag}" if etag and storage.cache_namespace else None
+    frame = _from_shared(shared_key) if shared_key else None
+    if frame is None:
+        import pandas as pd
+        data = storage.download(path)
+        if path.endswith(".parquet"):
+            frame = pd.read_parquet(io.BytesIO(data))
+        else:
+            frame = pd.read_csv(io.BytesIO(data))
+        if shared_key:
+            _to_shared(shared_key, path, frame, data)
+    if etag and remember:
+        _frames.put((path, etag), frame)
+    return frame
+
+
+def _link(storage, path, etag):
+    # Reuse a link while it has at least half its lifetime left
+    cached = _links.get((path, etag))
+    if cached and cached[1] - time.time() > LINK_SECONDS / 2:
+        return cached[0]
+    url = storage.signed_url(path, LINK_SECONDS)
+    _links.put((path, etag), (url, time.time() + LINK_SECONDS))
+    return url
+
+
+def _fetch(storage, path, kind, etag):
+    if kind == "pdf":
+        return _link(storage, path, etag)
+    return read_frame(storage, path, etag)
+
+
+def load_dashboard(storage, username):
+    """One entry per artifact: ``{"file", "heading", "kind", "status", "value", "updated_at", "message"}``.
+
+    ``status`` is ``ok`` (``value`` is a DataFrame or a link), ``missing`` or ``error``.
+    """
+    with timed("dashboard.load"):
+        manifest = {entry["name"]: entry for entry in storage.list(username)}
+
+        futures = {}
+        for name, _, kind, _ in ARTIFACTS:
+            entry = manifest.get(name)
+            if entry is not None:
+                futures[name] = _executor.submit(_fetch, storage, f"{username}/{name}", kind, object_etag(entry))
+
+        views = []
+        for name, heading, kind, missing in ARTIFACTS:
+            view = {"file": name, "heading": heading, "kind": kind, "status": "missing",
+                    "value": None, "updated_at": None, "message": missing}
+            if name in futures:
+                view["updated_at"] = manifest[name].get("updated_at")
+                try:
+                    view.update(status="ok", value=futures[name].result(), message=None)
+                except Exception as e:
+                    view.update(status="error", message=f"There was an error retrieving this file: {e}")
+            views.append(view)
+        return views
@@ -0,0 +1,174 @@
+"""Versioned Function Health history.
+
+Every import is recorded as an append-only snapshot holding only the rows
+that changed since the previous import::
+
+    {username}/functionhealth/snapshots/{imported_at}.parquet   (added/changed/removed rows)
+    {username}/functionhealth/latest.parquet                    (latest value per biomarker)
+
+Rows are keyed by (category, name) and compared through a per-row hash of
+status, value and units stored in ``latest.parquet``, so an import never has
+to download earlier snapshots. ``as_of`` replays snapshots to rebuild the
+panel at any import and ``compare`` gives before/after deltas for the
+intervention program.
+"""
+
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from biosnap.biomarkers import read_parquet_bytes, to_parquet_bytes
+from biosnap.storage import ObjectNotFound
+
+KEY_COLUMNS = ["category", "name"]
+HASHED_COLUMNS = ["status", "value", "units"]
+LIST_OPTIONS = {"limit": 10000, "sortBy": {"column": "name", "order": "asc"}}
+
+
+def history_prefix(username):
+    return f"{username}/functionhealth"
+
+
+def latest_path(username):
+    return f"{history_prefix(username)}/latest.parquet"
+
+
+def snapshot_path(username, imported_at):
+    return f"{history_prefix(username)}/snapshots/{imported_at}.parquet"
+
+
+def new_import_timestamp():
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def row_hashes(typed_df):
+    # Hex strings rather than uint64: they survive outer merges without
+    # being coerced to float64 and losing precision.
+    hashes = pd.util.hash_pandas_object(typed_df[HASHED_COLUMNS].astype(str), index=False)
+    return hashes.map("{:016x}".format).to_numpy()
+
+
+def _read(bucket, path, upload_queue=None):
+    # A write still sitting in the upload queue is newer than what storage has
+    data = upload_queue.pending_data(path) if upload_queue else None
+    if data is None:
+        try:
+            data = bucket.download(path)
+        except ObjectNotFound:
+            return None
+    if not isinstance(data, bytes) or not data:
+        return None
+    return read_parquet_bytes(data)
+
+
+def _keyed(df):
+    keyed = df.copy()
+    for column in KEY_COLUMNS:
+        keyed[column] = keyed[column].astype(str)
+    return keyed
+
+
+def latest(bucket, username, upload_queue=None):
+    """Latest value per biomarker, or an empty frame before the first import."""
+    df = _read(bucket, latest_path(username), upload_queue)
+    return df if df is not None else pd.DataFrame(columns=KEY_COLUMNS + HASHED_COLUMNS + ["row_hash", "imported_at"])
+
+
+# === Record an import: diff against latest, write changed rows only ===
+def diff_against_latest(typed_df, previous):
+    current = _keyed(typed_df).drop_duplicates(KEY_COLUMNS, keep="last")
+    current["row_hash"] = row_hashes(current)
+
+    previous = _keyed(previous)[KEY_COLUMNS + ["row_hash"]]
+    merged = current.merge(previous, on=KEY_COLUMNS, how="left", suffixes=("", "_previous"), indicator=True)
+
+    added = merged["_merge"].eq("left_only")
+    changed = merged["_merge"].eq("both") & merged["row_hash"].ne(merged["row_hash_previous"])
+    merged["change"] = added.map({True: "added", False: "changed"})
+    changes = merged.loc[added | changed].drop(columns=["row_hash_previous", "_merge"])
+
+    removed_keys = previous.merge(current[KEY_COLUMNS], on=KEY_COLUMNS, how="left", indicator=True)
+    removed = removed_keys.loc[removed_keys["_merge"].eq("left_only"), KEY_COLUMNS]
+    removed = removed.assign(row_hash="", change="removed")
+
+    return current, pd.concat([changes, removed], ignore_index=True)
+
+
+def record_import(bucket, upload_queue, username, typed_df, imported_at=None):
+    """Queue a snapshot of changed rows and the refreshed latest index.
+
+    Returns a summary dict; no snapshot is written when nothing changed.
+    """
+    imported_at = imported_at or new_import_timestamp()
+    previous = latest(bucket, username, upload_queue)
+    current, changes = diff_against_latest(typed_df, previous)
+
+    summary = {
+        "imported_at": imported_at,
+        "added": int(changes["change"].eq("added").sum()),
+        "changed": int(changes["change"].eq("changed").sum()),
+        "removed": int(changes["change"].eq("removed").sum()),
+        "snapshot": None,
+    }
+    if changes.empty:
+        return summary
+
+    changes["imported_at"] = imported_at
+    summary["snapshot"] = snapshot_path(username, imported_at)
+    upload_queue.submit(summary["snapshot"], to_parquet_bytes(changes), "application/vnd.apache.parquet")
+
+    # Rows that did not change keep the timestamp of the import that last touched them
+    current["imported_at"] = imported_at
+    if not previous.empty and "imported_at" in previous:
+        unchanged = current.merge(
+            _keyed(previous)[KEY_COLUMNS + ["row_hash", "imported_at"]],
+            on=KEY_COLUMNS + ["row_hash"], how="left", suffixes=("", "_previous")
+        )["imported_at_previous"]
+        current["imported_at"] = unchanged.fillna(imported_at).to_numpy()
+    upload_queue.submit(latest_path(username), to_parquet_bytes(current), "application/vnd.apache.parquet")
+    return summary
+
+
+# === Reading history ===
+def list_snapshots(bucket, username):
+    # Listing a folder that does not exist yet returns no entries
+    files = bucket.list(f"{history_prefix(username)}/snapshots", LIST_OPTIONS)
+    return sorted(f["name"][:-len(".parquet")] for f in files if f["name"].endswith(".parquet"))
+
+
+def as_of(bucket, username, imported_at=None, snapshots=None):
+    """The panel as it stood after the import at ``imported_at`` (default: newest)."""
+    snapshots = snapshots if snapshots is not None else list_snapshots(bucket, username)
+    selected = [ts for ts in snapshots if imported_at is None or ts <= imported_at]
+
+    frames = [_read(bucket, snapshot_path(username, ts)) for ts in selected]
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=KEY_COLUMNS + HASHED_COLUMNS + ["value_num", "imported_at"])
+
+    replay = pd.concat([_keyed(f) for f in frames], ignore_index=True)
+    replay = replay.sort_values("imported_at", kind="stable").drop_duplicates(KEY_COLUMNS, keep="last")
+    return replay.loc[replay["change"].ne("removed")].drop(columns=["change"]).reset_index(drop=True)
+
+
+def compare(bucket, username, before=None, after=None):
+    """Before/after values per biomarker between two imports.
+
+    Defaults to the first and the most recent import.
+    """
+    snapshots = list_snapshots(bucket, username)
+    if not snapshots:
+        return pd.DataFrame()
+    before = before or snapshots[0]
+    after = after or snapshots[-1]
+
+    columns = KEY_COLUMNS + ["status", "value", "value_num", "unit_code"]
+    b = as_of(bucket, username, before, snapshots).reindex(columns=columns)
+    a = as_of(bucket, username, after, snapshots).reindex(columns=columns)
+
+    merged = b.merge(a, on=KEY_COLUMNS, how="outer", suffixes=("_before", "_after"))
+    merged["delta"] = merged["value_num_after"] - merged["value_num_before"]
+    base = merged["value_num_before"].abs()
+    merged["pct_change"] = (merged["delta"] / base.where(base > 0)) * 100
+    merged["status_changed"] = merged["status_before"].astype(str).ne(merged["status_after"].astype(str))
+    return merged.sort_values(KEY_COLUMNS).reset_index(drop=True)
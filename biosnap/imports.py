@@ -0,0 +1,32 @@
+"""The storage path for a finished Function Health import.
+
+Shared by the Streamlit tab and the admin batch runner so every import
+writes the same artifacts: the raw CSV, the typed Parquet and a history
+snapshot of the rows that changed.
+"""
+
+from biosnap.biomarkers import PARQUET_CONTENT_TYPE, normalize_biomarkers, to_parquet_bytes
+from biosnap.history import record_import
+
+
+def function_health_paths(username):
+    return f"{username}/functionhealth.csv", f"{username}/functionhealth.parquet"
+
+
+def save_function_health_import(username, function_df, upload_queue=None, bucket=None):
+    """Queue every artifact of an import; returns (csv_bytes, csv_ticket, history_summary)."""
+    if upload_queue is None:
+        from biosnap.uploads import get_upload_queue
+        upload_queue = get_upload_queue()
+    if bucket is None:
+        from biosnap.storage import get_storage
+        bucket = get_storage()
+
+    csv_path, parquet_path = function_health_paths(username)
+    csv_bytes = function_df.to_csv(index=False).encode()
+    typed_df = normalize_biomarkers(function_df)
+
+    csv_ticket = upload_queue.submit(csv_path, csv_bytes, "text/csv")
+    upload_queue.submit(parquet_path, to_parquet_bytes(typed_df), PARQUET_CONTENT_TYPE)
+    history = record_import(bucket, upload_queue, username, typed_df)
+    return csv_bytes, csv_ticket, history
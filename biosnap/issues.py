@@ -0,0 +1,365 @@
+"""Issue reports on redactions, kept as per-day logs plus an index.
+
+Layout under the reserved ``_issues/`` prefix (skipped by cohort export):
+
+    _issues/log/<YYYY-MM-DD>/<writer>.jsonl   one writer's events of that day
+    _issues/log/<YYYY-MM-DD>.jsonl            a compacted day
+    _issues/index.json                        every report's metadata (no text)
+
+A report is appended as ``{"event": "report", ...}``; resolving one appends
+``{"event": "status", ...}``. Events go to the log of the day they are
+written (``logged_on``), so a finished day never changes again. Each process
+is its own writer with a segment only it writes: it keeps the day's events
+in memory and uploads the whole segment through the queue, so appends read
+nothing and writers in different processes or replicas never overwrite each
+other. ``compact(day)`` folds a finished day's segments into the day log.
+
+Listing, filtering and resolving read only the index. Index writes from
+different processes can still race; each writer merges everything it wrote
+today into every index write, and ``rebuild_index()`` recreates the index
+from the logs (run it with ``compact`` from cron). Only the rebuild and
+``with_text`` walk the logs.
+
+Usage:
+    python -m biosnap.issues list [--type prenuvo] [--user GLC123] [--text]
+    python -m biosnap.issues resolve <issue_id> [<issue_id> ...]
+    python -m biosnap.issues compact <YYYY-MM-DD>
+    python -m biosnap.issues reindex
+    python -m biosnap.issues migrate    # import legacy <user>/issues/*.txt objects
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+PREFIX = "_issues"
+LOG_PREFIX = f"{PREFIX}/log"
+INDEX_PATH = f"{PREFIX}/index.json"
+OPEN = "open"
+RESOLVED = "resolved"
+METADATA = ("id", "day", "logged_on", "user", "report_type", "document_hash", "page", "created_at")
+LIST_OPTIONS = {"limit": 10000, "sortBy": {"column": "name", "order": "asc"}}
+# Unique per process: a segment has exactly one writer
+WRITER = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+_lock = threading.Lock()
+_segments = {}  # (writer, day) -> events this process wrote to that segment
+_written = {}   # writer -> {"day", "issues", "resolved"}: merged into each index write
+
+
+def log_path(day):
+    return f"{LOG_PREFIX}/{day}.jsonl"
+
+
+def segment_path(day, writer):
+    return f"{LOG_PREFIX}/{day}/{writer}.jsonl"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _today():
+    return _now().strftime("%Y-%m-%d")
+
+
+def _read(storage, upload_queue, path):
+    """Object bytes, preferring a queued write; None only when the object does not exist."""
+    from biosnap.storage import ObjectNotFound
+
+    data = upload_queue.pending_data(path)
+    if data is None:
+        try:
+            data = storage.download(path)
+        except ObjectNotFound:
+            return None
+    return data if isinstance(data, bytes) else None
+
+
+def _parse_log(data):
+    return [json.loads(line) for line in (data or b"").decode("utf-8").splitlines() if line.strip()]
+
+
+def _encode_log(events):
+    return "".join(json.dumps(e, sort_keys=True) + "\n" for e in events).encode("utf-8")
+
+
+def _read_index(storage, upload_queue):
+    data = _read(storage, upload_queue, INDEX_PATH)
+    if not data:
+        return {"issues": {}, "resolved": []}
+    return json.loads(data)
+
+
+def _write_index(upload_queue, index):
+    index["updated_at"] = _now().isoformat()
+    upload_queue.submit(INDEX_PATH, json.dumps(index, sort_keys=True).encode(), "application/json")
+
+
+def _append(upload_queue, events):
+    """Add events to this writer's segment for today; callers hold _lock."""
+    day = _today()
+    for key in [key for key in _segments if key[0] == WRITER and key[1] != day]:
+        del _segments[key]  # finished days are already uploaded
+    segment = _segments.setdefault((WRITER, day), [])
+    segment.extend(events)
+    upload_queue.submit(segment_path(day, WRITER), _encode_log(segment), "application/x-ndjson")
+
+
+def _publish(upload_queue, index, issues=(), resolved=()):
+    """Write the index with everything this writer logged today, which a
+    concurrent write from another process may have dropped."""
+    day = _today()
+    mine = _written.get(WRITER)
+    if mine is None or mine["day"] != day:
+        mine = _written[WRITER] = {"day": day, "issues": {}, "resolved": set()}
+    mine["issues"].update((issue["id"], issue) for issue in issues)
+    mine["resolved"].update(resolved)
+    index["issues"].update(mine["issues"])
+    index["resolved"] = sorted(set(index["resolved"]) | mine["resolved"])
+    _write_index(upload_queue, index)
+
+
+def _defaults(storage, upload_queue):
+    if storage is None:
+        from biosnap.storage import get_storage
+        storage = get_storage()
+    if upload_queue is None:
+        from biosnap.uploads import get_upload_queue
+        upload_queue = get_upload_queue()
+    return storage, upload_queue
+
+
+def document_hash(data):
+    return hashlib.sha256(data).hexdigest() if data else None
+
+
+# === Writing ===
+def submit_issue(user, report_type, text, document=None, page=None,
+                 storage=None, upload_queue=None, created_at=None, issue_id=None):
+    """Append a report; returns its id."""
+    storage, upload_queue = _defaults(storage, upload_queue)
+    created = created_at or _now()
+    report = {
+        "event": "report",
+        "id": issue_id or uuid.uuid4().hex[:12],
+        "day": created.strftime("%Y-%m-%d"),
+        "logged_on": _today(),
+        "user": user,
+        "report_type": report_type,
+        "document_hash": document_hash(document),
+        "page": page,
+        "created_at": created.isoformat(),
+        "text": text,
+    }
+
+    with _lock:
+        # Read first: a failed read must not leave a report the index never learns of
+        index = _read_index(storage, upload_queue)
+        _append(upload_queue, [report])
+        _publish(upload_queue, index, issues=[{key: report[key] for key in METADATA}])
+    return report["id"]
+
+
+def resolve(issue_ids, storage=None, upload_queue=None):
+    """Mark open issues resolved; returns the ids that were open."""
+    storage, upload_queue = _defaults(storage, upload_queue)
+    with _lock:
+        index = _read_index(storage, upload_queue)
+        resolved = set(index["resolved"])
+        closing = [issue_id for issue_id in dict.fromkeys(issue_ids)
+                   if issue_id in index["issues"] and issue_id not in resolved]
+        if not closing:
+            return []
+        at = _now().isoformat()
+        _append(upload_queue, [{"event": "status", "id": issue_id, "status": RESOLVED, "at": at}
+                               for issue_id in closing])
+        _publish(upload_queue, index, resolved=closing)
+    return closing
+
+
+# === Day logs ===
+def _list(storage, path):
+    # Folders come back without an id
+    return storage.list(path, LIST_OPTIONS)
+
+
+def _day_events(storage, upload_queue, day, segments=None):
+    """The compacted log of ``day`` followed by its segments, this process's unsent ones included."""
+    if segments is None:
+        segments = [entry["name"] for entry in _list(storage, f"{LOG_PREFIX}/{day}") if entry.get("id") is not None]
+    events = _parse_log(_read(storage, upload_queue, log_path(day)))
+    for name in segments:
+        events += _parse_log(_read(storage, upload_queue, f"{LOG_PREFIX}/{day}/{name}"))
+    for (writer, segment_day), segment in _segments.items():
+        if segment_day == day and f"{writer}.jsonl" not in segments:
+            events += segment
+    return events
+
+
+def _fold(events):
+    """One report per id and the latest status event per id."""
+    reports, statuses = {}, {}
+    for event in events:
+        if event.get("event") == "report":
+            reports.setdefault(event["id"], event)
+        elif event.get("event") == "status":
+            if event["id"] not in statuses or event["at"] > statuses[event["id"]]["at"]:
+                statuses[event["id"]] = event
+    return list(reports.values()) + list(statuses.values())
+
+
+def compact(day, storage=None, upload_queue=None):
+    """Fold a finished day's segments into its day log; returns the number of events kept."""
+    from biosnap.uploads import SAVED
+
+    storage, upload_queue = _defaults(storage, upload_queue)
+    if day >= (_now() - timedelta(days=1)).strftime("%Y-%m-%d"):
+        raise ValueError(f"{day} may still be written to; only days before yesterday are compacted")
+    with _lock:
+        segments = [entry["name"] for entry in _list(storage, f"{LOG_PREFIX}/{day}") if entry.get("id") is not None]
+        events = _fold(_day_events(storage, upload_queue, day, segments))
+        ticket = upload_queue.submit(log_path(day), _encode_log(events), "application/x-ndjson")
+    # Segments of a finished day no longer change; drop them once the day log is saved
+    upload_queue.drain()
+    if segments and upload_queue.status(ticket) == SAVED:
+        storage.remove([f"{LOG_PREFIX}/{day}/{name}" for name in segments])
+    return len(events)
+
+
+def rebuild_index(storage=None, upload_queue=None):
+    """Recreate the index from the day logs; returns the number of reports."""
+    storage, upload_queue = _defaults(storage, upload_queue)
+    with _lock:
+        days = set()
+        for entry in _list(storage, LOG_PREFIX):
+            name = entry["name"]
+            days.add(name if entry.get("id") is None else name[:-len(".jsonl")])
+        days.update(day for _, day in _segments)
+
+        issues, resolved = {}, set()
+        for day in sorted(days):
+            for event in _fold(_day_events(storage, upload_queue, day)):
+                if event["event"] == "report":
+                    issues[event["id"]] = {key: event.get(key) for key in METADATA}
+                elif event["status"] == RESOLVED:
+                    resolved.add(event["id"])
+        _write_index(upload_queue, {"issues": issues, "resolved": sorted(resolved)})
+    return len(issues)
+
+
+# === Reading ===
+def _open_issues(index):
+    resolved = set(index["resolved"])
+    return [issue for issue_id, issue in index["issues"].items() if issue_id not in resolved]
+
+
+def list_issues(report_type=None, user=None, with_text=False, storage=None, upload_queue=None):
+    """Open issues, newest first, from the index; ``with_text`` also reads their day logs."""
+    storage, upload_queue = _defaults(storage, upload_queue)
+    issues = [
+        issue for issue in _open_issues(_read_index(storage, upload_queue))
+        if (report_type is None or issue["report_type"] == report_type)
+        and (user is None or issue["user"] == user)
+    ]
+    if with_text:
+        texts = {}
+        for day in {issue["logged_on"] for issue in issues}:
+            texts.update({event["id"]: event.get("text") for event in _day_events(storage, upload_queue, day)
+                          if event.get("event") == "report"})
+        issues = [{**issue, "text": texts.get(issue["id"])} for issue in issues]
+    return sorted(issues, key=lambda issue: issue["created_at"], reverse=True)
+
+
+def _count(issues, key):
+    counts = {}
+    for issue in issues:
+        counts[issue[key]] = counts.get(issue[key], 0) + 1
+    return counts
+
+
+def summary(storage=None, upload_queue=None):
+    """Open issues, and every report counted by day, type and user."""
+    storage, upload_queue = _defaults(storage, upload_queue)
+    index = _read_index(storage, upload_queue)
+    issues = list(index["issues"].values())
+    return {"open": len(_open_issues(index)), "days": _count(issues, "day"),
+            "by_type": _count(issues, "report_type"), "by_user": _count(issues, "user")}
+
+
+# === Legacy one-object-per-report files ===
+def legacy_id(path):
+    """Stable id for a legacy object, so migrating twice imports it once."""
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()[:12]
+
+
+def migrate_legacy(storage=None, upload_queue=None):
+    """Import ``<user>/issues/issue_<timestamp>.txt`` objects not imported yet; they are left in place."""
+    from biosnap.cohort_export import LIST_OPTIONS, list_participants
+
+    storage, upload_queue = _defaults(storage, upload_queue)
+    known = set(_read_index(storage, upload_queue)["issues"])
+    imported = 0
+    for user in list_participants(storage):
+        for entry in storage.list(f"{user}/issues", LIST_OPTIONS):
+            name = entry["name"]
+            if entry.get("id") is None or not name.startswith("issue_"):
+                continue
+            path = f"{user}/issues/{name}"
+            if legacy_id(path) in known:
+                continue
+            try:
+                created = datetime.strptime(name[len("issue_"):-len(".txt")], "%Y-%m-%d_%H-%M-%S-%f")
+            except ValueError:
+                continue
+            text = storage.download(path).decode("utf-8", errors="replace")
+            submit_issue(user, "legacy", text, storage=storage, upload_queue=upload_queue,
+                         created_at=created.replace(tzinfo=timezone.utc), issue_id=legacy_id(path))
+            imported += 1
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triage redaction issue reports.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="open issues")
+    listing.add_argument("--type", dest="report_type")
+    listing.add_argument("--user")
+    listing.add_argument("--text", action="store_true", help="include report text (reads the day logs)")
+    commands.add_parser("summary", help="counts by day, type and user")
+    resolving = commands.add_parser("resolve", help="mark issues resolved")
+    resolving.add_argument("ids", nargs="+")
+    compacting = commands.add_parser("compact", help="fold a finished day's segments into its log")
+    compacting.add_argument("day")
+    commands.add_parser("reindex", help="rebuild the index from the day logs")
+    commands.add_parser("migrate", help="import legacy per-report objects")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.command == "list":
+        result = list_issues(args.report_type, args.user, with_text=args.text)
+    elif args.command == "summary":
+        result = summary()
+    elif args.command == "resolve":
+        result = resolve(args.ids)
+    elif args.command == "compact":
+        result = compact(args.day)
+    elif args.command == "reindex":
+        result = rebuild_index()
+    else:
+        result = migrate_legacy()
+
+    from biosnap.uploads import get_upload_queue
+    get_upload_queue().drain()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
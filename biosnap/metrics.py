@@ -0,0 +1,220 @@
+"""Lightweight timing instrumentation for hot paths.
+
+Wrap an operation in ``timed("storage.upload", path=...)`` to record its
+duration, payload size and outcome. Aggregates are kept per process and can
+be exported as Prometheus text (``render_prometheus``) or JSON
+(``snapshot``). Setting ``BIOSNAP_METRICS_LOG=1`` also emits one structured
+JSON log line per operation, and ``BIOSNAP_METRICS_PORT`` makes the Streamlit
+app serve ``/metrics`` from a background thread.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("biosnap.metrics")
+
+# Seconds; scrape stages run to tens of seconds, storage calls to milliseconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Labels that identify a series. Anything else passed to ``timed`` (paths,
+# usernames) only goes to the JSON log so series cardinality stays bounded.
+SERIES_LABELS = ("stage", "engine", "call", "bucket")
+
+_lock = threading.Lock()
+_series = {}
+_gauge_sources = []
+_log_enabled = os.getenv("BIOSNAP_METRICS_LOG", "").lower() in ("1", "true", "yes")
+
+if _log_enabled and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class _Aggregate:
+    __slots__ = ("count", "total_seconds", "max_seconds", "bytes", "bucket_counts")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.bucket_counts = [0] * len(BUCKETS)
+
+    def add(self, seconds, nbytes):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes += nbytes
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+
+
+class Span:
+    """Handle yielded by ``timed``; set ``bytes`` once the payload is known."""
+
+    def __init__(self, operation, labels):
+        self.operation = operation
+        self.labels = labels
+        self.bytes = 0
+        self.outcome = "ok"
+
+
+def record(operation, seconds, outcome="ok", nbytes=0, **labels):
+    series = tuple(sorted((k, str(v)) for k, v in labels.items() if k in SERIES_LABELS))
+    key = (operation, series, outcome)
+    with _lock:
+        agg = _series.get(key)
+        if agg is None:
+            agg = _series[key] = _Aggregate()
+        agg.add(seconds, nbytes or 0)
+
+    if _log_enabled:
+        logger.info(json.dumps({
+            "ts": time.time(),
+            "op": operation,
+            "outcome": outcome,
+            "ms": round(seconds * 1000, 2),
+            "bytes": nbytes or 0,
+            **{k: str(v) for k, v in labels.items()},
+        }))
+
+
+@contextmanager
+def timed(operation, **labels):
+    span = Span(operation, labels)
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        # st.rerun()/st.stop() unwind via exceptions; they are not failures.
+        if type(e).__name__ not in ("RerunException", "StopException"):
+            span.outcome = "error"
+        raise
+    finally:
+        record(operation, time.perf_counter() - start, span.outcome, span.bytes, **labels)
+
+
+def register_gauges(source):
+    """Render ``source()``'s ``{name: value}`` as gauges on every /metrics scrape."""
+    _gauge_sources.append(source)
+
+
+def reset():
+    with _lock:
+        _series.clear()
+
+
+def snapshot():
+    with _lock:
+        items = [(key, agg.count, agg.total_seconds, agg.max_seconds, agg.bytes) for key, agg in _series.items()]
+
+    return [
+        {
+            "op": operation,
+            "labels": dict(series),
+            "outcome": outcome,
+            "count": count,
+            "total_seconds": round(total, 6),
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            "max_ms": round(max_seconds * 1000, 3),
+            "bytes": nbytes,
+        }
+        for (operation, series, outcome), count, total, max_seconds, nbytes in sorted(items)
+    ]
+
+
+# === Prometheus text exposition ===
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _label_str(pairs):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    with _lock:
+        items = sorted(
+            (key, agg.count, agg.total_seconds, agg.bytes, list(agg.bucket_counts))
+            for key, agg in _series.items()
+        )
+
+    lines = [
+        "# HELP biosnap_operation_seconds Duration of instrumented operations.",
+        "# TYPE biosnap_operation_seconds histogram",
+    ]
+    for (operation, series, outcome), count, total, _, buckets in items:
+        base = [("op", operation), *series, ("outcome", outcome)]
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            lines.append(f"biosnap_operation_seconds_bucket{_label_str(base + [('le', bound)])} {bucket_count}")
+        lines.append(f"biosnap_operation_seconds_bucket{_label_str(base + [('le', '+Inf')])} {count}")
+        lines.append(f"biosnap_operation_seconds_sum{_label_str(base)} {total:.6f}")
+        lines.append(f"biosnap_operation_seconds_count{_label_str(base)} {count}")
+
+    lines += [
+        "# HELP biosnap_operation_bytes_total Payload bytes moved by instrumented operations.",
+        "# TYPE biosnap_operation_bytes_total counter",
+    ]
+    for (operation, series, outcome), _, _, nbytes, _ in items:
+        lines.append(f"biosnap_operation_bytes_total{_label_str([('op', operation), *series, ('outcome', outcome)])} {nbytes}")
+
+    for source in list(_gauge_sources):
+        try:
+            gauges = source()
+        except Exception as e:
+            logger.warning("gauge source failed: %s", e)
+            continue
+        for name, value in gauges.items():
+            lines += [f"# TYPE biosnap_{name} gauge", f"biosnap_{name} {value}"]
+
+    return "\n".join(lines) + "\n"
+
+
+# === Standalone /metrics endpoint for processes without a web framework ===
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(snapshot()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = render_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port=None):
+    """Serve /metrics and /metrics.json once per process; no-op without a port."""
+    global _server
+    port = port or os.getenv("BIOSNAP_METRICS_PORT")
+    if not port:
+        return None
+
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            except OSError as e:
+                logger.warning("metrics server not started on port %s: %s", port, e)
+                return None
+            threading.Thread(target=_server.serve_forever, name="biosnap-metrics", daemon=True).start()
+    return _server
@@ -0,0 +1,143 @@
+"""Compact PDF output.
+
+Redaction leaves the removed content's objects, duplicate resources and
+uncompressed streams in the document. ``save_compact`` drops unreferenced
+objects and merges duplicates (``garbage=4``), cleans content streams and
+deflates every stream into object streams. With ``BIOSNAP_PDF_IMAGE_DPI``
+set, embedded images above that resolution are first resampled to it
+(JPEG at ``BIOSNAP_PDF_IMAGE_QUALITY``).
+
+Each call returns a size report, and the ``pdf.compact`` metric logs the
+before/after sizes per file.
+
+Usage (re-compacts redacted reports already in storage, one JSON line per file):
+    python -m biosnap.pdf_compact [--dry-run] [--image-dpi 150]
+"""
+
+import argparse
+import json
+import os
+
+import fitz
+
+from biosnap.metrics import timed
+
+IMAGE_DPI = int(os.getenv("BIOSNAP_PDF_IMAGE_DPI", "0"))
+IMAGE_QUALITY = int(os.getenv("BIOSNAP_PDF_IMAGE_QUALITY", "80"))
+# Images only slightly above the target are left alone rather than re-encoded
+IMAGE_DPI_MARGIN = 10
+
+SAVE_OPTIONS = {
+    "garbage": 4,
+    "clean": True,
+    "deflate": True,
+    "deflate_images": True,
+    "deflate_fonts": True,
+    "use_objstms": 1,
+}
+REPORT_FILES = ("redacted_prenuvo_report.pdf", "redacted_trudiagnostic_report.pdf")
+
+
+def size_report(before_bytes, after_bytes):
+    return {
+        "before_bytes": before_bytes,
+        "after_bytes": after_bytes,
+        "saved_bytes": before_bytes - after_bytes,
+        "reduction": round(1 - after_bytes / before_bytes, 3) if before_bytes else 0.0,
+    }
+
+
+def _image_dpis(doc):
+    """``{xref: (dpi, page number)}``: the highest DPI each image is drawn at and a page showing it."""
+    dpis = {}
+    for page in doc:
+        for image in page.get_images(full=True):
+            xref, smask, width = image[0], image[1], image[2]
+            if smask:
+                # Re-encoding as JPEG would drop the transparency mask
+                continue
+            for rect in page.get_image_rects(xref):
+                dpi = width * 72 / rect.width if rect.width > 0 else 0
+                if dpi > dpis.get(xref, (0, None))[0]:
+                    dpis[xref] = (dpi, page.number)
+    return dpis
+
+
+def _downsample(doc, image_dpi):
+    """Resample images drawn above ``image_dpi`` to it as JPEG; returns how many were replaced."""
+    if image_dpi <= 0:
+        return 0
+    replaced = 0
+    for xref, (dpi, page_number) in _image_dpis(doc).items():
+        if dpi <= image_dpi + IMAGE_DPI_MARGIN:
+            continue
+        pix = fitz.Pixmap(doc, xref)
+        if pix.alpha or pix.n not in (1, 3):
+            pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+        scale = image_dpi / dpi
+        pix = fitz.Pixmap(pix, max(1, round(pix.width * scale)), max(1, round(pix.height * scale)))
+        # Replacing the xref changes the image on every page that shows it
+        doc[page_number].replace_image(xref, stream=pix.tobytes("jpg", jpg_quality=IMAGE_QUALITY))
+        replaced += 1
+    return replaced
+
+
+def save_compact(doc, output_path, before_bytes, engine, image_dpi=IMAGE_DPI):
+    """Write ``doc`` compacted to ``output_path``; ``before_bytes`` is what the report compares against."""
+    with timed("pdf.compact", engine=engine, before_bytes=before_bytes) as span:
+        _downsample(doc, image_dpi)
+        doc.save(output_path, **SAVE_OPTIONS)
+        span.bytes = os.path.getsize(output_path)
+    return size_report(before_bytes, span.bytes)
+
+
+def compact_bytes(data, engine, image_dpi=IMAGE_DPI):
+    """Compacted copy of a PDF held in memory, with its size report."""
+    with timed("pdf.compact", engine=engine, before_bytes=len(data)) as span:
+        doc = fitz.open(stream=data, filetype="pdf")
+        _downsample(doc, image_dpi)
+        compacted = doc.tobytes(**SAVE_OPTIONS)
+        doc.close()
+        span.bytes = len(compacted)
+    return compacted, size_report(len(data), len(compacted))
+
+
+def compact_stored_reports(storage=None, dry_run=False, image_dpi=IMAGE_DPI):
+    """Re-compact every participant's redacted reports; a file is rewritten only if it shrinks."""
+    from biosnap.cohort_export import list_participants
+    from biosnap.storage import get_storage
+
+    storage = storage or get_storage()
+    results = []
+    for user in list_participants(storage):
+        present = {entry["name"] for entry in storage.list(user)}
+        for name in REPORT_FILES:
+            if name not in present:
+                continue
+            path = f"{user}/{name}"
+            compacted, report = compact_bytes(storage.download(path), "stored", image_dpi)
+            report.update(path=path, written=report["saved_bytes"] > 0 and not dry_run)
+            if report["written"]:
+                storage.upload(path, compacted, "application/pdf")
+            print(json.dumps(report))
+            results.append(report)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact redacted PDFs already in storage.")
+    parser.add_argument("--dry-run", action="store_true", help="report savings without rewriting files")
+    parser.add_argument("--image-dpi", type=int, default=IMAGE_DPI, help="downsample images above this DPI (0 = keep)")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    results = compact_stored_reports(dry_run=args.dry_run, image_dpi=args.image_dpi)
+    before = sum(r["before_bytes"] for r in results)
+    after = sum(r["after_bytes"] for r in results)
+    print(json.dumps({"files": len(results), **size_report(before, after)}))
+
+
+if __name__ == "__main__":
+    main()
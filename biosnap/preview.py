@@ -0,0 +1,77 @@
+"""Review previews for redacted PDFs.
+
+Rendering pulls in PyMuPDF and the components API, so the app imports this
+module only while a redacted report is waiting for review. When the
+redaction engine's verification report is available, only page 1 and the
+pages it flagged are rendered by default.
+"""
+
+import base64
+
+import fitz
+import streamlit as st
+import streamlit.components.v1 as components
+
+from biosnap.metrics import timed
+
+
+# === Summary of the redaction engine's residual-PII check ===
+def _render_verification(report):
+    if report["flagged"]:
+        st.warning(
+            "Our automatic check found details that may not have been removed on page(s) "
+            f"{', '.join(str(n) for n in report['flagged'])}. Please look at them closely, "
+            "and report an issue if anything personal is still visible."
+        )
+        for number in report["flagged"]:
+            # Results served from the shared cache carry the rule but not the matched text
+            found = "; ".join(
+                f"{hit['rule']}: \u201c{hit['text']}\u201d" if hit.get("text") else hit["rule"]
+                for hit in report["hits"][number]
+            )
+            st.markdown(f"- **Page {number}:** {found}")
+    else:
+        st.info(f"Our automatic check found no remaining personal details on any of the {report['pages']} pages.")
+
+
+# === Download link + scrollable page preview for a redacted report ===
+def render_pdf_review(file_bytes, download_name, report=None):
+    """``report`` is the redaction engine's verification report; with one, only
+    page 1 and the flagged pages are rendered unless the reviewer asks for all."""
+    base64_pdf = base64.b64encode(file_bytes).decode("utf-8")
+    st.markdown(f"""
+        <div style='font-size:17.5px; line-height:1.6; margin-bottom:1rem;'>
+        <a href="data:application/pdf;base64,{base64_pdf}" download="{download_name}">Click here to download your redacted report.</a><br>
+        Or scroll through the preview below to review each page.
+        </div>
+    """, unsafe_allow_html=True)
+
+    pages = None
+    if report is not None:
+        _render_verification(report)
+        if not st.toggle("Show all pages", key=f"{download_name}_all_pages"):
+            pages = {1, *report["flagged"]}
+            st.caption(f"Showing page(s) {', '.join(str(n) for n in sorted(pages))} of {report['pages']}.")
+
+    with timed("preview.render") as span:
+        doc = fitz.open(stream=file_bytes, filetype="pdf")
+        page_images = [
+            page.get_pixmap(dpi=150).tobytes("png")
+            for number, page in enumerate(doc, start=1)
+            if (pages is None or number in pages) and page.get_text().strip()
+        ]
+        doc.close()
+        span.bytes = sum(len(img) for img in page_images)
+
+    img_html_blocks = [
+        f"<img src='data:image/png;base64,{base64.b64encode(img).decode()}' style='width:100%; margin-bottom: 1.5rem;'/>"
+        for img in page_images
+    ]
+
+    scrollable_html = f"""
+    <div style='height:650px; overflow-y:scroll; border:1px solid #ccc; padding:12px; background-color:#f9f9f9;'>
+        {''.join(img_html_blocks)}
+    </div>
+    """
+
+    components.html(scrollable_html, height=670, scrolling=False)
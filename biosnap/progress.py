@@ -0,0 +1,231 @@
+"""Throttled progress reporting for long-running operations.
+
+A ``Progress`` follows one operation (a scrape, a redaction, an upload)
+through named stages. Each stage covers a slice of the overall percentage
+and can count items; updates are coalesced so sinks see at most
+``BIOSNAP_PROGRESS_FPS`` frames a second, plus one frame whenever the stage
+changes and a final one. A frame is a plain dict with the stage, message,
+item counts, percent and an ETA from the stage's item rate.
+
+Every frame is also published to the process-wide ``ProgressHub``, which
+keeps the latest frame per operation id. The hub is per process, so
+``flask_backend`` streams (as server-sent events) and reports only the
+operations running on the worker itself, i.e. its scrape jobs; the app's
+own redactions and uploads report through their ``Progress`` sinks.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("biosnap.progress")
+
+FPS = float(os.getenv("BIOSNAP_PROGRESS_FPS", "4"))
+RETAIN_SECONDS = 300
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Progress:
+    def __init__(self, operation, sinks=(), operation_id=None, fps=FPS, hub=None):
+        self.id = operation_id or uuid.uuid4().hex
+        self.operation = operation
+        self._sinks = list(sinks)
+        self._hub = hub if hub is not None else get_progress_hub()
+        self._interval = 1.0 / fps if fps > 0 else 0.0
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_emit = None
+        self._state = RUNNING
+        self._stage = None
+        self._message = ""
+        self._start = 0
+        self._end = 0
+        self._done = 0
+        self._total = None
+        self._stage_started = self._started
+
+    def stage(self, name, message, start, end=None, total=None):
+        """Enter ``name``; its items move the bar from ``start`` to ``end`` percent."""
+        with self._lock:
+            self._stage = name
+            self._message = message
+            self._start = start
+            self._end = start if end is None else end
+            self._done = 0
+            self._total = total
+            self._stage_started = time.monotonic()
+        self._emit(force=True)
+
+    def update(self, done=None, total=None, message=None):
+        with self._lock:
+            if done is not None:
+                self._done = done
+            if total is not None:
+                self._total = total
+            if message is not None:
+                self._message = message
+        self._emit()
+
+    def advance(self, count=1, message=None):
+        with self._lock:
+            self._done += count
+            if message is not None:
+                self._message = message
+        self._emit()
+
+    def relay(self, frame):
+        """Adopt a frame of the same operation running in another process."""
+        with self._lock:
+            changed = frame["stage"] != self._stage
+            if changed:
+                self._stage = frame["stage"]
+                self._stage_started = time.monotonic()
+            self._message = frame["message"]
+            self._start = self._end = frame["percent"]
+            self._done = frame["done"]
+            self._total = frame["total"]
+        self._emit(force=changed)
+
+    def finish(self, message="Done"):
+        with self._lock:
+            self._state = DONE
+            self._message = message
+            self._start = self._end = 100
+            self._total = None
+        self._emit(force=True)
+
+    def fail(self, error):
+        with self._lock:
+            self._state = FAILED
+            self._message = str(error)
+        self._emit(force=True)
+
+    def frame(self):
+        with self._lock:
+            now = time.monotonic()
+            percent = self._start
+            eta = None
+            if self._total:
+                fraction = min(1.0, self._done / self._total)
+                percent = self._start + (self._end - self._start) * fraction
+                if self._done:
+                    rate = (now - self._stage_started) / self._done
+                    eta = round(max(0, self._total - self._done) * rate, 1)
+            return {
+                "id": self.id,
+                "operation": self.operation,
+                "state": self._state,
+                "stage": self._stage,
+                "message": self._message,
+                "done": self._done,
+                "total": self._total,
+                "percent": int(percent),
+                "eta_seconds": eta,
+                "elapsed_seconds": round(now - self._started, 1),
+            }
+
+    def _emit(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._last_emit is not None and now - self._last_emit < self._interval:
+                return
+            self._last_emit = now
+        frame = self.frame()
+        self._hub.publish(frame)
+        for sink in self._sinks:
+            try:
+                sink(frame)
+            except Exception as e:
+                logger.warning("progress sink failed for %s: %s", self.operation, e)
+
+
+def describe(frame):
+    """One-line status text for a frame, e.g. "Importing... 40/120 · about 12s left"."""
+    text = frame["message"]
+    if frame["total"]:
+        text += f" {frame['done']}/{frame['total']}"
+    if frame["eta_seconds"]:
+        text += f" · about {max(1, round(frame['eta_seconds']))}s left"
+    return text
+
+
+def placeholder_sink(status=None, bar=None):
+    """Sink writing frames to a Streamlit ``st.empty()`` slot and ``st.progress`` bar."""
+    def sink(frame):
+        if status is not None:
+            status.write(describe(frame))
+        if bar is not None:
+            bar.progress(min(100, max(0, frame["percent"])))
+    return sink
+
+
+class ProgressHub:
+    def __init__(self, retain=RETAIN_SECONDS):
+        self.retain = retain
+        self._cond = threading.Condition()
+        self._frames = {}  # id -> (sequence, frame, published at)
+        self._sequence = 0
+
+    def publish(self, frame):
+        with self._cond:
+            self._sequence += 1
+            self._frames[frame["id"]] = (self._sequence, frame, time.monotonic())
+            self._prune()
+            self._cond.notify_all()
+
+    def latest(self, operation_id):
+        with self._cond:
+            entry = self._frames.get(operation_id)
+            return entry[1] if entry else None
+
+    def active(self):
+        with self._cond:
+            return [frame for _, frame, _ in self._frames.values() if frame["state"] == RUNNING]
+
+    def stream(self, operation_id, idle_timeout=60.0):
+        """Yield each new frame for ``operation_id`` until it ends or goes quiet."""
+        seen = 0
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + idle_timeout
+                while True:
+                    entry = self._frames.get(operation_id)
+                    if entry and entry[0] > seen:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    self._cond.wait(timeout=remaining)
+            seen, frame, _ = entry
+            yield frame
+            if frame["state"] != RUNNING:
+                return
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.retain
+        # Operations that never finished (e.g. a killed rerun) age out too
+        stale = [key for key, (_, _, published) in self._frames.items() if published < cutoff]
+        for key in stale:
+            del self._frames[key]
+
+
+def format_sse(frame):
+    return f"event: progress\ndata: {json.dumps(frame)}\n\n"
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_progress_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = ProgressHub()
+        return _hub
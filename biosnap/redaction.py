@@ -0,0 +1,263 @@
+"""PDF redaction engines for Prenuvo and Trudiagnostic reports.
+
+PyMuPDF is only needed once a report has been uploaded, so the app imports
+this module lazily from the upload handlers.
+
+Output is saved compacted (``biosnap.pdf_compact``). Each engine then
+re-reads it (``verify_redaction``) and returns a per-page report of rule
+and patient-name matches that survived, so review can focus on the
+flagged pages; its ``size`` entry compares the output with the upload.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+import fitz
+
+from biosnap import pdf_compact
+from biosnap.metrics import timed
+from biosnap.pdf_compact import save_compact
+from biosnap.progress import Progress
+
+RESULT_TTL = float(os.getenv("BIOSNAP_CACHE_REDACTION_SECONDS", "3600"))
+# Bump when an engine changes in ways its rules and save options do not show
+ENGINE_VERSION = 2
+
+# (rule, pattern) pairs; the rule names are shown to participants in review
+PRENUVO_RULES = [
+    ("time of scan", r"Time of scan:\s?.*"),
+    ("sex", r"Sex:\s?.*"),
+    ("sex", r"\b(Male|Female|Other|Non-Binary|Transgender|Intersex)\b"),
+    ("height", r"Height:\s?.*"),
+    ("weight", r"Weight:\s?.*"),
+    ("date of birth", r"Date of Birth:\s?.*"),
+    ("date", r"\b\d{4}-\d{2}-\d{2}\b"),
+    ("facility", r"Facility:\s?.*"),
+    ("patient", r"Patient:\s?.*"),
+    ("study id", r"Study:\s?[a-f0-9\-]{36}"),
+    ("report recipient", r"REPORT RECIPIENT\(S\):\s?.*"),
+]
+
+TRUDIAGNOSTIC_FIRST_PAGE_RULES = [
+    ("sex", r"Sex:\s*\w+"),
+    ("age", r"Age:\s*\d+"),
+    ("link", r"https?://[^\s]+"),
+    ("link", r"www\.[^\s]+"),
+]
+# Blocks containing these are redacted whole: sample details on page 1, footers everywhere
+TRUDIAGNOSTIC_SAMPLE_KEYWORDS = ["ID#:", "Collected:", "Reported:"]
+TRUDIAGNOSTIC_FOOTER = ["PROVIDED BY:", "trudiagnostic.com", "trudiagnostic/apireports.aspx"]
+
+# Words on one line only: a name must not run into the label on the next line
+NAME_PATTERN = r"[A-Z][a-z]+(?:[ \t]+[A-Z][a-z]+)+"
+
+
+def _keyword_rule(rule, keywords):
+    return rule, "|".join(re.escape(keyword) for keyword in keywords)
+
+
+# === Residual PII check on a redacted PDF ===
+def verify_redaction(path, rules, first_page_rules=(), names=()):
+    """Re-extract the text of ``path`` and report what still matches.
+
+    ``rules`` apply to every page and ``first_page_rules`` to page 1 only;
+    ``names`` are checked word by word (first, middle and last name, each
+    case-insensitive), so a first or last name left on its own is caught
+    too. Returns
+    ``{"pages": n, "flagged": [page, ...], "hits": {page: [{"rule", "text"}]}}``
+    with 1-based page numbers.
+    """
+    # Initials are too short to flag on their own
+    tokens = {part for name in names if name for part in re.findall(r"[^\W\d_]{2,}", name)}
+    name_patterns = [re.compile(rf"\b{re.escape(token)}\b", re.IGNORECASE) for token in sorted(tokens)]
+    doc = fitz.open(path)
+    report = {"pages": len(doc), "flagged": [], "hits": {}}
+    for number, page in enumerate(doc, start=1):
+        text = page.get_text()
+        page_rules = list(rules) + (list(first_page_rules) if number == 1 else [])
+        hits = [
+            {"rule": rule, "text": match.group().strip()[:80]}
+            for rule, pattern in page_rules
+            for match in re.finditer(pattern, text)
+        ]
+        hits += [{"rule": "patient name", "text": match.group()} for pattern in name_patterns
+                 for match in pattern.finditer(text)]
+        if hits:
+            report["flagged"].append(number)
+            report["hits"][number] = hits
+    doc.close()
+    return report
+
+
+def _verify(engine, output_path, progress, **rules):
+    progress.stage("verify", "Checking for remaining personal details...", 97)
+    with timed("redaction.verify", engine=engine):
+        return verify_redaction(output_path, **rules)
+
+
+# === Prenuvo Redaction Function ===
+def redact_prenuvo_pdf(input_path, output_path, progress=None):
+    """Redact ``input_path`` into ``output_path``; returns the ``verify_redaction`` report."""
+    progress = progress or Progress("redaction.prenuvo")
+    with timed("redaction", engine="prenuvo") as span:
+        patient_name, size = _redact_prenuvo(input_path, output_path, progress)
+        span.bytes = size["after_bytes"]
+    report = _verify("prenuvo", output_path, progress, rules=PRENUVO_RULES, names=[patient_name])
+    report["size"] = size
+    progress.finish("Redaction complete.")
+    return report
+
+
+def _redact_prenuvo(input_path, output_path, progress):
+    doc = fitz.open(input_path)
+
+    progress.stage("scan", "Looking for patient details...", 5)
+    patient_name = None
+    for i in range(min(3, len(doc))):
+        text = doc[i].get_text()
+        match = re.search(rf"Patient:\s+({NAME_PATTERN})", text)
+        if match:
+            patient_name = match.group(1).strip()
+            break
+
+    patterns = [pattern for _, pattern in PRENUVO_RULES]
+
+    if patient_name:
+        escaped = re.escape(patient_name)
+        patterns.append(rf"\b{escaped}\b")
+        patterns.append(rf"Patient:\s*{escaped}")
+
+    progress.stage("redact", "Redacting sensitive information...", 10, 90, total=len(doc))
+    for page in doc:
+        text = page.get_text()
+        for pattern in patterns:
+            for match in re.findall(pattern, text):
+                for rect in page.search_for(match):
+                    page.add_redact_annot(rect, fill=(0, 0, 0))
+        page.apply_redactions()
+        progress.advance()
+
+    progress.stage("save", "Saving redacted report...", 95)
+    size = save_compact(doc, output_path, os.path.getsize(input_path), "prenuvo")
+    doc.close()
+    return patient_name, size
+
+
+# === Trudiagnostic Redaction Function ===
+def redact_trudiagnostic_pdf(input_path, output_path, progress=None):
+    """Redact ``input_path`` into ``output_path``; returns the ``verify_redaction`` report."""
+    progress = progress or Progress("redaction.trudiagnostic")
+    with timed("redaction", engine="trudiagnostic") as span:
+        patient_name, size = _redact_trudiagnostic(input_path, output_path, progress)
+        span.bytes = size["after_bytes"]
+    report = _verify(
+        "trudiagnostic", output_path, progress,
+        rules=[_keyword_rule("footer", TRUDIAGNOSTIC_FOOTER)],
+        first_page_rules=TRUDIAGNOSTIC_FIRST_PAGE_RULES + [_keyword_rule("sample details", TRUDIAGNOSTIC_SAMPLE_KEYWORDS)],
+        names=[patient_name],
+    )
+    report["size"] = size
+    progress.finish("Redaction complete.")
+    return report
+
+
+def _redact_trudiagnostic(input_path, output_path, progress):
+    doc = fitz.open(input_path)
+    patient_name = None
+
+    progress.stage("redact", "Redacting sensitive information...", 10, 90, total=len(doc))
+    for i, page in enumerate(doc):
+        # === Page 1 logic: redact name (above age), and demographic blocks
+        if i == 0:
+            body_patterns = [pattern for _, pattern in TRUDIAGNOSTIC_FIRST_PAGE_RULES]
+
+            for pattern in body_patterns:
+                matches = re.finditer(pattern, page.get_text())
+                for match in matches:
+                    matched_text = match.group()
+                    for rect in page.search_for(matched_text):
+                        page.add_redact_annot(rect, fill=(0, 0, 0))
+
+            text_blocks = page.get_text("blocks")
+            for j, block in enumerate(text_blocks):
+                if "Age:" in block[4]:
+                    if j > 0:
+                        name_block = text_blocks[j - 1]
+                        # Only checked for later if it reads like a name
+                        candidate = name_block[4].strip().split("\n")[0]
+                        if re.fullmatch(NAME_PATTERN, candidate):
+                            patient_name = candidate
+                        rect = fitz.Rect(name_block[:4])
+                        page.add_redact_annot(rect, fill=(0, 0, 0))
+                    break
+
+            for block in text_blocks:
+                text = block[4]
+                if any(keyword in text for keyword in TRUDIAGNOSTIC_SAMPLE_KEYWORDS):
+                    rect = fitz.Rect(block[:4])
+                    page.add_redact_annot(rect, fill=(0, 0, 0))
+
+        # === Footer cleanup on all pages
+        for block in page.get_text("blocks"):
+            if any(keyword in block[4] for keyword in TRUDIAGNOSTIC_FOOTER):
+                rect = fitz.Rect(block[:4])
+                page.add_redact_annot(rect, fill=(0, 0, 0))
+
+        page.apply_redactions()
+        progress.advance()
+
+    progress.stage("save", "Saving redacted report...", 95)
+    size = save_compact(doc, output_path, os.path.getsize(input_path), "trudiagnostic")
+    doc.close()
+    return patient_name, size
+
+
+# === Redaction of uploaded bytes, shared across replicas ===
+ENGINES = {"prenuvo": redact_prenuvo_pdf, "trudiagnostic": redact_trudiagnostic_pdf}
+
+_RESULT_VERSION = hashlib.sha256(repr((
+    ENGINE_VERSION, PRENUVO_RULES, TRUDIAGNOSTIC_FIRST_PAGE_RULES, TRUDIAGNOSTIC_SAMPLE_KEYWORDS,
+    TRUDIAGNOSTIC_FOOTER, pdf_compact.SAVE_OPTIONS, pdf_compact.IMAGE_DPI, pdf_compact.IMAGE_QUALITY,
+)).encode()).hexdigest()[:12]
+
+
+def redact_pdf_bytes(engine, data, progress=None):
+    """Redacted PDF bytes and the verification report for an uploaded PDF.
+
+    Results are kept in the shared cache under the upload's hash, so the
+    same file uploaded again (Start Over, another replica) is not redone.
+    The cached report is JSON and keeps only the rule of each hit: the
+    matched text is the PII that survived, and stays out of the shared tier.
+    """
+    from biosnap.cache import get_cache
+
+    progress = progress or Progress(f"redaction.{engine}")
+    key = f"redaction:{engine}:{_RESULT_VERSION}:{hashlib.sha256(data).hexdigest()}"
+    cached_pdf, cached_report = get_cache().get(f"{key}:pdf"), get_cache().get_json(f"{key}:report")
+    if cached_pdf is not None and cached_report is not None:
+        progress.finish("Redaction complete.")
+        return cached_pdf, _report_from_json(cached_report)
+
+    with tempfile.TemporaryDirectory(prefix="biosnap_redaction_") as workdir:
+        input_path = os.path.join(workdir, "original.pdf")
+        output_path = os.path.join(workdir, "redacted.pdf")
+        with open(input_path, "wb") as f:
+            f.write(data)
+        report = ENGINES[engine](input_path, output_path, progress)
+        with open(output_path, "rb") as f:
+            redacted = f.read()
+
+    get_cache().set(f"{key}:pdf", redacted, RESULT_TTL)
+    get_cache().set_json(f"{key}:report", _report_to_json(report), RESULT_TTL)
+    return redacted, report
+
+
+def _report_to_json(report):
+    hits = {str(number): [{"rule": hit["rule"]} for hit in page_hits] for number, page_hits in report["hits"].items()}
+    return {**report, "hits": hits}
+
+
+def _report_from_json(report):
+    return {**report, "hits": {int(number): page_hits for number, page_hits in report["hits"].items()}}
@@ -0,0 +1,105 @@
+"""Process-wide admission control for headless browsers.
+
+Every scrape holds a slot from ``get_scheduler()`` for as long as its
+Chromium runs. At most ``BIOSNAP_MAX_BROWSERS`` run at once; later requests
+wait in a FIFO queue and are told their position and an estimated wait.
+When the queue is full, or a request waits longer than
+``BIOSNAP_SCRAPE_QUEUE_TIMEOUT`` seconds, ``SchedulerBusy`` is raised so the
+caller can ask the user to come back instead of the container running out
+of memory.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from biosnap.metrics import record
+
+MAX_BROWSERS = int(os.getenv("BIOSNAP_MAX_BROWSERS", "2"))
+MAX_QUEUE = int(os.getenv("BIOSNAP_SCRAPE_MAX_QUEUE", "20"))
+QUEUE_TIMEOUT = float(os.getenv("BIOSNAP_SCRAPE_QUEUE_TIMEOUT", "600"))
+DEFAULT_SCRAPE_SECONDS = 45.0
+
+
+class SchedulerBusy(RuntimeError):
+    pass
+
+
+class BrowserScheduler:
+    def __init__(self, max_browsers=MAX_BROWSERS, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+        self.max_browsers = max(1, max_browsers)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._active = 0
+        self._durations = deque(maxlen=50)
+
+    def stats(self):
+        with self._cond:
+            return {"active": self._active, "waiting": len(self._waiting), "max_browsers": self.max_browsers}
+
+    def estimated_wait(self, position):
+        """Seconds until the request at ``position`` (1 = next) gets a browser."""
+        with self._cond:
+            average = sum(self._durations) / len(self._durations) if self._durations else DEFAULT_SCRAPE_SECONDS
+        return average * math.ceil(position / self.max_browsers)
+
+    @contextmanager
+    def slot(self, on_wait=None):
+        ticket = object()
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                raise SchedulerBusy("Too many imports are running right now. Please try again in a few minutes.")
+            self._waiting.append(ticket)
+
+        queued_at = time.monotonic()
+        try:
+            last_position = None
+            while True:
+                with self._cond:
+                    if self._waiting[0] is ticket and self._active < self.max_browsers:
+                        self._waiting.popleft()
+                        self._active += 1
+                        self._cond.notify_all()
+                        break
+                    position = self._waiting.index(ticket) + 1
+                    if time.monotonic() - queued_at > self.queue_timeout:
+                        raise SchedulerBusy("Waited too long for a free browser. Please try again in a few minutes.")
+                    self._cond.wait(timeout=1.0)
+
+                # Report outside the lock: UI callbacks can be slow or raise
+                if on_wait and position != last_position:
+                    on_wait(position, self.estimated_wait(position))
+                    last_position = position
+        except BaseException:
+            with self._cond:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    self._cond.notify_all()
+            raise
+
+        record("scheduler.queue_wait", time.monotonic() - queued_at)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._durations.append(time.monotonic() - started)
+                self._cond.notify_all()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BrowserScheduler()
+        return _scheduler
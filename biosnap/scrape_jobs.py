@@ -0,0 +1,219 @@
+"""Function Health imports as jobs on the backend worker.
+
+The Streamlit app no longer launches browsers. ``run_import()`` submits the
+import to the worker service (``flask_backend.py``) and polls until it
+finishes, relaying the worker's progress frames to the caller's
+``Progress``. The worker owns the browser scheduler, the circuit breaker
+and the only copy of the scraper (``biosnap.scraper``), so it can be scaled
+and restarted without touching the UI.
+
+``BIOSNAP_BACKEND_URL`` points the app at the worker and requests carry
+``BIOSNAP_WORKER_TOKEN`` as ``X-Worker-Token``. A worker without a token
+rejects every job request unless ``BIOSNAP_WORKER_ALLOW_ANONYMOUS=1`` is set,
+which is meant for local development only. Without a URL, jobs run in
+threads of the calling process: the stand-in for local development.
+
+Jobs and their results are kept in the worker's memory for
+``BIOSNAP_SCRAPE_JOB_RETAIN_SECONDS``; credentials are never stored on the
+job. Polls must reach the process that accepted the job, so run one worker
+process per instance (its browser scheduler is per process anyway) and
+serve requests from threads, e.g. ``gunicorn -w 1 --threads 8``.
+"""
+
+import os
+import threading
+import time
+import uuid
+
+from biosnap.progress import DONE, FAILED, RUNNING, Progress, get_progress_hub
+from biosnap.scheduler import SchedulerBusy
+from biosnap.timeouts import SourceUnavailable
+
+BACKEND_URL = os.getenv("BIOSNAP_BACKEND_URL", "").rstrip("/")
+WORKER_TOKEN = os.getenv("BIOSNAP_WORKER_TOKEN")
+WORKER_ALLOW_ANONYMOUS = os.getenv("BIOSNAP_WORKER_ALLOW_ANONYMOUS", "").lower() in ("1", "true", "yes")
+POLL_SECONDS = float(os.getenv("BIOSNAP_SCRAPE_POLL_SECONDS", "1.0"))
+RETAIN_SECONDS = float(os.getenv("BIOSNAP_SCRAPE_JOB_RETAIN_SECONDS", "300"))
+REQUEST_TIMEOUT = 10.0
+MAX_WAIT = 10.0
+
+# Exceptions that cross the wire by kind, so callers handle them as before
+ERROR_KINDS = {"credentials": ValueError, "busy": SchedulerBusy, "unavailable": SourceUnavailable}
+
+
+class ScrapeFailed(RuntimeError):
+    pass
+
+
+class BackendUnavailable(SourceUnavailable):
+    pass
+
+
+def _error_kind(error):
+    for kind, cls in ERROR_KINDS.items():
+        if isinstance(error, cls):
+            return kind
+    return "error"
+
+
+def _default_scrape(email, password, progress):
+    from biosnap.scraper import scrape_function_health
+    return scrape_function_health(email, password, progress)
+
+
+# === Worker side ===
+class ScrapeJobs:
+    def __init__(self, scrape=_default_scrape, retain=RETAIN_SECONDS):
+        self.scrape = scrape
+        self.retain = retain
+        self._cond = threading.Condition()
+        self._jobs = {}  # id -> job dict (see status())
+
+    def submit(self, email, password):
+        job_id = uuid.uuid4().hex
+        with self._cond:
+            self._prune()
+            self._jobs[job_id] = {"id": job_id, "state": RUNNING, "error": None, "error_kind": None,
+                                  "rows": None, "ended": None}
+        threading.Thread(target=self._run, args=(job_id, email, password),
+                         name=f"biosnap-scrape-{job_id[:8]}", daemon=True).start()
+        return job_id
+
+    def _run(self, job_id, email, password):
+        progress = Progress("scrape", operation_id=job_id)
+        try:
+            function_df = self.scrape(email, password, progress)
+            update = {"state": DONE, "rows": function_df.to_dict(orient="records")}
+            progress.finish(f"Imported {len(function_df)} biomarkers.")
+        except Exception as e:
+            update = {"state": FAILED, "error": str(e), "error_kind": _error_kind(e)}
+            progress.fail(e)
+        with self._cond:
+            self._jobs[job_id].update(update, ended=time.monotonic())
+            self._cond.notify_all()
+
+    def status(self, job_id, wait=0.0):
+        """The job with its latest progress frame, or None if unknown.
+
+        With ``wait``, blocks up to that many seconds for the job to end.
+        """
+        deadline = time.monotonic() + min(wait, MAX_WAIT)
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["state"] != RUNNING or remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            if job is None:
+                return None
+            view = {key: value for key, value in job.items() if key != "ended"}
+            return {**view, "progress": get_progress_hub().latest(job_id)}
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.retain
+        stale = [key for key, job in self._jobs.items() if job["ended"] is not None and job["ended"] < cutoff]
+        for key in stale:
+            del self._jobs[key]
+
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def get_scrape_jobs():
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = ScrapeJobs()
+        return _jobs
+
+
+# === App side ===
+class LocalScrapeClient:
+    """Runs jobs in this process; for development without a worker."""
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs or get_scrape_jobs()
+
+    def submit(self, email, password):
+        return self.jobs.submit(email, password)
+
+    def status(self, job_id, wait=0.0):
+        return self.jobs.status(job_id, wait)
+
+
+class RemoteScrapeClient:
+    def __init__(self, base_url, token=WORKER_TOKEN):
+        import requests
+
+        self.base_url = base_url
+        self._session = requests.Session()
+        if token:
+            self._session.headers["X-Worker-Token"] = token
+
+    def _request(self, method, path, timeout, **kwargs):
+        import requests
+        try:
+            response = self._session.request(method, f"{self.base_url}{path}", timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            raise BackendUnavailable("The import service is not reachable right now. Please try again in a few minutes.") from e
+        if response.status_code in (401, 403):
+            raise ScrapeFailed("The import service rejected this app's worker token.")
+        if response.status_code >= 500:
+            raise BackendUnavailable("The import service is not reachable right now. Please try again in a few minutes.")
+        return response
+
+    def submit(self, email, password):
+        response = self._request("POST", "/jobs/scrape", REQUEST_TIMEOUT, json={"email": email, "password": password})
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def status(self, job_id, wait=0.0):
+        response = self._request("GET", f"/jobs/{job_id}", REQUEST_TIMEOUT + wait, params={"wait": wait})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_scrape_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = RemoteScrapeClient(BACKEND_URL) if BACKEND_URL else LocalScrapeClient()
+        return _client
+
+
+def run_import(email, password, progress=None, client=None):
+    """Scrape through the worker and return the biomarkers DataFrame.
+
+    Raises ``ValueError`` for rejected credentials, ``SchedulerBusy`` and
+    ``SourceUnavailable`` as the scraper does, and ``ScrapeFailed`` otherwise.
+    """
+    import pandas as pd
+
+    progress = progress or Progress("scrape")
+    client = client or get_scrape_client()
+    progress.stage("submit", "Sending import to the worker...", 2)
+    job_id = client.submit(email, password)
+
+    while True:
+        job = client.status(job_id, wait=POLL_SECONDS)
+        if job is None:
+            error = ScrapeFailed("The import was lost, most likely because the worker restarted. Please try again.")
+            break
+        # The caller reports the end itself, after its own follow-up stages
+        if job["progress"] and job["progress"]["state"] == RUNNING:
+            progress.relay(job["progress"])
+        if job["state"] == DONE:
+            return pd.DataFrame(job["rows"])
+        if job["state"] == FAILED:
+            error = ERROR_KINDS.get(job["error_kind"], ScrapeFailed)(job["error"])
+            break
+    progress.fail(error)
+    raise error
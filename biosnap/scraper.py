@@ -0,0 +1,192 @@
+"""Function Health scraper.
+
+Runs on the backend worker: ``biosnap.scrape_jobs`` calls it for each
+import job. Selenium and webdriver_manager are heavy to import, so the
+module is imported only when a job actually starts.
+"""
+
+import logging
+import time
+
+import pandas as pd
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from webdriver_manager.chrome import ChromeDriverManager
+
+from biosnap.browser import apply_request_blocking, build_chrome_options
+from biosnap.metrics import timed
+from biosnap.progress import Progress
+from biosnap.scheduler import get_scheduler
+from biosnap.timeouts import get_circuit_breaker, get_stage_timeouts
+
+logger = logging.getLogger("biosnap.scraper")
+
+
+class BrowserLaunchFailed(RuntimeError):
+    """Chrome or chromedriver did not start: a local problem, not the site's."""
+
+
+# === Wait for a page condition with the stage's learned timeout ===
+def _wait(driver, stage, condition):
+    timeouts = get_stage_timeouts()
+    started = time.perf_counter()
+    result = WebDriverWait(driver, timeouts.timeout(stage)).until(condition)
+    timeouts.record(stage, time.perf_counter() - started)
+    return result
+
+
+# === Walk the biomarkers page: h4 headings are categories, result containers are rows ===
+def _extract_biomarkers(driver, progress):
+    everything = driver.find_elements(By.XPATH, "//h4 | //div[contains(@class, 'biomarkerResult-styled__ResultContainer')]")
+    data = []
+    current_category = None
+    progress.stage("extract", "Importing biomarkers...", 30, 80, total=len(everything))
+
+    for el in everything:
+        progress.advance()
+
+        tag = el.tag_name
+
+        if tag == "h4":
+            current_category = el.text.strip()
+
+        elif tag == "div":
+            try:
+                name = el.find_element(By.CSS_SELECTOR, "[class^='biomarkerResultRow-styled__BiomarkerName']").text.strip()
+                status_text = value = units = ""
+                values = el.find_elements(By.CSS_SELECTOR, "[class*='biomarkerChart-styled__ResultValue']")
+                texts = [v.text.strip() for v in values]
+
+                if len(texts) == 3:
+                    status_text, value, units = texts
+                elif len(texts) == 2:
+                    status_text, value = texts
+                elif len(texts) == 1:
+                    value = texts[0]
+
+                try:
+                    unit_el = el.find_element(By.CSS_SELECTOR, "[class^='biomarkerChart-styled__UnitValue']")
+                    units = unit_el.text.strip()
+                except:
+                    pass
+
+                data.append({
+                    "category": current_category,
+                    "name": name,
+                    "status": status_text,
+                    "value": value,
+                    "units": units
+                })
+
+            except Exception:
+                continue
+
+    return data
+
+
+# === Function to scrape Function Health ===
+def scrape_function_health(user_email, user_pass, progress=None):
+    """Scrape every biomarker row; ``progress`` receives the scrape's stages (see biosnap.progress)."""
+    progress = progress or Progress("scrape")
+
+    def on_wait(position, eta_seconds):
+        minutes = max(1, round(eta_seconds / 60))
+        progress.stage("queue", f"Waiting for a free browser: you are #{position} in line (about {minutes} min)...", 5)
+
+    breaker = get_circuit_breaker()
+    admitted = False
+    try:
+        # Fail fast while the source site is down instead of queueing for a browser
+        breaker.before_call()
+        admitted = True
+        # Holds one of the process's browser slots from launch until quit
+        with get_scheduler().slot(on_wait=on_wait):
+            function_df = _scrape_function_health(user_email, user_pass, progress)
+    except WebDriverException as e:
+        # Timeouts and page errors once the browser is up: the site failed
+        breaker.record_failure()
+        progress.fail(e)
+        raise
+    except Exception as e:
+        # Rejected credentials, a full queue or a browser that would not start
+        # say nothing about the site
+        if admitted:
+            breaker.release_probe()
+        progress.fail(e)
+        raise
+    breaker.record_success()
+    return function_df
+
+
+def _scrape_function_health(user_email, user_pass, progress):
+    options = build_chrome_options()
+
+    try:
+        service = Service(ChromeDriverManager().install())
+    except Exception:
+        service = Service("/usr/bin/chromedriver")
+        options.add_argument("--binary=/usr/bin/chromium")
+
+    driver = None
+
+    try:
+        progress.stage("launch", "Launching remote browser...", 10)
+
+        with timed("scrape.stage", stage="launch"):
+            try:
+                driver = webdriver.Chrome(service=service, options=options)
+                apply_request_blocking(driver)
+            except Exception as e:
+                raise BrowserLaunchFailed(f"The browser could not be started: {e}") from e
+
+        with timed("scrape.stage", stage="login"):
+            driver.get("https://my.functionhealth.com/")
+            driver.maximize_window()
+
+            _wait(driver, "login_form", EC.presence_of_element_located((By.ID, "email"))).send_keys(user_email)
+
+            progress.stage("login", "Accessing Function Health...", 20)
+
+            password_field = driver.find_element(By.ID, "password")
+            password_field.send_keys(user_pass + Keys.RETURN)
+            try:
+                # The form unmounts once the site accepts the login
+                _wait(driver, "login_submit", EC.staleness_of(password_field))
+            except TimeoutException:
+                pass
+            if "login" in driver.current_url.lower():
+                raise ValueError("Login failed — please check your Function Health credentials.")
+
+        with timed("scrape.stage", stage="navigate"):
+            driver.get("https://my.functionhealth.com/biomarkers")
+
+            progress.stage("navigate", "Importing biomarkers...", 30)
+
+            _wait(driver, "biomarkers", EC.presence_of_element_located(
+                (By.CSS_SELECTOR, "[class^='biomarkerResultRow-styled__BiomarkerName']")
+            ))
+
+        with timed("scrape.stage", stage="extract"):
+            data = _extract_biomarkers(driver, progress)
+
+    except Exception as e:
+        # The failing stage is recorded by its scrape.stage span
+        logger.warning("scrape failed: %s: %s", type(e).__name__, e)
+        raise
+
+    finally:
+        if driver:
+            try:
+                progress.stage("quit", "Closing remote browser...", 97)
+                with timed("scrape.stage", stage="quit"):
+                    driver.quit()
+                time.sleep(1)
+            except Exception as quit_error:
+                logger.warning("quitting the driver failed: %s", quit_error)
+
+    return pd.DataFrame(data)
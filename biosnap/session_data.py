@@ -0,0 +1,285 @@
+"""Budgeted storage for large per-session payloads.
+
+Session state used to hold raw CSV/PDF bytes and DataFrames for as long as
+a session lived. Large values now go through ``stash()``, which keeps the
+payload in a process-wide store and puts a small ``Payload`` handle in
+session state; ``payload()`` resolves a handle (or passes a plain value
+through). The store:
+
+* keeps identical byte payloads once, however many handles point at them,
+* spills payloads of sessions idle for ``BIOSNAP_SESSION_IDLE_SECONDS`` to
+  ``BIOSNAP_SESSION_SPILL_DIR`` and reloads them on next access,
+* enforces ``BIOSNAP_SESSION_BUDGET_MB`` per session and
+  ``BIOSNAP_SESSION_GLOBAL_BUDGET_MB`` for the process by spilling the least
+  recently used payloads first,
+* frees memory and spill files once the last handle is garbage collected,
+  i.e. when Streamlit drops the session.
+
+Current usage is exported as gauges on /metrics and by ``usage()``.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+
+from biosnap.metrics import register_gauges, timed
+
+logger = logging.getLogger("biosnap.session_data")
+
+SPILL_DIR = os.getenv("BIOSNAP_SESSION_SPILL_DIR", "/tmp/biosnap_sessions")
+SESSION_BUDGET = int(float(os.getenv("BIOSNAP_SESSION_BUDGET_MB", "32")) * 2**20)
+GLOBAL_BUDGET = int(float(os.getenv("BIOSNAP_SESSION_GLOBAL_BUDGET_MB", "512")) * 2**20)
+IDLE_SECONDS = float(os.getenv("BIOSNAP_SESSION_IDLE_SECONDS", "300"))
+SWEEP_SECONDS = 30.0
+
+
+def _size(value):
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class _Blob:
+    __slots__ = ("key", "session", "value", "size", "path", "refs", "last_used")
+
+    def __init__(self, key, session, value, size):
+        self.key = key
+        self.session = session
+        self.value = value
+        self.size = size
+        self.path = None
+        self.refs = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def resident(self):
+        return self.path is None
+
+
+class Payload:
+    """Session-state handle for a stashed value."""
+
+    __slots__ = ("_store", "_key", "__weakref__")
+
+    def __init__(self, store, key):
+        self._store = store
+        self._key = key
+        weakref.finalize(self, store.release, key)
+
+    @property
+    def value(self):
+        return self._store.load(self._key)
+
+    def __repr__(self):
+        return f"Payload({self._key})"
+
+
+class SessionDataStore:
+    def __init__(self, spill_dir=SPILL_DIR, session_budget=SESSION_BUDGET,
+                 global_budget=GLOBAL_BUDGET, idle_seconds=IDLE_SECONDS):
+        self.spill_dir = spill_dir
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.idle_seconds = idle_seconds
+        self._lock = threading.RLock()
+        self._blobs = {}          # key -> _Blob
+        self._sessions = {}       # session id -> last access (monotonic)
+        self._released = deque()  # keys whose handle was collected
+        os.makedirs(spill_dir, exist_ok=True)
+
+    # === Handles ===
+    def put(self, value, session_id):
+        if isinstance(value, (bytes, bytearray)):
+            key = f"b-{hashlib.sha256(value).hexdigest()}"
+        else:
+            key = f"o-{uuid.uuid4().hex}"
+
+        with self._lock:
+            self._collect()
+            blob = self._blobs.get(key)
+            if blob is None:
+                blob = self._blobs[key] = _Blob(key, session_id, value, _size(value))
+            blob.refs += 1
+            self._touch(blob)
+            self._enforce(keep=blob)
+        return Payload(self, key)
+
+    def load(self, key):
+        with self._lock:
+            blob = self._blobs[key]
+            self._touch(blob)
+            if blob.resident:
+                return blob.value
+            path = blob.path
+
+        with timed("session_data.reload") as span:
+            span.bytes = blob.size
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+
+        with self._lock:
+            if not blob.resident:
+                blob.value = value
+                blob.path = None
+                self._remove_file(path)
+            self._enforce(keep=blob)
+            return blob.value
+
+    def release(self, key):
+        # Runs from a weakref finalizer, possibly in the middle of another
+        # call on this thread, so only queue the key; _collect() frees it.
+        self._released.append(key)
+
+    def _collect(self):
+        while self._released:
+            blob = self._blobs.get(self._released.popleft())
+            if blob is None:
+                continue
+            blob.refs -= 1
+            if blob.refs > 0:
+                continue
+            del self._blobs[blob.key]
+            if blob.path:
+                self._remove_file(blob.path)
+            if not any(b.session == blob.session for b in self._blobs.values()):
+                self._sessions.pop(blob.session, None)
+
+    # === Budgets ===
+    def _touch(self, blob):
+        now = time.monotonic()
+        blob.last_used = now
+        self._sessions[blob.session] = now
+
+    def _spill(self, blob):
+        path = os.path.join(self.spill_dir, f"{blob.key}.pkl")
+        tmp = f"{path}.tmp"
+        with timed("session_data.spill") as span:
+            span.bytes = blob.size
+            with open(tmp, "wb") as f:
+                pickle.dump(blob.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        blob.path = path
+        blob.value = None
+
+    def _enforce(self, keep=None):
+        resident = [b for b in self._blobs.values() if b.resident and b is not keep]
+
+        if keep is not None:
+            mine = sorted((b for b in resident if b.session == keep.session), key=lambda b: b.last_used)
+            used = keep.size + sum(b.size for b in mine)
+            for blob in mine:
+                if used <= self.session_budget:
+                    break
+                self._spill(blob)
+                used -= blob.size
+            resident = [b for b in resident if b.resident]
+
+        # Globally, spill from the least recently active sessions first
+        used = sum(b.size for b in resident) + (keep.size if keep is not None and keep.resident else 0)
+        for blob in sorted(resident, key=lambda b: (self._sessions.get(b.session, 0), b.last_used)):
+            if used <= self.global_budget:
+                break
+            self._spill(blob)
+            used -= blob.size
+
+    def spill_idle(self):
+        """Spill every payload of sessions idle longer than ``idle_seconds``."""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            self._collect()
+            idle = {sid for sid, last in self._sessions.items() if last < cutoff}
+            for blob in list(self._blobs.values()):
+                if blob.resident and blob.session in idle:
+                    self._spill(blob)
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    # === Reporting ===
+    def usage(self):
+        now = time.monotonic()
+        with self._lock:
+            self._collect()
+            sessions = {}
+            for blob in self._blobs.values():
+                entry = sessions.setdefault(blob.session, {"resident_bytes": 0, "spilled_bytes": 0, "payloads": 0})
+                entry["resident_bytes" if blob.resident else "spilled_bytes"] += blob.size
+                entry["payloads"] += 1
+            for sid, entry in sessions.items():
+                entry["idle_seconds"] = round(now - self._sessions.get(sid, now), 1)
+            return {
+                "resident_bytes": sum(s["resident_bytes"] for s in sessions.values()),
+                "spilled_bytes": sum(s["spilled_bytes"] for s in sessions.values()),
+                "session_budget_bytes": self.session_budget,
+                "global_budget_bytes": self.global_budget,
+                "sessions": sessions,
+            }
+
+    def gauges(self):
+        usage = self.usage()
+        return {
+            "session_data_resident_bytes": usage["resident_bytes"],
+            "session_data_spilled_bytes": usage["spilled_bytes"],
+            "session_data_sessions": len(usage["sessions"]),
+            "session_data_global_budget_bytes": usage["global_budget_bytes"],
+        }
+
+
+# === Process-wide store and Streamlit helpers ===
+_store = None
+_store_lock = threading.Lock()
+
+
+def _sweep(store):
+    while True:
+        time.sleep(SWEEP_SECONDS)
+        try:
+            store.spill_idle()
+        except Exception as e:
+            logger.warning("session data sweep failed: %s", e)
+
+
+def get_session_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionDataStore()
+            register_gauges(_store.gauges)
+            threading.Thread(target=_sweep, args=(_store,), name="biosnap-session-sweep", daemon=True).start()
+        return _store
+
+
+def _current_session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except ImportError:
+        ctx = None
+    return ctx.session_id if ctx else "no-session"
+
+
+def stash(value):
+    """Handle to keep in ``st.session_state`` in place of a large value."""
+    if value is None:
+        return None
+    return get_session_store().put(value, _current_session_id())
+
+
+def payload(value):
+    """The stashed value behind a handle; plain values pass through."""
+    return value.value if isinstance(value, Payload) else value
+
+
+def usage():
+    return get_session_store().usage()
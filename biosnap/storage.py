@@ -0,0 +1,373 @@
+"""Storage backends for participant data.
+
+Every artifact the app keeps (CSVs, Parquet, redacted PDFs, history
+snapshots, cohort aggregates) goes through one small interface:
+
+    list(path, options)     direct children of a folder, Supabase-shaped
+    download(path)          bytes; ObjectNotFound when missing
+    upload(path, data, content_type)   create or replace
+    remove(paths)
+    signed_url(path, expires_in)       time-limited link for browsers
+
+``get_storage()`` picks the process-wide backend from ``BIOSNAP_STORAGE``:
+
+    supabase   the "data" bucket (default)
+    local      files under BIOSNAP_STORAGE_DIR, written with atomic renames
+    memory     a dict, for tests and load runs
+
+Plain folder listings (no options) are served from the shared cache
+(``biosnap.cache``) and invalidated by writes through ``get_storage()``.
+
+List entries keep Supabase's shape (folders have ``id`` None; objects carry
+``metadata.size``/``eTag``/``mimetype`` and ``updated_at``) so callers work
+unchanged on any backend.
+"""
+
+import fnmatch
+import hashlib
+import hmac
+import mimetypes
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from biosnap.metrics import timed
+
+BACKEND = os.getenv("BIOSNAP_STORAGE", "supabase").lower()
+LOCAL_DIR = os.getenv("BIOSNAP_STORAGE_DIR", "storage")
+LOCAL_URL = os.getenv("BIOSNAP_STORAGE_URL")  # e.g. http://localhost:5000/storage
+# Must be shared by the app and the Flask process that serves signed local URLs
+SIGNING_SECRET = os.getenv("BIOSNAP_STORAGE_SECRET") or uuid.uuid4().hex
+DEFAULT_LIST_LIMIT = 100
+
+
+class StorageError(Exception):
+    pass
+
+
+class ObjectNotFound(StorageError):
+    pass
+
+
+class Storage:
+    name = "storage"
+    # Identifies the stored objects in the shared cache; None keeps them out of it
+    cache_namespace = None
+
+    def list(self, path="", options=None):
+        raise NotImplementedError
+
+    def download(self, path):
+        raise NotImplementedError
+
+    def upload(self, path, data, content_type="application/octet-stream"):
+        raise NotImplementedError
+
+    def remove(self, paths):
+        raise NotImplementedError
+
+    def signed_url(self, path, expires_in=3600):
+        raise NotImplementedError
+
+
+# === Supabase ===
+class SupabaseStorage(Storage):
+    name = "supabase"
+
+    def __init__(self, bucket):
+        self._bucket = bucket
+        self.cache_namespace = f"supabase:{getattr(bucket, 'id', 'data')}"
+
+    def list(self, path="", options=None):
+        if options:
+            return self._bucket.list(path, options)
+        return self._bucket.list(path)
+
+    def download(self, path):
+        try:
+            return self._bucket.download(path)
+        except Exception as e:
+            if "not found" in str(e).lower() or "404" in str(e):
+                raise ObjectNotFound(path) from e
+            raise StorageError(f"download of {path} failed: {e}") from e
+
+    def upload(self, path, data, content_type="application/octet-stream"):
+        response = self._bucket.upload(
+            path=path,
+            file=data,
+            # storage3 < 0.7 (pinned via supabase 1.2.0) only honours the x-upsert header
+            file_options={"content-type": content_type, "x-upsert": "true"}
+        )
+        res_data = getattr(response, "__dict__", {})
+        if "error" in res_data and res_data["error"]:
+            raise StorageError(str(res_data["error"]))
+        return response
+
+    def remove(self, paths):
+        return self._bucket.remove(list(paths))
+
+    def signed_url(self, path, expires_in=3600):
+        result = self._bucket.create_signed_url(path, expires_in)
+        return result.get("signedURL") or result.get("signedUrl")
+
+
+# === Shared listing for flat key/value backends ===
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _list_children(objects, path, options):
+    """Supabase-style listing of ``path`` from ``{key: (size, mtime, etag, mimetype)}``."""
+    options = options or {}
+    prefix = f"{path.strip('/')}/" if path.strip("/") else ""
+    folders, files = set(), []
+    for key, (size, mtime, etag, mimetype) in objects.items():
+        if not key.startswith(prefix):
+            continue
+        rest = key[len(prefix):]
+        if "/" in rest:
+            folders.add(rest.split("/", 1)[0])
+            continue
+        files.append({
+            "name": rest,
+            "id": key,
+            "updated_at": _iso(mtime),
+            "created_at": _iso(mtime),
+            "metadata": {"size": size, "eTag": etag, "mimetype": mimetype},
+        })
+
+    entries = [{"name": f, "id": None, "updated_at": None, "created_at": None, "metadata": None} for f in folders]
+    entries += files
+    search = options.get("search")
+    if search:
+        entries = [e for e in entries if fnmatch.fnmatch(e["name"], f"*{search}*")]
+
+    sort = options.get("sortBy") or {"column": "name", "order": "asc"}
+    column = sort.get("column", "name")
+    entries.sort(key=lambda e: e.get(column) or "", reverse=sort.get("order") == "desc")
+
+    offset = options.get("offset", 0)
+    return entries[offset:offset + options.get("limit", DEFAULT_LIST_LIMIT)]
+
+
+def object_etag(entry):
+    """Version tag of a listed object: its etag, else its modification time."""
+    metadata = entry.get("metadata") or {}
+    return (metadata.get("eTag") or metadata.get("etag") or entry.get("updated_at") or "").strip('"')
+
+
+def _guess_type(path):
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+# === Local filesystem ===
+class LocalStorage(Storage):
+    """Objects as files under ``root``; writes land via rename so readers never see partial data."""
+
+    name = "local"
+
+    def __init__(self, root=LOCAL_DIR, base_url=LOCAL_URL, secret=SIGNING_SECRET):
+        self.root = os.path.abspath(root)
+        self.cache_namespace = f"local:{self.root}"
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self._secret = secret.encode()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _file(self, path):
+        target = os.path.abspath(os.path.join(self.root, path.strip("/")))
+        if target != self.root and not target.startswith(self.root + os.sep):
+            raise StorageError(f"path escapes storage root: {path}")
+        return target
+
+    def list(self, path="", options=None):
+        folder = self._file(path)
+        objects = {}
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return []
+        prefix = f"{path.strip('/')}/" if path.strip("/") else ""
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            full = os.path.join(folder, name)
+            if os.path.isdir(full):
+                # One placeholder child makes the listing report a folder
+                objects[f"{prefix}{name}/"] = (0, 0, "", "")
+                continue
+            stat = os.stat(full)
+            objects[f"{prefix}{name}"] = (stat.st_size, stat.st_mtime, f"{stat.st_mtime_ns:x}-{stat.st_size:x}", _guess_type(name))
+        return _list_children(objects, path, options)
+
+    def download(self, path):
+        try:
+            with open(self._file(path), "rb") as f:
+                return f.read()
+        except (FileNotFoundError, IsADirectoryError) as e:
+            raise ObjectNotFound(path) from e
+
+    def upload(self, path, data, content_type="application/octet-stream"):
+        target = self._file(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    def remove(self, paths):
+        for path in paths:
+            try:
+                os.remove(self._file(path))
+            except FileNotFoundError:
+                pass
+
+    def signature(self, path, expires):
+        return hmac.new(self._secret, f"{path}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+    def verify(self, path, expires, signature):
+        try:
+            expired = int(expires) < time.time()
+        except (TypeError, ValueError):
+            return False
+        return not expired and hmac.compare_digest(self.signature(path, expires), signature or "")
+
+    def signed_url(self, path, expires_in=3600):
+        if not self.base_url:
+            return f"file://{quote(self._file(path))}"
+        expires = int(time.time() + expires_in)
+        return f"{self.base_url}/{quote(path)}?expires={expires}&signature={self.signature(path, expires)}"
+
+
+# === In-memory fake ===
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._objects = {}  # path -> (data, (size, mtime, etag, content_type))
+
+    def list(self, path="", options=None):
+        with self._lock:
+            objects = {key: meta for key, (_, meta) in self._objects.items()}
+        return _list_children(objects, path, options)
+
+    def download(self, path):
+        with self._lock:
+            entry = self._objects.get(path.strip("/"))
+        if entry is None:
+            raise ObjectNotFound(path)
+        return entry[0]
+
+    def upload(self, path, data, content_type="application/octet-stream"):
+        with self._lock:
+            data = bytes(data)
+            self._objects[path.strip("/")] = (data, (len(data), time.time(), hashlib.md5(data).hexdigest(), content_type))
+
+    def remove(self, paths):
+        with self._lock:
+            for path in paths:
+                self._objects.pop(path.strip("/"), None)
+
+    def signed_url(self, path, expires_in=3600):
+        return f"memory://{quote(path)}?expires={int(time.time() + expires_in)}"
+
+
+# === Timing wrapper ===
+class InstrumentedStorage(Storage):
+    """Times every call on a backend, labelled with the backend's name.
+
+    With ``manifests`` (a ``biosnap.cache.ManifestCache``), plain folder
+    listings come from the shared cache and writes invalidate them.
+    """
+
+    def __init__(self, storage, manifests=None):
+        self._storage = storage
+        self.name = storage.name
+        self.cache_namespace = storage.cache_namespace
+        self.manifests = manifests
+
+    @property
+    def backend(self):
+        return self._storage
+
+    def list(self, path="", options=None):
+        cacheable = self.manifests is not None and not options
+        if cacheable:
+            entries = self.manifests.get(path)
+            if entries is not None:
+                return entries
+        with timed("storage.list", bucket=self.name, path=path):
+            entries = self._storage.list(path, options)
+        if cacheable:
+            self.manifests.put(path, entries)
+        return entries
+
+    def download(self, path):
+        with timed("storage.download", bucket=self.name, path=path) as span:
+            data = self._storage.download(path)
+            span.bytes = len(data) if isinstance(data, bytes) else 0
+            return data
+
+    def upload(self, path, data, content_type="application/octet-stream"):
+        with timed("storage.upload", bucket=self.name, path=path) as span:
+            span.bytes = len(data)
+            result = self._storage.upload(path, data, content_type)
+        if self.manifests is not None:
+            self.manifests.invalidate([path])
+        return result
+
+    def remove(self, paths):
+        with timed("storage.remove", bucket=self.name, paths=",".join(paths)):
+            result = self._storage.remove(paths)
+        if self.manifests is not None:
+            self.manifests.invalidate(paths)
+        return result
+
+    def signed_url(self, path, expires_in=3600):
+        with timed("storage.signed_url", bucket=self.name, path=path):
+            return self._storage.signed_url(path, expires_in)
+
+
+def create_storage(backend=BACKEND):
+    if backend == "local":
+        return LocalStorage()
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "supabase":
+        from biosnap.supabase_client import get_supabase
+        return SupabaseStorage(get_supabase().storage.from_("data"))
+    raise ValueError(f"unknown BIOSNAP_STORAGE backend: {backend}")
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def _manifest_cache(storage):
+    from biosnap.cache import ManifestCache, get_cache
+
+    cache = get_cache()
+    if storage.cache_namespace is None or cache.name == "off":
+        return None
+    return ManifestCache(cache, storage.cache_namespace)
+
+
+def get_storage():
+    """Process-wide, instrumented storage backend with cached folder listings."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            backend = create_storage()
+            _storage = InstrumentedStorage(backend, _manifest_cache(backend))
+        return _storage
+
+
+def set_storage(storage):
+    """Swap the process-wide backend (tests, load runs); returns the instrumented wrapper."""
+    global _storage
+    with _storage_lock:
+        _storage = InstrumentedStorage(storage)
+        return _storage
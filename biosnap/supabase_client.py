@@ -0,0 +1,37 @@
+"""Process-wide Supabase client and account provisioning."""
+
+import os
+from functools import lru_cache
+
+from biosnap.metrics import timed
+
+
+@lru_cache(maxsize=None)
+def get_supabase():
+    # The supabase SDK (httpx, gotrue, postgrest, storage3) is imported on
+    # first use and the client is shared by every session in the process.
+    from supabase import create_client
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+
+
+# === Create the Supabase auth user for a participant if it does not exist ===
+def ensure_supabase_user(account_id, access_key, glc_id):
+    admin = get_supabase().auth.admin
+    with timed("supabase.auth", call="list_users"):
+        users = admin.list_users()
+    if any(u.email == account_id for u in users):
+        return None
+
+    try:
+        with timed("supabase.auth", call="create_user"):
+            user = admin.create_user({
+                "email": account_id,
+                "password": access_key,
+                "user_metadata": {"glcid": glc_id},
+                "options": {"email_confirm": True}
+            })
+        return user.user.id
+    except Exception as create_err:
+        if "already been registered" not in str(create_err).lower():
+            raise create_err  # Only raise if it's not a duplicate error
+    return None
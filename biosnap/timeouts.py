@@ -0,0 +1,158 @@
+"""Adaptive scrape timeouts and a circuit breaker for the source site.
+
+``StageTimeouts`` keeps a rolling window of successful wait latencies per
+scrape stage and derives each stage's timeout from a high percentile of
+that window, scaled by a safety factor and clamped to a floor and ceiling.
+Until a stage has enough samples its historical hard-coded value is used.
+Samples are persisted to a small JSON file so a restart keeps what it
+learned.
+
+``CircuitBreaker`` opens after a run of consecutive upstream failures
+(timeouts and page errors from the site, not local browser problems) and
+rejects new scrapes immediately until a cooldown has passed; then a single
+probe is let through to decide whether to close again.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from biosnap.metrics import record
+
+STATE_PATH = os.getenv("BIOSNAP_SCRAPE_LATENCY_FILE", "/tmp/biosnap_scrape_latencies.json")
+PERCENTILE = float(os.getenv("BIOSNAP_SCRAPE_TIMEOUT_PERCENTILE", "0.95"))
+SAFETY_FACTOR = float(os.getenv("BIOSNAP_SCRAPE_TIMEOUT_FACTOR", "1.5"))
+WINDOW = 100
+MIN_SAMPLES = 5
+
+# stage -> (default seconds, floor, ceiling)
+STAGES = {
+    "login_form": (10.0, 3.0, 20.0),
+    "login_submit": (5.0, 2.0, 15.0),
+    "biomarkers": (12.0, 4.0, 30.0),
+}
+
+BREAKER_THRESHOLD = int(os.getenv("BIOSNAP_SCRAPE_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BIOSNAP_SCRAPE_BREAKER_COOLDOWN", "120"))
+
+
+class SourceUnavailable(RuntimeError):
+    pass
+
+
+class StageTimeouts:
+    def __init__(self, path=STATE_PATH, stages=STAGES, percentile=PERCENTILE, factor=SAFETY_FACTOR):
+        self.path = path
+        self.stages = stages
+        self.percentile = percentile
+        self.factor = factor
+        self._lock = threading.Lock()
+        self._samples = {stage: deque(maxlen=WINDOW) for stage in stages}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for stage, samples in saved.items():
+            if stage in self._samples:
+                self._samples[stage].extend(float(s) for s in samples[-WINDOW:])
+
+    def _save(self):
+        payload = json.dumps({stage: list(samples) for stage, samples in self._samples.items()})
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples[stage].append(seconds)
+            self._save()
+
+    def timeout(self, stage):
+        default, floor, ceiling = self.stages[stage]
+        with self._lock:
+            samples = sorted(self._samples[stage])
+        if len(samples) < MIN_SAMPLES:
+            return default
+        index = min(len(samples) - 1, int(round(self.percentile * (len(samples) - 1))))
+        return min(ceiling, max(floor, samples[index] * self.factor))
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        """Raise SourceUnavailable while open; admit one probe once the cooldown passes."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._probing:
+                record("scrape.rejected", 0.0, outcome="circuit_open")
+                raise SourceUnavailable(
+                    "Function Health is not responding right now. Please try again in a few minutes."
+                )
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """The probe ended without telling us anything about the source (e.g. bad credentials)."""
+        with self._lock:
+            self._probing = False
+
+
+_timeouts = None
+_breaker = None
+_singleton_lock = threading.Lock()
+
+
+def get_stage_timeouts():
+    global _timeouts
+    with _singleton_lock:
+        if _timeouts is None:
+            _timeouts = StageTimeouts()
+        return _timeouts
+
+
+def get_circuit_breaker():
+    global _breaker
+    with _singleton_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+        return _breaker
@@ -0,0 +1,60 @@
+"""Small Streamlit widgets shared by the app's tabs."""
+
+import streamlit as st
+
+from biosnap.progress import get_progress_hub
+from biosnap.uploads import FAILED, SAVED, DONE_STATES, get_upload_queue
+
+
+# === "Saving…" / "Saved" indicator for a write-behind upload ===
+def render_upload_status(ticket, key):
+    queue = get_upload_queue()
+    state = queue.status(ticket)
+
+    if state is None or state in DONE_STATES:
+        if state == SAVED:
+            st.caption("✓ Saved")
+        return state
+
+    if state == FAILED:
+        st.error(f"Saving failed: {queue.error(ticket)}")
+        if st.button("Retry saving", key=f"{key}_retry_upload"):
+            queue.retry(ticket)
+            st.rerun()
+        return state
+
+    _poll_upload(ticket)
+    return state
+
+
+@st.fragment(run_every=1)
+def _poll_upload(ticket):
+    state = get_upload_queue().status(ticket)
+    if state in DONE_STATES or state == FAILED:
+        # Hand back to a full rerun so tabs that list storage pick up the file
+        st.rerun()
+    frame = get_progress_hub().latest(ticket)
+    st.caption(frame["message"] if frame else "Saving…")
+
+
+# === "All my data" dashboard ===
+def render_dashboard(username):
+    from biosnap.dashboard import load_dashboard
+    from biosnap.storage import get_storage
+
+    try:
+        views = load_dashboard(get_storage(), username)
+    except Exception as e:
+        st.warning(f"There was an error retrieving your data. Please contact admin. ({e})")
+        return
+
+    for view in views:
+        st.markdown(f"## {view['heading']}")
+        if view["status"] == "missing":
+            st.info(view["message"])
+        elif view["status"] == "error":
+            st.warning(view["message"])
+        elif view["kind"] == "pdf":
+            st.link_button(f"Open {view['file']}", view["value"])
+        else:
+            st.dataframe(view["value"])
@@ -0,0 +1,412 @@
+"""Write-behind upload queue.
+
+``submit`` journals the payload to local disk and returns a ticket right
+away; a small thread pool then replaces the object in storage, retrying with
+exponential backoff. Journaled writes are replayed when the process starts,
+so a restart does not lose a save the user was already told about.
+
+Only the newest write for a path is uploaded: if a user saves twice before
+the first upload runs, the older ticket is marked ``superseded``. Finished
+tickets are forgotten ``BIOSNAP_UPLOAD_RETAIN_SECONDS`` after they end.
+
+The journal root is ``BIOSNAP_UPLOAD_JOURNAL`` (default
+``/tmp/biosnap_uploads``). Each queue journals into its own subdirectory and
+holds an ``flock`` on the ``owner.lock`` inside for as long as its process
+lives. On start, a queue adopts only the subdirectories whose lock it can
+take, i.e. whose process has exited, and replays their writes; another live
+process's in-flight writes are never touched. The default survives a process
+restart but not a new container. Point it at a persistent volume where the
+platform has one, one volume per replica: ``flock`` is not reliable across
+hosts on network filesystems, so replicas must not share a journal root.
+"""
+
+import json
+import logging
+import os
+import shutil
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from biosnap.metrics import timed
+from biosnap.progress import Progress
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+logger = logging.getLogger("biosnap.uploads")
+
+PENDING = "pending"
+SAVING = "saving"
+SAVED = "saved"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+CANCELLED = "cancelled"
+
+DONE_STATES = (SAVED, SUPERSEDED, CANCELLED)
+
+JOURNAL_DIR = os.getenv("BIOSNAP_UPLOAD_JOURNAL", "/tmp/biosnap_uploads")
+WORKERS = int(os.getenv("BIOSNAP_UPLOAD_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("BIOSNAP_UPLOAD_MAX_ATTEMPTS", "5"))
+BASE_DELAY = float(os.getenv("BIOSNAP_UPLOAD_BASE_DELAY", "1.0"))
+RETAIN_SECONDS = float(os.getenv("BIOSNAP_UPLOAD_RETAIN_SECONDS", "600"))
+MAX_DELAY = 30.0
+LOCK_NAME = "owner.lock"
+
+
+class UploadQueue:
+    def __init__(self, storage_factory, journal_dir=JOURNAL_DIR, workers=WORKERS,
+                 max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, retain=RETAIN_SECONDS):
+        self._storage_factory = storage_factory
+        self._journal_root = journal_dir
+        self._journal_dir = os.path.join(journal_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._retain = retain
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="biosnap-upload")
+        self._lock = threading.Lock()
+        self._tickets = {}       # ticket -> {"path", "state", "error", "attempts", "created", "ended"}
+        self._latest = {}        # path -> newest ticket
+        self._path_locks = {}    # path -> lock serializing attempts on that object
+        self._listeners = []
+
+        os.makedirs(self._journal_dir)
+        self._owner = _lock_owner(self._journal_dir)
+        self._recover()
+
+    # === Public API ===
+    def submit(self, path, data, content_type="application/octet-stream"):
+        ticket = uuid.uuid4().hex
+        meta = {
+            "ticket": ticket,
+            "path": path,
+            "content_type": content_type,
+            "created": time.time(),
+        }
+        self._write_journal(ticket, data, meta)
+        self._track(ticket, path, meta["created"])
+        self._executor.submit(self._run, ticket)
+        return ticket
+
+    def status(self, ticket):
+        with self._lock:
+            entry = self._tickets.get(ticket)
+            return entry["state"] if entry else None
+
+    def error(self, ticket):
+        with self._lock:
+            entry = self._tickets.get(ticket)
+            return entry["error"] if entry else None
+
+    def pending_ticket(self, path):
+        """Newest unfinished ticket for ``path``, or None."""
+        with self._lock:
+            ticket = self._latest.get(path)
+            if ticket and self._tickets[ticket]["state"] not in DONE_STATES:
+                return ticket
+        return None
+
+    def pending_data(self, path):
+        """Payload of the newest unfinished write for ``path``, or None."""
+        ticket = self.pending_ticket(path)
+        if not ticket:
+            return None
+        try:
+            with open(self._data_path(ticket), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def cancel(self, path):
+        """Drop unfinished writes for ``path`` (e.g. before deleting it).
+
+        Returns once no upload of ``path`` is in flight, so a ``remove`` that
+        follows is final; a write cancelled mid-upload is not reported as
+        saved and its listeners do not run.
+        """
+        with self._lock:
+            tickets = [t for t, e in self._tickets.items()
+                       if e["path"] == path and e["state"] in (PENDING, SAVING, FAILED)]
+            for ticket in tickets:
+                self._tickets[ticket].update(state=CANCELLED, ended=time.monotonic())
+            path_lock = self._path_locks.get(path)
+        for ticket in tickets:
+            self._drop_journal(ticket)
+        if path_lock is not None:
+            with path_lock:
+                pass
+
+    def retry(self, ticket):
+        with self._lock:
+            entry = self._tickets.get(ticket)
+            if not entry or entry["state"] != FAILED:
+                return False
+            entry["state"] = PENDING
+            entry["error"] = None
+            entry["attempts"] = 0
+        self._executor.submit(self._run, ticket)
+        return True
+
+    def add_listener(self, callback):
+        """Call ``callback(path, data)`` after each successful upload."""
+        self._listeners.append(callback)
+
+    def drain(self, timeout=None):
+        """Block until every tracked write has finished or failed (tests, shutdown)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                busy = any(e["state"] in (PENDING, SAVING) for e in self._tickets.values())
+            if not busy:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def wait(self, tickets, timeout=None):
+        """Block until each of ``tickets`` has finished or failed; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                busy = any(self._tickets[t]["state"] in (PENDING, SAVING) for t in tickets if t in self._tickets)
+            if not busy:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def close(self):
+        """Stop taking work and release the journal, so a new process adopts what is left."""
+        self._executor.shutdown(wait=True)
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    # === Worker ===
+    def _run(self, ticket):
+        with self._lock:
+            entry = self._tickets.get(ticket)
+            if not entry or entry["state"] != PENDING:
+                return
+            if self._latest.get(entry["path"]) != ticket:
+                entry.update(state=SUPERSEDED, ended=time.monotonic())
+                superseded = True
+            else:
+                entry["state"] = SAVING
+                superseded = False
+        if superseded:
+            self._drop_journal(ticket)
+            return
+
+        try:
+            meta, data = self._read_journal(ticket)
+        except FileNotFoundError:
+            self._finish(ticket, FAILED, "journal entry missing")
+            return
+
+        path = meta["path"]
+        name = os.path.basename(path)
+        progress = Progress("upload", operation_id=ticket)
+        with self._lock:
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+
+        while True:
+            # Attempts on one path never overlap, and an older write that is
+            # still retrying gives up once a newer one exists, so objects are
+            # never overwritten out of order.
+            with path_lock:
+                with self._lock:
+                    if entry["state"] == CANCELLED:
+                        return
+                    if self._latest.get(path) != ticket:
+                        entry.update(state=SUPERSEDED, ended=time.monotonic())
+                        superseded = True
+                    else:
+                        entry["attempts"] += 1
+                        attempt = entry["attempts"]
+                        superseded = False
+                if superseded:
+                    self._drop_journal(ticket)
+                    progress.finish(f"{name} was replaced by a newer save")
+                    return
+
+                progress.stage("upload", f"Saving {name} (attempt {attempt} of {self._max_attempts})...", 50)
+                try:
+                    with timed("upload.write_behind", path=path) as span:
+                        span.bytes = len(data)
+                        self._replace(path, data, meta["content_type"])
+                except Exception as e:
+                    error = e
+                else:
+                    # Settled while the path lock is held: cancel() waits for it
+                    self._drop_journal(ticket)
+                    saved = self._finish(ticket, SAVED, None)
+                    break
+
+            if attempt >= self._max_attempts:
+                logger.warning("upload of %s failed after %d attempts: %s", path, attempt, error)
+                self._finish(ticket, FAILED, str(error))
+                progress.fail(error)
+                return
+            delay = min(MAX_DELAY, self._base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            progress.stage("retry", f"Saving {name} failed, retrying in {max(1, round(delay))}s...", 50)
+            time.sleep(delay)
+
+        if not saved:
+            progress.finish(f"Saving {name} was cancelled")
+            return
+        progress.finish(f"Saved {name}")
+        for callback in self._listeners:
+            try:
+                callback(path, data)
+            except Exception as e:
+                logger.warning("upload listener failed for %s: %s", path, e)
+
+    def _replace(self, path, data, content_type):
+        # Backends upsert, so an existing object is replaced in one call
+        self._storage_factory().upload(path, data, content_type)
+
+    def _finish(self, ticket, state, error):
+        """Settle a ticket unless it was cancelled; returns whether it was."""
+        with self._lock:
+            entry = self._tickets[ticket]
+            if entry["state"] == CANCELLED:
+                return False
+            entry.update(state=state, error=error, ended=time.monotonic() if state in DONE_STATES else None)
+            return True
+
+    def _track(self, ticket, path, created):
+        with self._lock:
+            self._prune()
+            self._tickets[ticket] = {"path": path, "state": PENDING, "error": None, "attempts": 0,
+                                     "created": created, "ended": None}
+            current = self._latest.get(path)
+            if current is None or self._tickets[current]["created"] <= created:
+                self._latest[path] = ticket
+
+    def _prune(self):
+        # Callers hold self._lock. Failed tickets stay until retried or cancelled.
+        cutoff = time.monotonic() - self._retain
+        stale = [t for t, e in self._tickets.items() if e["ended"] is not None and e["ended"] < cutoff]
+        for ticket in stale:
+            path = self._tickets.pop(ticket)["path"]
+            if self._latest.get(path) == ticket:
+                del self._latest[path]
+        live = {e["path"] for e in self._tickets.values()}
+        for path in [p for p in self._path_locks if p not in live]:
+            del self._path_locks[path]
+
+    # === Journal ===
+    def _data_path(self, ticket):
+        return os.path.join(self._journal_dir, f"{ticket}.bin")
+
+    def _meta_path(self, ticket):
+        return os.path.join(self._journal_dir, f"{ticket}.json")
+
+    def _write_journal(self, ticket, data, meta):
+        # Payload first, metadata last: a .json without its .bin never exists.
+        for target, payload, mode in ((self._data_path(ticket), data, "wb"),
+                                      (self._meta_path(ticket), json.dumps(meta), "w")):
+            tmp = f"{target}.tmp"
+            with open(tmp, mode) as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+
+    def _read_journal(self, ticket):
+        with open(self._meta_path(ticket)) as f:
+            meta = json.load(f)
+        with open(self._data_path(ticket), "rb") as f:
+            data = f.read()
+        return meta, data
+
+    def _drop_journal(self, ticket):
+        for target in (self._meta_path(ticket), self._data_path(ticket)):
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+
+    def _adopt_orphans(self):
+        """Move journaled writes of exited processes into this queue's directory."""
+        if fcntl is None:
+            return
+        for name in os.listdir(self._journal_root):
+            directory = os.path.join(self._journal_root, name)
+            if directory == self._journal_dir or not os.path.exists(os.path.join(directory, LOCK_NAME)):
+                continue
+            try:
+                owner = _lock_owner(directory)
+            except BlockingIOError:
+                continue  # its process is still running
+            except OSError:
+                continue  # removed by another process adopting it
+            try:
+                for entry in os.listdir(directory):
+                    if entry.endswith((".bin", ".json")):
+                        os.replace(os.path.join(directory, entry), os.path.join(self._journal_dir, entry))
+                shutil.rmtree(directory)
+            except OSError as e:
+                logger.warning("adopting upload journal %s failed: %s", directory, e)
+            finally:
+                owner.close()
+
+    def _recover(self):
+        self._adopt_orphans()
+        entries = []
+        for name in os.listdir(self._journal_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._journal_dir, name)) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+        for meta in sorted(entries, key=lambda m: m["created"]):
+            self._track(meta["ticket"], meta["path"], meta["created"])
+        for meta in sorted(entries, key=lambda m: m["created"]):
+            self._executor.submit(self._run, meta["ticket"])
+
+        if entries:
+            logger.info("replaying %d journaled upload(s)", len(entries))
+
+
+def _lock_owner(directory):
+    """Open and exclusively lock ``directory``'s owner file; raises BlockingIOError
+    while another process holds it. The lock lasts until the file is closed."""
+    owner = open(os.path.join(directory, LOCK_NAME), "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(owner.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            owner.close()
+            raise
+    return owner
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def _refresh_aggregates(path, data):
+    # Cheap path check first so pandas is only imported for biomarker writes
+    if path.endswith(("/functionhealth.parquet", "/biostarks.csv")):
+        from biosnap.aggregates import on_upload_saved
+        on_upload_saved(path, data)
+
+
+def get_upload_queue():
+    """Process-wide queue writing to the configured storage backend."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            from biosnap.storage import get_storage
+            _queue = UploadQueue(get_storage)
+            _queue.add_listener(_refresh_aggregates)
+        return _queue
@@ -1,109 +1,157 @@
-from flask import Flask, request, send_file, jsonify
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import pandas as pd
-import time
+from flask import Flask, request, jsonify, Response
+import hmac
 import os
+from biosnap.metrics import render_prometheus, snapshot
+from biosnap.progress import format_sse, get_progress_hub
+from biosnap.scrape_jobs import WORKER_ALLOW_ANONYMOUS, WORKER_TOKEN, get_scrape_jobs
 
 app = Flask(__name__)
 
-def scrape_function_health(user_email, user_pass):
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--window-size=1920x1080")
-
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=options
-    )
-
-    driver.get("https://my.functionhealth.com/")
-    driver.maximize_window()
-
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.ID, "email"))
-    ).send_keys(user_email)
-
-    driver.find_element(By.ID, "password").send_keys(user_pass + Keys.RETURN)
-    time.sleep(5)
-
-    driver.get("https://my.functionhealth.com/biomarkers")
-
-    WebDriverWait(driver, 12).until(
-        EC.presence_of_element_located((By.CLASS_NAME, "biomarkerResultRow-styled__BiomarkerName-sc-3bf584b3-1"))
-    )
-
-    everything = driver.find_elements(By.XPATH, "//h4 | //div[contains(@class, 'biomarkerResult-styled__ResultContainer')]")
-    data = []
-    current_category = None
-
-    for el in everything:
-        tag = el.tag_name
-        if tag == "h4":
-            current_category = el.text.strip()
-        elif tag == "div":
-            try:
-                name = el.find_element(By.CLASS_NAME, "biomarkerResultRow-styled__BiomarkerName-sc-3bf584b3-1").text.strip()
-
-                status = value = units = ""
-
-                # Get result values
-                values = el.find_elements(By.CSS_SELECTOR, "[class*='biomarkerChart-styled__ResultValue']")
-                texts = [v.text.strip() for v in values]
-                print("Found texts:", texts)
-
-                if len(texts) == 3:
-                    status, value, units = texts
-                elif len(texts) == 2:
-                    status, value = texts
-                elif len(texts) == 1:
-                    value = texts[0]
-
-                # Try to get the units from a separate span
-                try:
-                    unit_el = el.find_element(By.CSS_SELECTOR, "[class^='biomarkerChart-styled__UnitValue']")
-                    units = unit_el.text.strip()
-                except:
-                    pass
-
-                data.append({
-                    "category": current_category,
-                    "name": name,
-                    "status": status,
-                    "value": value,
-                    "units": units
-                })
-            except Exception:
-                continue
-
-    driver.quit()
-    return pd.DataFrame(data)
-
-@app.route("/scrape", methods=["POST"])
-def scrape():
+ADMIN_TOKEN = os.getenv("BIOSNAP_ADMIN_TOKEN")
+EXPORT_DIR = os.getenv("BIOSNAP_EXPORT_DIR", "exports/cohort")
+
+def token_matches(header, expected):
+    # Constant-time comparison; an unset or empty expected token matches nothing
+    if not expected:
+        return False
+    provided = request.headers.get(header) or ""
+    return hmac.compare_digest(provided.encode(), expected.encode())
+
+def is_admin_request():
+    return token_matches("X-Admin-Token", ADMIN_TOKEN)
+
+def is_worker_request():
+    # Without a token only an explicit local development opt-in lets requests through
+    if not WORKER_TOKEN:
+        return WORKER_ALLOW_ANONYMOUS
+    return token_matches("X-Worker-Token", WORKER_TOKEN)
+
+@app.route("/jobs/scrape", methods=["POST"])
+def submit_scrape():
+    # Called by the Streamlit app (biosnap.scrape_jobs); the id doubles as the progress id
+    if not is_worker_request():
+        return jsonify({"error": "forbidden"}), 403
+    data = request.get_json(silent=True) or {}
+    if not data.get("email") or not data.get("password"):
+        return jsonify({"error": "email and password are required"}), 400
+    return jsonify({"id": get_scrape_jobs().submit(data["email"], data["password"])}), 202
+
+@app.route("/jobs/<job_id>")
+def scrape_status(job_id):
+    if not is_worker_request():
+        return jsonify({"error": "forbidden"}), 403
+    job = get_scrape_jobs().status(job_id, wait=request.args.get("wait", 0, type=float))
+    if job is None:
+        return jsonify({"error": "not found"}), 404
+    return jsonify(job)
+
+@app.route("/progress/<operation_id>/events")
+def progress_events(operation_id):
+    # The hub is per process: only jobs running on this worker (ids from
+    # /jobs/scrape) are streamed, never operations inside the Streamlit app
+    if not is_worker_request():
+        return jsonify({"error": "forbidden"}), 403
+    stream = (format_sse(frame) for frame in get_progress_hub().stream(operation_id))
+    return Response(stream, mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/storage/<path:path>")
+def storage_object(path):
+    # Serves signed_url() links when BIOSNAP_STORAGE=local; Supabase signs its own
+    from biosnap.storage import LocalStorage, ObjectNotFound, get_storage
+    storage = get_storage().backend
+    if not isinstance(storage, LocalStorage):
+        return jsonify({"error": "not found"}), 404
+    if not storage.verify(path, request.args.get("expires"), request.args.get("signature")):
+        return jsonify({"error": "forbidden"}), 403
     try:
-        data = request.json
-        email = data.get("email")
-        password = data.get("password")
-        glc_id = data.get("glc_id")
-
-        df = scrape_function_health(email, password)
-        filename = f"{glc_id}_functionhealth.csv"
-        df.to_csv(filename, index=False)
-
-        return send_file(filename, as_attachment=True)
+        data = storage.download(path)
+    except ObjectNotFound:
+        return jsonify({"error": "not found"}), 404
+    import mimetypes
+    return Response(data, mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream")
+
+@app.route("/admin/progress")
+def admin_progress():
+    if not is_admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    return jsonify(get_progress_hub().active())
+
+@app.route("/admin/export", methods=["POST"])
+def admin_export():
+    if not is_admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    try:
+        from biosnap.cohort_export import export_cohort
+        payload = request.get_json(silent=True) or {}
+        return jsonify(export_cohort(EXPORT_DIR, workers=int(payload.get("workers", 16))))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+@app.route("/admin/issues")
+def admin_issues():
+    if not is_admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    from biosnap.issues import list_issues
+    return jsonify(list_issues(
+        report_type=request.args.get("report_type"),
+        user=request.args.get("user"),
+        with_text=request.args.get("text") == "1",
+    ))
+
+@app.route("/admin/issues/resolve", methods=["POST"])
+def admin_issues_resolve():
+    if not is_admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    from biosnap.issues import resolve
+    payload = request.get_json(silent=True) or {}
+    return jsonify({"resolved": resolve(payload.get("ids", []))})
+
+def frame_response(df):
+    return Response(df.to_json(orient="records"), mimetype="application/json")
+
+@app.route("/admin/cohort/distributions")
+def cohort_distributions():
+    if not is_admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    from biosnap.aggregates import get_aggregates
+    return frame_response(get_aggregates().distribution(request.args.get("name"), request.args.get("source")))
+
+@app.route("/admin/cohort/out-of-range")
+def cohort_out_of_range():
+    if not is_admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    from biosnap.aggregates import get_aggregates
+    return frame_response(get_aggregates().out_of_range(by=request.args.get("by", "category")))
+
+@app.route("/admin/cohort/participants/<glc_id>/percentiles")
+def cohort_participant_percentiles(glc_id):
+    if not is_admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    from biosnap.aggregates import get_aggregates
+    return frame_response(get_aggregates().participant_percentiles(glc_id))
+
+@app.route("/admin/cohort/rebuild", methods=["POST"])
+def cohort_rebuild():
+    if not is_admin_request():
+        return jsonify({"error": "forbidden"}), 403
+    try:
+        from biosnap.aggregates import rebuild_from_export
+        from biosnap.cohort_export import export_cohort
+        summary = export_cohort(EXPORT_DIR)
+        aggregates = rebuild_from_export(EXPORT_DIR)
+        summary["aggregated_values"] = len(aggregates.values)
+        return jsonify(summary)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/metrics")
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics.json")
+def metrics_json():
+    return jsonify(snapshot())
+
 @app.route("/")
 def index():
     return "Flask is running!"
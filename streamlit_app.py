@@ -1,40 +1,25 @@
 import streamlit as st
-import pandas as pd
 import time
-import smtplib
-from email.message import EmailMessage
 from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import streamlit_authenticator as stauth
-from yaml.loader import SafeLoader
-import streamlit.components.v1 as components
-import yaml
 import os
-import io
-import base64
-from supabase import create_client, Client
-import fitz
-import re
-from datetime import datetime
+from biosnap.auth_config import build_authenticator
+from biosnap.metrics import start_metrics_server
+from biosnap.session_data import payload, stash
+from biosnap.storage import get_storage, object_etag
+from biosnap.supabase_client import ensure_supabase_user
+from biosnap.ui import render_dashboard, render_upload_status
+from biosnap.uploads import SAVED, get_upload_queue
+
+# Scraper (selenium), redaction/preview (PyMuPDF) and pandas are imported
+# inside the branches that use them, so a rerun only pays for what it renders.
 
 st.set_page_config(page_title="Biometric Snapshot", layout="centered")
 
-with open('config.yaml') as file:
-    config = yaml.load(file, Loader=SafeLoader)
+# Serves /metrics on BIOSNAP_METRICS_PORT when set (once per process)
+start_metrics_server()
 
-authenticator = stauth.Authenticate(
-    config['credentials'],
-    config['cookie']['name'],
-    config['cookie']['key'],
-    config['cookie']['expiry_days'],
-)
+# config.yaml is parsed and indexed once per process; see biosnap.auth_config
+authenticator = build_authenticator()
 
 # Render the login widget
 authenticator.login(location='main')
@@ -73,26 +58,13 @@ account_id = f"{glc_id}@{DOMAIN}"
 access_key = f"{glc_id}-{KEY_SUFFIX}"
 
 load_dotenv()
-admin_supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
 
-# Check and create Supabase user only once per session
-if "supabase_user_checked" not in st.session_state:
+# Check and create Supabase user only once per session (local/memory storage has no auth users)
+if "supabase_user_checked" not in st.session_state and get_storage().name == "supabase":
     try:
-        users = admin_supabase.auth.admin.list_users()
-        user_exists = any(u.email == account_id for u in users)
-
-        if not user_exists:
-            try:
-                user = admin_supabase.auth.admin.create_user({
-                    "email": account_id,
-                    "password": access_key,
-                    "user_metadata": {"glcid": glc_id},
-                    "options": {"email_confirm": True}
-                })
-                st.session_state.supabase_uid = user.user.id
-            except Exception as create_err:
-                if "already been registered" not in str(create_err).lower():
-                    raise create_err  # Only raise if it's not a duplicate error
+        supabase_uid = ensure_supabase_user(account_id, access_key, glc_id)
+        if supabase_uid:
+            st.session_state.supabase_uid = supabase_uid
 
         st.session_state.supabase_user_checked = True
 
@@ -100,162 +72,7 @@ if "supabase_user_checked" not in st.session_state:
         st.warning("Supabase user setup failed. Please try again later.")
         st.stop()
 
-# === Function to update Function Health progress bar ===
-def update_progress(status, bar, message, percent):
-    if status:
-        status.write(message)
-    if bar:
-        bar.progress(percent)
-
-# === Function to scrape Function Health ===
-def scrape_function_health(user_email, user_pass, status=None, progress_bar=None):
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--window-size=1920x1080")
-
-    try:
-        service = Service(ChromeDriverManager().install())
-    except Exception:
-        service = Service("/usr/bin/chromedriver")
-        options.add_argument("--binary=/usr/bin/chromium")
-
-    driver = None
-
-    try:
-        if status:
-            update_progress(status, progress_bar, "Launching remote browser...", 10)
-
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.get("https://my.functionhealth.com/")
-        driver.maximize_window()
-
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "email"))
-        ).send_keys(user_email)
-
-        if status:
-            update_progress(status, progress_bar, "Accessing Function Health...", 20)
-
-        driver.find_element(By.ID, "password").send_keys(user_pass + Keys.RETURN)
-        time.sleep(5)
-        if "login" in driver.current_url.lower():
-            raise ValueError("Login failed — please check your Function Health credentials.")
-
-        driver.get("https://my.functionhealth.com/biomarkers")
-
-        if status:
-            update_progress(status, progress_bar, "Importing biomarkers...", 30)
-
-        WebDriverWait(driver, 12).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "[class^='biomarkerResultRow-styled__BiomarkerName']"))
-        )
-
-        everything = driver.find_elements(By.XPATH, "//h4 | //div[contains(@class, 'biomarkerResult-styled__ResultContainer')]")
-        data = []
-        current_category = None
-        total = len(everything)
-
-        for i, el in enumerate(everything):
-            percent = 30 + int((i + 1) / total * 50)
-            update_progress(status, progress_bar, "Importing biomarkers...", percent)
-
-            tag = el.tag_name
-
-            if tag == "h4":
-                current_category = el.text.strip()
-
-            elif tag == "div":
-                try:
-                    name = el.find_element(By.CSS_SELECTOR, "[class^='biomarkerResultRow-styled__BiomarkerName']").text.strip()
-                    status_text = value = units = ""
-                    values = el.find_elements(By.CSS_SELECTOR, "[class*='biomarkerChart-styled__ResultValue']")
-                    texts = [v.text.strip() for v in values]
-
-                    if len(texts) == 3:
-                        status_text, value, units = texts
-                    elif len(texts) == 2:
-                        status_text, value = texts
-                    elif len(texts) == 1:
-                        value = texts[0]
-
-                    try:
-                        unit_el = el.find_element(By.CSS_SELECTOR, "[class^='biomarkerChart-styled__UnitValue']")
-                        units = unit_el.text.strip()
-                    except:
-                        pass
-
-                    data.append({
-                        "category": current_category,
-                        "name": name,
-                        "status": status_text,
-                        "value": value,
-                        "units": units
-                    })
-
-                except Exception:
-                    continue
-
-    except Exception as e:
-        print(f"An error occurred during scraping process: {type(e).__name__} — {e}")
-        raise e
-
-    finally:
-        if driver:
-            try:
-                update_progress(status, progress_bar, "Closing remote browser...", 97)
-                driver.quit()
-                time.sleep(1)
-            except Exception as quit_error:
-                print(f"Error quitting driver: {quit_error}")
-
-    return pd.DataFrame(data)
-
-# === Prenuvo Redaction Function ===
-def redact_prenuvo_pdf(input_path, output_path):
-    doc = fitz.open(input_path)
-
-    patient_name = None
-    for i in range(min(3, len(doc))):
-        text = doc[i].get_text()
-        match = re.search(r"Patient:\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)", text)
-        if match:
-            patient_name = match.group(1).strip()
-            break
-
-    patterns = [
-        r"Time of scan:\s?.*",
-        r"Sex:\s?.*",
-        r"\b(Male|Female|Other|Non-Binary|Transgender|Intersex)\b",
-        r"Height:\s?.*",
-        r"Weight:\s?.*",
-        r"Date of Birth:\s?.*",
-        r"\b\d{4}-\d{2}-\d{2}\b",
-        r"Facility:\s?.*",
-        r"Patient:\s?.*",
-        r"Study:\s?[a-f0-9\-]{36}",
-        r"REPORT RECIPIENT\(S\):\s?.*",
-    ]
-
-    if patient_name:
-        escaped = re.escape(patient_name)
-        patterns.append(rf"\b{escaped}\b")
-        patterns.append(rf"Patient:\s*{escaped}")
-
-    for page in doc:
-        text = page.get_text()
-        for pattern in patterns:
-            for match in re.findall(pattern, text):
-                for rect in page.search_for(match):
-                    page.add_redact_annot(rect, fill=(0, 0, 0))
-        page.apply_redactions()
-
-    doc.save(output_path)
-    doc.close()
-
 # === Streamlit App ===
-user_supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
 
 if st.session_state.pop("just_deleted", False) or st.session_state.pop("just_imported", False):
     st.rerun()
@@ -265,19 +82,12 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs(["Function Health", "Prenuvo", "Trudiagno
 # === Try to restore saved CSV (stateless ghost-block logic)
 if not st.session_state.get("function_csv_ready"):
     try:
-        bucket = user_supabase.storage.from_("data")
-        function_filename = f"{username}/functionhealth.csv"
-        res = bucket.download(function_filename)
-        files = bucket.list(path=f"{username}/")
-        in_list = any(f["name"] == "functionhealth.csv" for f in files)
-
-        # === Ghost file — block it
-        if res and len(res) > 0 and not in_list:
-            st.session_state.function_csv_ready = False
-        elif res and len(res) > 0:
-            function_df = pd.read_csv(io.BytesIO(res))
-            st.session_state.function_csv = res
-            st.session_state.function_df = function_df
+        from biosnap.biomarkers import RAW_COLUMNS, load_biomarkers
+
+        # === Only listed files count — ghost files stay blocked
+        biomarkers = load_biomarkers(get_storage(), username)
+        if biomarkers is not None:
+            st.session_state.function_df = stash(biomarkers[RAW_COLUMNS])
             st.session_state.function_csv_ready = True
         else:
             st.session_state.function_csv_ready = False
@@ -285,29 +95,6 @@ if not st.session_state.get("function_csv_ready"):
         st.session_state.function_csv_ready = False
 
 
-# === Try to restore saved CSV (stateless ghost-block logic)
-if not st.session_state.get("csv_ready"):
-    try:
-        bucket = user_supabase.storage.from_("data")
-        filename = f"{username}/functionhealth.csv"
-        res = bucket.download(filename)
-        files = bucket.list(path=f"{username}/")
-        in_list = any(f["name"] == "functionhealth.csv" for f in files)
-
-        # === Ghost file — block it
-        if res and len(res) > 0 and not in_list:
-            st.session_state.csv_ready = False
-        elif res and len(res) > 0:
-            df = pd.read_csv(io.BytesIO(res))
-            st.session_state.csv = res
-            st.session_state.df = df
-            st.session_state.csv_ready = True
-        else:
-            st.session_state.csv_ready = False
-    except Exception:
-        st.session_state.csv_ready = False
-
-
 with tab1:
     st.markdown("<h1>Function Health</h1>", unsafe_allow_html=True)
     # === If deletion is in progress, stop everything else ===
@@ -318,12 +105,18 @@ with tab1:
             st.session_state.pop("function_df", None)
             st.session_state.pop("function_csv_filename", None)
             st.session_state.pop("function_supabase_uploaded", None)
+            st.session_state.pop("function_upload_ticket", None)
             st.session_state.pop("function_email", None)
             st.session_state.pop("function_password", None)
 
             try:
-                bucket = user_supabase.storage.from_("data")
-                bucket.remove([f"{username}/functionhealth.csv"])
+                upload_queue = get_upload_queue()
+                upload_queue.cancel(f"{username}/functionhealth.csv")
+                upload_queue.cancel(f"{username}/functionhealth.parquet")
+                bucket = get_storage()
+                bucket.remove([f"{username}/functionhealth.csv", f"{username}/functionhealth.parquet"])
+                from biosnap.aggregates import on_upload_removed
+                on_upload_removed(f"{username}/functionhealth.parquet")
 
                 max_attempts = 20
                 file_still_exists = True
@@ -351,9 +144,13 @@ with tab1:
 
     # === If data is loaded, show it ===
     elif st.session_state.get("function_csv_ready") and "function_df" in st.session_state:
-        st.dataframe(st.session_state.function_df)
+        st.dataframe(payload(st.session_state.function_df))
         st.success("Import successful!")
 
+        if "function_upload_ticket" in st.session_state:
+            if render_upload_status(st.session_state.function_upload_ticket, "function") == SAVED:
+                st.session_state.function_supabase_uploaded = True
+
         if st.button("Start Over"):
             st.session_state.deleting_in_progress = True
             st.rerun()
@@ -384,43 +181,36 @@ with tab1:
             progress_bar = st.progress(0)
             status = st.empty()
 
+            from biosnap.scheduler import SchedulerBusy
+            from biosnap.timeouts import SourceUnavailable
+
+            from biosnap.progress import Progress, placeholder_sink
+
+            progress = Progress("scrape", sinks=[placeholder_sink(status, progress_bar)])
+
             try:
-                function_df = scrape_function_health(user_email, user_pass, status, progress_bar)
-                update_progress(status, progress_bar, "Deleting Function Health credentials from memory...", 98)
+                # Runs on the backend worker (or in-process without BIOSNAP_BACKEND_URL)
+                from biosnap.scrape_jobs import run_import
+
+                function_df = run_import(user_email, user_pass, progress)
+                progress.stage("cleanup", "Deleting Function Health credentials from memory...", 98)
                 del user_email
                 del user_pass
                 st.session_state.pop("function_email", None)
                 st.session_state.pop("function_password", None)
+                progress.finish(f"Imported {len(function_df)} biomarkers.")
                 time.sleep(1)
                 status.empty()
                 progress_bar.empty()
 
-                function_csv_bytes = function_df.to_csv(index=False).encode()
-                st.session_state.function_csv = function_csv_bytes
-                st.session_state.function_df = function_df
-                st.session_state.function_csv_filename = f"{username}_functionhealth.csv"
-                st.session_state.function_csv_file = function_csv_bytes
+                # Upload to Supabase in the background: raw CSV, typed Parquet
+                # and a history snapshot of the rows that changed
+                from biosnap.imports import save_function_health_import
 
-                # Upload to Supabase
-                function_filename = f"{username}/functionhealth.csv"
-                bucket = user_supabase.storage.from_("data")
-
-                try:
-                    bucket.remove([function_filename])
-                except Exception:
-                    pass
-
-                response = bucket.upload(
-                    path=function_filename,
-                    file=function_csv_bytes,
-                    file_options={"content-type": "text/csv"}
-                )
-
-                res_data = response.__dict__
-                if "error" in res_data and res_data["error"]:
-                    st.error("Upload failed.")
-                else:
-                    st.session_state.function_supabase_uploaded = True
+                _, upload_ticket, _ = save_function_health_import(username, function_df)
+                st.session_state.function_df = stash(function_df)
+                st.session_state.function_csv_filename = f"{username}_functionhealth.csv"
+                st.session_state.function_upload_ticket = upload_ticket
 
                 st.session_state.to_initialize_function_csv = True
                 st.rerun()
@@ -430,6 +220,11 @@ with tab1:
                 status.empty()
                 st.error(str(ve))
 
+            except (SchedulerBusy, SourceUnavailable) as busy:
+                progress_bar.empty()
+                status.empty()
+                st.warning(str(busy))
+
             except Exception as e:
                 st.error(f"Scraping failed: {type(e).__name__} — {e}")
 
@@ -437,12 +232,16 @@ with tab1:
 with tab2:
     st.markdown("<h1>Prenuvo</h1>", unsafe_allow_html=True)
     filename = f"{username}/redacted_prenuvo_report.pdf"
-    bucket = user_supabase.storage.from_("data")
+    bucket = get_storage()
 
     file_list = bucket.list(path=username)
     file_exists = any(f["name"] == "redacted_prenuvo_report.pdf" for f in file_list)
+    saving_ticket = get_upload_queue().pending_ticket(filename)
 
-    if file_exists:
+    if saving_ticket:
+        st.success("Your report was approved!")
+        render_upload_status(saving_ticket, "prenuvo")
+    elif file_exists:
         st.success("Your report was successfully redacted and saved!")
         try:
             pdf_bytes = bucket.download(filename)
@@ -454,50 +253,23 @@ with tab2:
             st.error(f"Error retrieving file: {e}")
 
     elif "redacted_pdf_for_review" in st.session_state:
-        file_bytes = st.session_state.redacted_pdf_for_review
+        file_bytes = payload(st.session_state.redacted_pdf_for_review)
         st.markdown("""
             <div style='font-size:17.5px; line-height:1.6; margin-top:0.5rem; margin-bottom:1.5rem;'>
             <strong>Please Review Your Redacted Report:</strong> Browse through each page to ensure sensitive information has been removed. Click "Approve Redaction" to save the file to your account.
             </div>
         """, unsafe_allow_html=True)
 
-        base64_pdf = base64.b64encode(file_bytes).decode("utf-8")
-        st.markdown(f"""
-            <div style='font-size:17.5px; line-height:1.6; margin-bottom:1rem;'>
-            <a href="data:application/pdf;base64,{base64_pdf}" download="redacted_prenuvo_report.pdf">Click here to download your redacted report.</a><br>
-            Or scroll through the preview below to review each page.
-            </div>
-        """, unsafe_allow_html=True)
-
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        page_images = [
-            page.get_pixmap(dpi=150).tobytes("png")
-            for page in doc
-            if page.get_text().strip()
-        ]
-        doc.close()
-
-        img_html_blocks = [
-            f"<img src='data:image/png;base64,{base64.b64encode(img).decode()}' style='width:100%; margin-bottom: 1.5rem;'/>"
-            for img in page_images
-        ]
-
-        scrollable_html = f"""
-        <div style='height:650px; overflow-y:scroll; border:1px solid #ccc; padding:12px; background-color:#f9f9f9;'>
-            {''.join(img_html_blocks)}
-        </div>
-        """
-
-        components.html(scrollable_html, height=670, scrolling=False)
+        from biosnap.preview import render_pdf_review
+        render_pdf_review(file_bytes, "redacted_prenuvo_report.pdf", st.session_state.get("redaction_report"))
 
         if st.button("Approve Redaction", key="approve_redaction"):
-            with st.spinner("Saving redacted file..."):
-                try:
-                    bucket.upload(filename, file_bytes, {"content-type": "application/pdf"})
-                    st.session_state.pop("redacted_pdf_for_review", None)
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to save redacted file: {e}")
+            try:
+                get_upload_queue().submit(filename, file_bytes, "application/pdf")
+                st.session_state.pop("redacted_pdf_for_review", None)
+                st.rerun()
+            except OSError as e:
+                st.error(f"Failed to save redacted file: {e}")
 
         if st.button("Report an Issue", key="report_issue"):
             st.session_state.show_report_box = True
@@ -508,16 +280,17 @@ with tab2:
 
         if st.session_state.get("show_report_box") and not st.session_state.get("issue_submitted"):
             issue = st.text_area("Describe the issue with redaction:")
+            page = st.number_input("Page number (optional)", min_value=0, value=0, step=1, key="submit_issue_page")
             if st.button("Submit Issue", key="submit_issue"):
-                timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S-%f")
-                bucket.upload(
-                    f"{username}/issues/issue_{timestamp}.txt",
-                    issue.encode("utf-8"),
-                    {"content-type": "text/plain"}
-                )
-                st.session_state.issue_submitted = True
-                st.session_state.pop("show_report_box", None)
-                st.rerun()
+                from biosnap.issues import submit_issue
+                try:
+                    submit_issue(username, "prenuvo", issue, document=file_bytes, page=int(page) or None)
+                except Exception as e:
+                    st.error(f"Failed to submit issue: {e}")
+                else:
+                    st.session_state.issue_submitted = True
+                    st.session_state.pop("show_report_box", None)
+                    st.rerun()
 
         if st.session_state.get("issue_submitted"):
             st.success("Issue submitted.")
@@ -539,17 +312,14 @@ with tab2:
         uploaded = st.file_uploader("", type="pdf")
         if uploaded:
             with st.spinner("Redacting sensitive information..."):
-                input_path = "/tmp/prenuvo_original.pdf"
-                output_path = "/tmp/prenuvo_redacted.pdf"
-                with open(input_path, "wb") as f:
-                    f.write(uploaded.read())
-                redact_prenuvo_pdf(input_path, output_path)
-                os.remove(input_path)
-                with open(output_path, "rb") as f:
-                    pdf_bytes = f.read()
-                os.remove(output_path)
-
-                st.session_state.redacted_pdf_for_review = pdf_bytes
+                from biosnap.progress import Progress, placeholder_sink
+                from biosnap.redaction import redact_pdf_bytes
+                progress_bar = st.progress(0)
+                status = st.empty()
+                pdf_bytes, report = redact_pdf_bytes("prenuvo", uploaded.read(), Progress("redaction", sinks=[placeholder_sink(status, progress_bar)]))
+
+                st.session_state.redacted_pdf_for_review = stash(pdf_bytes)
+                st.session_state.redaction_report = report
 
                 for k in ["approved_redaction", "issue_submitted", "show_report_box"]:
                     st.session_state.pop(k, None)
@@ -559,60 +329,18 @@ with tab2:
 
 
 with tab3:
-    def redact_trudiagnostic_pdf(input_path, output_path):
-        doc = fitz.open(input_path)
-
-        for i, page in enumerate(doc):
-            # === Page 1 logic: redact name (above age), and demographic blocks
-            if i == 0:
-                body_patterns = [
-                    r"Sex:\s*\w+",
-                    r"Age:\s*\d+",
-                    r"https?://[^\s]+",
-                    r"www\.[^\s]+"
-                ]
-
-                for pattern in body_patterns:
-                    matches = re.finditer(pattern, page.get_text())
-                    for match in matches:
-                        matched_text = match.group()
-                        for rect in page.search_for(matched_text):
-                            page.add_redact_annot(rect, fill=(0, 0, 0))
-
-                text_blocks = page.get_text("blocks")
-                for j, block in enumerate(text_blocks):
-                    if "Age:" in block[4]:
-                        if j > 0:
-                            name_block = text_blocks[j - 1]
-                            rect = fitz.Rect(name_block[:4])
-                            page.add_redact_annot(rect, fill=(0, 0, 0))
-                        break
-
-                for block in text_blocks:
-                    text = block[4]
-                    if any(keyword in text for keyword in ["ID#:", "Collected:", "Reported:"]):
-                        rect = fitz.Rect(block[:4])
-                        page.add_redact_annot(rect, fill=(0, 0, 0))
-
-            # === Footer cleanup on all pages
-            for block in page.get_text("blocks"):
-                if "PROVIDED BY:" in block[4] or "trudiagnostic.com" in block[4] or "trudiagnostic/apireports.aspx" in block[4]:
-                    rect = fitz.Rect(block[:4])
-                    page.add_redact_annot(rect, fill=(0, 0, 0))
-
-            page.apply_redactions()
-
-        doc.save(output_path)
-        doc.close()
-
     st.markdown("<h1>Trudiagnostic</h1>", unsafe_allow_html=True)
     filename = f"{username}/redacted_trudiagnostic_report.pdf"
-    bucket = user_supabase.storage.from_("data")
+    bucket = get_storage()
 
     file_list = bucket.list(path=username)
     file_exists = any(f["name"] == "redacted_trudiagnostic_report.pdf" for f in file_list)
+    saving_ticket = get_upload_queue().pending_ticket(filename)
 
-    if file_exists:
+    if saving_ticket:
+        st.success("Your report was approved!")
+        render_upload_status(saving_ticket, "trudiagnostic")
+    elif file_exists:
         st.success("Your report was successfully redacted and saved!")
         try:
             pdf_bytes = bucket.download(filename)
@@ -623,50 +351,23 @@ with tab3:
         except Exception as e:
             st.error(f"Error retrieving file: {e}")
     elif "trudiagnostic_pdf_for_review" in st.session_state:
-        file_bytes = st.session_state.trudiagnostic_pdf_for_review
+        file_bytes = payload(st.session_state.trudiagnostic_pdf_for_review)
         st.markdown("""
             <div style='font-size:17.5px; line-height:1.6; margin-top:0.5rem; margin-bottom:1.5rem;'>
             <strong>Please Review Your Redacted Report:</strong> Browse through each page to ensure sensitive information has been removed. Click "Approve Redaction" to save the file to your account.
             </div>
         """, unsafe_allow_html=True)
 
-        base64_pdf = base64.b64encode(file_bytes).decode("utf-8")
-        st.markdown(f"""
-            <div style='font-size:17.5px; line-height:1.6; margin-bottom:1rem;'>
-            <a href="data:application/pdf;base64,{base64_pdf}" download="redacted_trudiagnostic_report.pdf">Click here to download your redacted report.</a><br>
-            Or scroll through the preview below to review each page.
-            </div>
-        """, unsafe_allow_html=True)
-
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        page_images = [
-            page.get_pixmap(dpi=150).tobytes("png")
-            for page in doc
-            if page.get_text().strip()
-        ]
-        doc.close()
-
-        img_html_blocks = [
-            f"<img src='data:image/png;base64,{base64.b64encode(img).decode()}' style='width:100%; margin-bottom: 1.5rem;'/>"
-            for img in page_images
-        ]
-
-        scrollable_html = f"""
-        <div style='height:650px; overflow-y:scroll; border:1px solid #ccc; padding:12px; background-color:#f9f9f9;'>
-            {''.join(img_html_blocks)}
-        </div>
-        """
-
-        components.html(scrollable_html, height=670, scrolling=False)
+        from biosnap.preview import render_pdf_review
+        render_pdf_review(file_bytes, "redacted_trudiagnostic_report.pdf", st.session_state.get("trudiagnostic_redaction_report"))
 
         if st.button("Approve Redaction", key="approve_trudiagnostic"):
-            with st.spinner("Saving redacted file..."):
-                try:
-                    bucket.upload(filename, file_bytes, {"content-type": "application/pdf"})
-                    st.session_state.pop("trudiagnostic_pdf_for_review", None)
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to save redacted file: {e}")
+            try:
+                get_upload_queue().submit(filename, file_bytes, "application/pdf")
+                st.session_state.pop("trudiagnostic_pdf_for_review", None)
+                st.rerun()
+            except OSError as e:
+                st.error(f"Failed to save redacted file: {e}")
 
         if st.button("Report an Issue", key="report_trudiagnostic_issue"):
             st.session_state.trudiagnostic_show_report_box = True
@@ -677,16 +378,17 @@ with tab3:
 
         if st.session_state.get("trudiagnostic_show_report_box") and not st.session_state.get("trudiagnostic_issue_submitted"):
             issue = st.text_area("Describe the issue with redaction:")
+            page = st.number_input("Page number (optional)", min_value=0, value=0, step=1, key="submit_trudiagnostic_issue_page")
             if st.button("Submit Issue", key="submit_trudiagnostic_issue"):
-                timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S-%f")
-                bucket.upload(
-                    f"{username}/issues/issue_{timestamp}.txt",
-                    issue.encode("utf-8"),
-                    {"content-type": "text/plain"}
-                )
-                st.session_state.trudiagnostic_issue_submitted = True
-                st.session_state.pop("trudiagnostic_show_report_box", None)
-                st.rerun()
+                from biosnap.issues import submit_issue
+                try:
+                    submit_issue(username, "trudiagnostic", issue, document=file_bytes, page=int(page) or None)
+                except Exception as e:
+                    st.error(f"Failed to submit issue: {e}")
+                else:
+                    st.session_state.trudiagnostic_issue_submitted = True
+                    st.session_state.pop("trudiagnostic_show_report_box", None)
+                    st.rerun()
 
         if st.session_state.get("trudiagnostic_issue_submitted"):
             st.success("Issue submitted.")
@@ -711,17 +413,14 @@ with tab3:
         uploaded = st.file_uploader("", type="pdf", key="trudiagnostic_upload")
         if uploaded:
             with st.spinner("Redacting sensitive information..."):
-                input_path = "/tmp/trudiagnostic_original.pdf"
-                output_path = "/tmp/trudiagnostic_redacted.pdf"
-                with open(input_path, "wb") as f:
-                    f.write(uploaded.read())
-                redact_trudiagnostic_pdf(input_path, output_path)
-                os.remove(input_path)
-                with open(output_path, "rb") as f:
-                    pdf_bytes = f.read()
-                os.remove(output_path)
-
-                st.session_state.trudiagnostic_pdf_for_review = pdf_bytes
+                from biosnap.progress import Progress, placeholder_sink
+                from biosnap.redaction import redact_pdf_bytes
+                progress_bar = st.progress(0)
+                status = st.empty()
+                pdf_bytes, report = redact_pdf_bytes("trudiagnostic", uploaded.read(), Progress("redaction", sinks=[placeholder_sink(status, progress_bar)]))
+
+                st.session_state.trudiagnostic_pdf_for_review = stash(pdf_bytes)
+                st.session_state.trudiagnostic_redaction_report = report
                 time.sleep(1.5)
                 st.rerun()
 
@@ -730,40 +429,45 @@ with tab4:
     st.markdown("<h1>Biostarks</h1>", unsafe_allow_html=True)
 
     biostarks_filename = f"{username}/biostarks.csv"
-    bucket = user_supabase.storage.from_("data")
+    bucket = get_storage()
 
     # === Load saved CSV if available — block ghost files
     if "biostarks_df" not in st.session_state:
         try:
-            biostarks_bytes = bucket.download(biostarks_filename)
+            from biosnap.dashboard import read_frame
+
             files = bucket.list(path=username)
-            in_list = any(f["name"] == "biostarks.csv" for f in files)
+            entry = next((f for f in files if f["name"] == "biostarks.csv"), None)
 
-            if biostarks_bytes and len(biostarks_bytes) > 0 and in_list:
-                st.session_state.biostarks_df = pd.read_csv(io.BytesIO(biostarks_bytes))
+            if entry is not None:
+                st.session_state.biostarks_df = stash(read_frame(bucket, biostarks_filename, object_etag(entry), remember=False))
             else:
-                st.session_state.biostarks_df = pd.DataFrame(columns=["Metric", "Value"])
+                st.session_state.biostarks_df = None
         except Exception:
-            st.session_state.biostarks_df = pd.DataFrame(columns=["Metric", "Value"])
+            st.session_state.biostarks_df = None
 
     # === Handle Start Over ===
     if st.session_state.get("reset_biostarks", False):
         with st.spinner("Deleting file from database..."):
             try:
+                get_upload_queue().cancel(biostarks_filename)
                 bucket.remove([biostarks_filename])
+                from biosnap.aggregates import on_upload_removed
+                on_upload_removed(biostarks_filename)
                 st.session_state.biostarks_deleted = True
             except Exception as e:
                 st.warning(f"Failed to delete file: {e}")
                 st.session_state.biostarks_deleted = False
 
-        for key in ["reset_biostarks", "biostarks_submitted"]:
+        for key in ["reset_biostarks", "biostarks_submitted", "biostarks_upload_ticket"]:
             st.session_state.pop(key, None)
 
-        st.session_state.biostarks_df = pd.DataFrame(columns=["Metric", "Value"])
+        st.session_state.biostarks_df = None
         st.rerun()
 
     # === If no data yet, show form ===
-    if st.session_state.biostarks_df.empty:
+    biostarks_df = payload(st.session_state.biostarks_df)
+    if biostarks_df is None or biostarks_df.empty:
         st.markdown("""
         <div style='font-size:17.5px; line-height:1.6'>
         Please log in to <a href='https://results.biostarks.com/' target='_blank'>Biostarks</a> and fill in the fields below with the relevant values.<br><br>
@@ -828,6 +532,8 @@ with tab4:
             if missing:
                 st.error("Please complete all required fields before submitting.")
             else:
+                import pandas as pd
+
                 biostarks_df = pd.DataFrame([
                     ["Longevity NAD+ Score", st.session_state["Longevity NAD+ Score"]],
                     ["NAD+ Levels", st.session_state["NAD+ Levels"]],
@@ -837,132 +543,34 @@ with tab4:
                 ], columns=["Metric", "Value"])
 
 
-                with st.spinner("Saving to database..."):
-                    st.session_state.biostarks_df = biostarks_df
-                    biostarks_csv_bytes = biostarks_df.to_csv(index=False).encode()
-
-                    try:
-                        bucket.remove([biostarks_filename])
-                    except:
-                        pass
+                st.session_state.biostarks_df = stash(biostarks_df)
+                biostarks_csv_bytes = biostarks_df.to_csv(index=False).encode()
 
-                    bucket.upload(
-                        path=biostarks_filename,
-                        file=biostarks_csv_bytes,
-                        file_options={"content-type": "text/csv"}
-                    )
+                st.session_state.biostarks_upload_ticket = get_upload_queue().submit(
+                    biostarks_filename, biostarks_csv_bytes, "text/csv"
+                )
 
-                    time.sleep(1)
-                    st.session_state["biostarks_submitted"] = True
-                    st.rerun()
+                st.session_state["biostarks_submitted"] = True
+                st.rerun()
 
     # === If data exists, show table and start over ===
     else:
-        st.dataframe(st.session_state.biostarks_df)
+        st.dataframe(biostarks_df)
         st.success("Upload successful!")
 
+        if "biostarks_upload_ticket" in st.session_state:
+            render_upload_status(st.session_state.biostarks_upload_ticket, "biostarks")
+
         if st.button("Start Over", key="reset_biostarks"):
             st.session_state.reset_biostarks = True
             st.rerun()
 
-# with tab5:
-#     st.markdown("## Behavioral Data")
-#     behavior_scores_file = f"{username}/behavioral_scores.csv"
-#     try:
-#         behavior_scores_bytes = user_supabase.storage.from_("data").download(behavior_scores_file)
-#         if isinstance(behavior_scores_bytes, bytes):
-#             behavior_scores_df = pd.read_csv(io.BytesIO(behavior_scores_bytes))
-#             st.dataframe(behavior_scores_df)
-#         else:
-#             st.info("Please add your behavioral data.")
-#     except Exception as e:
-#         error_msg = str(e).lower()
-#         if "not found" in error_msg or "no such file" in error_msg:
-#             st.info("Please add your behavioral data.")
-#         else:
-#             st.warning("There was an error retrieving your behavioral data. Please contact admin.")
-
-#     st.markdown("## Oregon Data")
-#     oregon_file = f"{username}/Oregon.csv"
-#     try:
-#         oregon_bytes = user_supabase.storage.from_("data").download(oregon_file)
-#         if isinstance(oregon_bytes, bytes):
-#             oregon_df = pd.read_csv(io.BytesIO(oregon_bytes))
-#             st.dataframe(oregon_df)
-#         else:
-#             st.info("Please add your Oregon data.")
-#     except Exception as e:
-#         error_msg = str(e).lower()
-#         if "not found" in error_msg or "no such file" in error_msg:
-#             st.info("Please add your Oregon data.")
-#         else:
-#             st.warning("There was an error retrieving your Oregon data. Please contact admin.")
-
-#     st.markdown("## Function Health Data")
-#     fh_file = f"{username}/functionhealth.csv"
-#     bucket = user_supabase.storage.from_("data")
-
-#     try:
-#         fh_bytes = bucket.download(fh_file)
-#         if isinstance(fh_bytes, bytes):
-#             fh_df = pd.read_csv(io.BytesIO(fh_bytes))
-#             st.dataframe(fh_df)
-#         else:
-#             st.info("Please add your Function Health data.")
-#     except Exception as e:
-#         error_msg = str(e).lower()
-#         if "not found" in error_msg or "no such file" in error_msg:
-#             st.info("Please import your Function Health data.")
-#         else:
-#             st.warning("There was an error retrieving your Function Health data. Please contact admin.")
-
-#     st.markdown("## Prenuvo Data")
-#     prenuvo_pdf_path = f"{username}/redacted_prenuvo_report.pdf"
-#     try:
-#         prenuvo_bytes = user_supabase.storage.from_("data").download(prenuvo_pdf_path)
-#         if isinstance(prenuvo_bytes, bytes):
-#             b64 = base64.b64encode(prenuvo_bytes).decode()
-#             st.markdown(f"<a href='data:application/pdf;base64,{b64}' download='redacted_prenuvo_report.pdf'>Click here to download your redacted Prenuvo report.</a>", unsafe_allow_html=True)
-#         else:
-#             st.info("Please add your Prenuvo data.")
-#     except Exception as e:
-#         st.info("Please add your Prenuvo data.")
-
-#     st.markdown("## Trudiagnostic Data")
-#     trudiagnostic_pdf_path = f"{username}/redacted_trudiagnostic_report.pdf"
-#     try:
-#         trudiagnostic_bytes = user_supabase.storage.from_("data").download(trudiagnostic_pdf_path)
-#         if isinstance(trudiagnostic_bytes, bytes):
-#             b64 = base64.b64encode(trudiagnostic_bytes).decode()
-#             st.markdown(f"<a href='data:application/pdf;base64,{b64}' download='redacted_trudiagnostic_report.pdf'>Click here to download your redacted Trudiagnostic report.</a>", unsafe_allow_html=True)
-#         else:
-#             st.info("Please add your Trudiagnostic data.")
-#     except Exception as e:
-#         st.info("Please add your Trudiagnostic data.")
-
-#     st.markdown("## Biostarks")
-#     biostarks_file = f"{username}/biostarks.csv"
-#     try:
-#         biostarks_bytes = user_supabase.storage.from_("data").download(biostarks_file)
-#         if isinstance(biostarks_bytes, bytes):
-#             biostarks_df = pd.read_csv(io.BytesIO(biostarks_bytes))
-#             st.dataframe(biostarks_df)
-#         else:
-#             st.info("Please add your Biostarks data.")
-#     except Exception as e:
-#         error_msg = str(e).lower()
-#         if "not found" in error_msg or "no such file" in error_msg:
-#             st.info("Please add your Biostarks data.")
-#         else:
-#             st.warning("There was an error retrieving your Biostarks data. Please contact admin.")
-
-
 with tab5:
     # === Try to load saved plan if not already in session state ===
     if "intervention_plan_df" not in st.session_state:
         try:
             plan_filename = f"{username}/intervention_plan.csv"
-            bucket = user_supabase.storage.from_("data")
+            bucket = get_storage()
 
             # Step 1: List all files under this user
             metadata = bucket.list(username)
@@ -982,7 +590,7 @@ with tab5:
                 bytes_data = bucket.download(plan_filename)
                 if isinstance(bytes_data, bytes):
                     df = pd.read_csv(io.BytesIO(bytes_data))
-                    st.session_state.intervention_plan_df = df
+                    st.session_state.intervention_plan_df = stash(df)
         except:
             pass
 
@@ -990,7 +598,10 @@ with tab5:
     if "intervention_plan_df" in st.session_state:
         timestamp = st.session_state.get("intervention_plan_timestamp")
         st.markdown(f"## Intervention Plan (Saved on {timestamp})" if timestamp else "## Intervention Plan")
-        st.dataframe(st.session_state.intervention_plan_df)
+        st.dataframe(payload(st.session_state.intervention_plan_df))
+
+        if "intervention_plan_upload_ticket" in st.session_state:
+            render_upload_status(st.session_state.intervention_plan_upload_ticket, "intervention_plan")
 
     # === Otherwise, guide the user to create a new plan ===
     else:
@@ -1052,23 +663,18 @@ with tab5:
                     from datetime import datetime
 
                     plan_df = pd.DataFrame([(k, v) for k, v in plans.items()], columns=["Category", "Plan"])
-                    st.session_state.intervention_plan_df = plan_df
+                    st.session_state.intervention_plan_df = stash(plan_df)
 
-                    # Save to Supabase
+                    # Save to Supabase in the background
                     csv_bytes = plan_df.to_csv(index=False).encode()
                     plan_filename = f"{username}/intervention_plan.csv"
-                    bucket = user_supabase.storage.from_("data")
-
-                    try:
-                        bucket.remove([plan_filename])
-                    except:
-                        pass
-
-                    bucket.upload(
-                        path=plan_filename,
-                        file=csv_bytes,
-                        file_options={"content-type": "text/csv"}
+                    st.session_state.intervention_plan_upload_ticket = get_upload_queue().submit(
+                        plan_filename, csv_bytes, "text/csv"
                     )
 
                     st.session_state.intervention_plan_timestamp = datetime.utcnow().strftime("%B %d, %Y")
-                    st.rerun()
\ No newline at end of file
+                    st.rerun()
+    # === Everything the participant has saved, fetched concurrently ===
+    st.divider()
+    if st.toggle("Show all my data", key="show_dashboard"):
+        render_dashboard(username)
@@ -0,0 +1,133 @@
+import threading
+import warnings
+
+import pandas as pd
+import pytest
+
+from biosnap import aggregates
+from biosnap.cache import MemoryCache, NullCache, set_cache
+from biosnap.storage import LocalStorage, MemoryStorage, StorageError
+from biosnap.uploads import UploadQueue
+
+
+class SlowStorage(MemoryStorage):
+    """Uploads wait until released, so writes pile up in the queue."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def upload(self, path, data, content_type="application/octet-stream"):
+        self.release.wait(5)
+        super().upload(path, data, content_type)
+
+
+class BrokenStorage(MemoryStorage):
+    def download(self, path):
+        raise StorageError("connection reset")
+
+
+def new_process(monkeypatch):
+    monkeypatch.setattr(aggregates, "_state", {"aggregates": None, "seen": {}, "checked": 0.0})
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    set_cache(NullCache())
+    new_process(monkeypatch)
+
+
+def biostarks_rows(glc_id, value):
+    return aggregates.biostarks_values(glc_id, pd.DataFrame({"Metric": ["HRV"], "Value": [str(value)]}))
+
+
+def queue_for(storage, tmp_path, name="queue"):
+    return UploadQueue(lambda: storage, journal_dir=str(tmp_path / name), base_delay=0.01, max_attempts=2)
+
+
+def participants(layer):
+    return sorted(layer.values["glc_id"])
+
+
+def test_rapid_updates_keep_every_participant(tmp_path, monkeypatch):
+    storage = SlowStorage()
+    queue = queue_for(storage, tmp_path)
+    for i in range(1, 5):
+        aggregates._apply(f"u{i}", "biostarks", biostarks_rows(f"u{i}", i), storage, queue)
+
+    layer = aggregates.get_aggregates(storage, max_age=0, upload_queue=queue)
+    assert participants(layer) == ["u1", "u2", "u3", "u4"]
+    assert layer.distribution("HRV")["count"].iloc[0] == 4
+
+    storage.release.set()
+    assert queue.drain(timeout=10)
+    assert participants(aggregates.get_aggregates(storage, max_age=0, upload_queue=queue)) == ["u1", "u2", "u3", "u4"]
+    new_process(monkeypatch)
+    assert participants(aggregates.get_aggregates(storage, max_age=0)) == ["u1", "u2", "u3", "u4"]
+
+
+def test_replicas_do_not_lose_each_others_updates(tmp_path, monkeypatch):
+    storage = MemoryStorage()
+    replica_a, replica_b = queue_for(storage, tmp_path, "a"), queue_for(storage, tmp_path, "b")
+    aggregates._apply("u1", "biostarks", biostarks_rows("u1", 1), storage, replica_a)
+    state_a = aggregates._state
+    # Replica b starts before a's write lands and updates another participant
+    new_process(monkeypatch)
+    aggregates._apply("u2", "biostarks", biostarks_rows("u2", 2), storage, replica_b)
+    assert replica_a.drain(timeout=5) and replica_b.drain(timeout=5)
+
+    assert participants(aggregates.get_aggregates(storage, max_age=0, upload_queue=replica_b)) == ["u1", "u2"]
+    monkeypatch.setattr(aggregates, "_state", state_a)
+    assert participants(aggregates.get_aggregates(storage, max_age=0, upload_queue=replica_a)) == ["u1", "u2"]
+
+
+def test_removed_uploads_leave_the_layer(tmp_path, monkeypatch):
+    storage = MemoryStorage()
+    queue = queue_for(storage, tmp_path)
+    aggregates._apply("u1", "biostarks", biostarks_rows("u1", 1), storage, queue)
+    aggregates._apply("u2", "biostarks", biostarks_rows("u2", 2), storage, queue)
+    assert queue.drain(timeout=5)
+    other = aggregates._state
+    new_process(monkeypatch)
+    aggregates.get_aggregates(storage, max_age=0)
+    monkeypatch.setattr(aggregates, "_state", other)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        aggregates._apply("u1", "biostarks", aggregates._empty_values(), storage, queue)
+    layer = aggregates.get_aggregates(storage, max_age=0, upload_queue=queue)
+    assert participants(layer) == ["u2"]
+    assert layer.distribution("HRV")["count"].iloc[0] == 1
+    assert list(aggregates._listing(storage)) == [aggregates.contribution_path("biostarks", "u2")]
+
+    new_process(monkeypatch)
+    assert participants(aggregates.get_aggregates(storage, max_age=0)) == ["u2"]
+
+
+def test_cold_start_reuses_the_combined_tables(tmp_path, monkeypatch):
+    set_cache(MemoryCache())
+    storage = LocalStorage(str(tmp_path / "bucket"))
+    queue = queue_for(storage, tmp_path)
+    for i in range(1, 3):
+        aggregates._apply(f"u{i}", "biostarks", biostarks_rows(f"u{i}", i), storage, queue)
+    assert queue.drain(timeout=5)
+    new_process(monkeypatch)
+    assert participants(aggregates.get_aggregates(storage, max_age=0)) == ["u1", "u2"]
+
+    new_process(monkeypatch)
+    monkeypatch.setattr(storage, "download", BrokenStorage().download)
+    assert participants(aggregates.get_aggregates(storage, max_age=0)) == ["u1", "u2"]
+
+
+def test_missing_layer_is_empty():
+    layer = aggregates.get_aggregates(MemoryStorage(), max_age=0)
+    assert layer.values.empty
+
+
+def test_storage_errors_are_not_treated_as_empty(tmp_path):
+    storage = BrokenStorage()
+    storage.upload(aggregates.contribution_path("biostarks", "u0"), b"rows")
+    queue = queue_for(storage, tmp_path)
+    with pytest.raises(StorageError):
+        aggregates._apply("u1", "biostarks", biostarks_rows("u1", 1), storage, queue)
+    assert queue.pending_ticket(aggregates.contribution_path("biostarks", "u1")) is None
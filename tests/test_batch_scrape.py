@@ -0,0 +1,50 @@
+import pandas as pd
+
+from biosnap import batch_scrape
+from biosnap.storage import MemoryStorage, StorageError
+from biosnap.uploads import UploadQueue
+
+
+class FailingStorage(MemoryStorage):
+    """Uploads raise while ``fail`` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.fail = False
+
+    def upload(self, path, data, content_type="application/octet-stream"):
+        if self.fail:
+            raise StorageError("unavailable")
+        super().upload(path, data, content_type)
+
+
+def scraped(email, password):
+    return pd.DataFrame({
+        "category": ["Heart"], "name": ["LDL"], "status": ["In Range"], "value": ["90"], "units": ["mg/dL"],
+    })
+
+
+def make_runner(storage, tmp_path):
+    queue = UploadQueue(lambda: storage, journal_dir=str(tmp_path / "journal"), base_delay=0.01, max_attempts=1)
+    return batch_scrape.BatchScrapeRunner(
+        [{"glc_id": "u1", "email": "a@example.com", "password": "pw"}],
+        str(tmp_path / "checkpoint.json"),
+        rate_limiter=batch_scrape.HostRateLimiter(per_minute=0),
+        scrape=scraped,
+        save=lambda glc_id, df, queue: batch_scrape._default_save(glc_id, df, queue, bucket=storage),
+        upload_queue=queue,
+    )
+
+
+def test_job_is_ok_only_once_uploads_are_saved(tmp_path):
+    storage = FailingStorage()
+    storage.fail = True
+    summary = make_runner(storage, tmp_path).run()
+    assert summary["failed"] == 1 and "unavailable" in summary["failures"]["u1"]
+
+    # The rerun retries the failed job
+    storage.fail = False
+    summary = make_runner(storage, tmp_path).run()
+    assert (summary["succeeded"], summary["skipped"]) == (1, 0)
+    assert storage.download("u1/functionhealth.parquet")
+    assert make_runner(storage, tmp_path).run()["skipped"] == 1
@@ -0,0 +1,38 @@
+import warnings
+
+import pandas as pd
+
+from biosnap import biomarkers
+from biosnap.cache import NullCache, set_cache
+from biosnap.storage import MemoryStorage
+
+RAW = pd.DataFrame({
+    "category": ["Heart", "Heart", "Infections"],
+    "name": ["LDL", "Lp(a)", "HIV"],
+    "status": ["In Range", "In Range", "In Range"],
+    "value": ["90", "≤ 10", "Negative"],
+    "units": ["mg/dL", "nmol/L", ""],
+})
+
+
+def test_normalize_splits_comparators_without_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        typed = biomarkers.normalize_biomarkers(RAW)
+    assert list(typed["comparator"]) == ["", "<=", ""]
+    assert list(typed["value_num"].fillna(-1)) == [90.0, 10.0, -1]
+    assert typed["result"].iloc[2] == "Negative"
+
+
+def test_load_prefers_parquet_and_ignores_unlisted_users():
+    set_cache(NullCache())
+    storage = MemoryStorage()
+    assert biomarkers.load_biomarkers(storage, "u1") is None
+
+    storage.upload("u1/functionhealth.csv", b"category,name,status,value,units\nHeart,LDL,In Range,90,mg/dL\n")
+    assert list(biomarkers.load_biomarkers(storage, "u1")["value_num"]) == [90.0]
+
+    storage.upload("u1/functionhealth.parquet", biomarkers.to_parquet_bytes(biomarkers.normalize_biomarkers(RAW)))
+    loaded = biomarkers.load_biomarkers(storage, "u1")
+    assert list(loaded["name"]) == ["LDL", "Lp(a)", "HIV"]
+    assert list(loaded[biomarkers.RAW_COLUMNS].columns) == biomarkers.RAW_COLUMNS
@@ -0,0 +1,81 @@
+import time
+
+import pandas as pd
+import pytest
+
+from biosnap import cache as cache_module, dashboard
+from biosnap.cache import ManifestCache, MemoryCache, SqliteCache, set_cache
+from biosnap.storage import InstrumentedStorage, LocalStorage, MemoryStorage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "TOUCH_SECONDS", 0)  # sqlite records every read hit
+    if request.param == "memory":
+        return MemoryCache(max_bytes=100)
+    return SqliteCache(str(tmp_path / "cache.sqlite"), max_bytes=100)
+
+
+def test_entries_expire(cache):
+    cache.set("a", b"value", ttl=0.05)
+    cache.set("b", b"value", ttl=60)
+    assert cache.get("a") == b"value"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get("b") == b"value"
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.set("a", b"x" * 40)
+    cache.set("b", b"x" * 40)
+    assert cache.get("a") is not None  # b is now the oldest
+    cache.set("c", b"x" * 40)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.usage()["bytes"] <= 100
+
+
+def test_manifests_are_invalidated_by_writes():
+    manifests = ManifestCache(MemoryCache(), "test")
+    storage = InstrumentedStorage(MemoryStorage(), manifests)
+    storage.upload("u1/a.csv", b"a")
+    assert [e["name"] for e in storage.list("u1/")] == ["a.csv"]
+    assert manifests.get("u1") is not None and manifests.get("") is None
+
+    storage.list("")
+    storage.upload("u1/b.csv", b"b")
+    assert manifests.get("u1") is None and manifests.get("") is None
+    assert [e["name"] for e in storage.list("u1/")] == ["a.csv", "b.csv"]
+
+    storage.remove(["u1/a.csv"])
+    assert manifests.get("u1") is None
+    assert [e["name"] for e in storage.list("u1/")] == ["b.csv"]
+
+
+def test_frames_are_shared_as_parquet(tmp_path, monkeypatch):
+    shared = set_cache(MemoryCache())
+    monkeypatch.setattr(dashboard, "_frames", dashboard._LRU(8))
+    storage = LocalStorage(str(tmp_path))
+    storage.upload("u1/biostarks.csv", b"Metric,Value\nHRV,42\n")
+
+    frame = dashboard.read_frame(storage, "u1/biostarks.csv", "etag1", remember=False)
+    assert dashboard._frames.get(("u1/biostarks.csv", "etag1")) is None
+    key = f"frame:{storage.cache_namespace}:u1/biostarks.csv:etag1"
+    assert shared.get(key).startswith(b"PAR1")
+
+    storage.remove(["u1/biostarks.csv"])  # served from the shared tier
+    pd.testing.assert_frame_equal(dashboard.read_frame(storage, "u1/biostarks.csv", "etag1"), frame)
+    assert dashboard._frames.get(("u1/biostarks.csv", "etag1")) is not None
+
+
+def test_frame_lru_is_bounded_by_bytes():
+    frame = pd.DataFrame({"value": range(100)})
+    size = dashboard._frame_size(frame)
+    frames = dashboard._LRU(10, max_bytes=size * 2, size=dashboard._frame_size)
+    for key in ("a", "b", "c"):
+        frames.put(key, frame)
+    assert frames.get("a") is None
+    assert frames.get("b") is not None and frames.get("c") is not None
+
+    frames.put("big", pd.DataFrame({"value": range(1000)}))
+    assert frames.get("big") is None
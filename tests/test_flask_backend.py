@@ -0,0 +1,56 @@
+import pytest
+
+import flask_backend
+
+
+@pytest.fixture
+def client():
+    return flask_backend.app.test_client()
+
+
+def test_worker_routes_reject_requests_without_configured_token(client, monkeypatch):
+    monkeypatch.setattr(flask_backend, "WORKER_TOKEN", None)
+    monkeypatch.setattr(flask_backend, "WORKER_ALLOW_ANONYMOUS", False)
+    assert client.post("/jobs/scrape", json={"email": "a", "password": "b"}).status_code == 403
+    assert client.get("/jobs/abc").status_code == 403
+
+
+def test_worker_routes_open_only_with_local_dev_flag(client, monkeypatch):
+    monkeypatch.setattr(flask_backend, "WORKER_TOKEN", None)
+    monkeypatch.setattr(flask_backend, "WORKER_ALLOW_ANONYMOUS", True)
+    assert client.get("/jobs/abc").status_code == 404
+
+
+def test_worker_routes_check_token(client, monkeypatch):
+    monkeypatch.setattr(flask_backend, "WORKER_TOKEN", "secret")
+    monkeypatch.setattr(flask_backend, "WORKER_ALLOW_ANONYMOUS", True)
+    assert client.get("/jobs/abc", headers={"X-Worker-Token": "wrong"}).status_code == 403
+    assert client.get("/jobs/abc", headers={"X-Worker-Token": "secret"}).status_code == 404
+
+
+def test_progress_stream_requires_worker_token(client, monkeypatch):
+    from biosnap.progress import Progress
+
+    monkeypatch.setattr(flask_backend, "WORKER_TOKEN", "secret")
+    progress = Progress("scrape", operation_id="job1")
+    progress.finish("Imported 3 biomarkers.")
+
+    assert client.get("/progress/job1/events").status_code == 403
+    response = client.get("/progress/job1/events", headers={"X-Worker-Token": "secret"})
+    assert response.status_code == 200
+    assert b"Imported 3 biomarkers." in response.data
+
+
+def test_admin_routes_reject_unset_or_empty_token(client, monkeypatch):
+    for token in (None, ""):
+        monkeypatch.setattr(flask_backend, "ADMIN_TOKEN", token)
+        assert client.get("/admin/progress", headers={"X-Admin-Token": ""}).status_code == 403
+    monkeypatch.setattr(flask_backend, "ADMIN_TOKEN", "admin")
+    assert client.get("/admin/progress", headers={"X-Admin-Token": "admin!"}).status_code == 403
+    assert client.get("/admin/progress", headers={"X-Admin-Token": "admin"}).status_code == 200
+
+
+def test_worker_routes_reject_empty_token_without_local_dev_flag(client, monkeypatch):
+    monkeypatch.setattr(flask_backend, "WORKER_TOKEN", "")
+    monkeypatch.setattr(flask_backend, "WORKER_ALLOW_ANONYMOUS", False)
+    assert client.get("/jobs/abc", headers={"X-Worker-Token": ""}).status_code == 403
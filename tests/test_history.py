@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from biosnap import history
+from biosnap.biomarkers import normalize_biomarkers
+from biosnap.storage import MemoryStorage, StorageError
+from biosnap.uploads import UploadQueue
+
+
+class BrokenStorage(MemoryStorage):
+    def download(self, path):
+        raise StorageError("connection reset")
+
+
+def panel(ldl):
+    return normalize_biomarkers(pd.DataFrame({
+        "category": ["Heart", "Heart"],
+        "name": ["LDL", "HDL"],
+        "status": ["In Range", "In Range"],
+        "value": [str(ldl), "60"],
+        "units": ["mg/dL", "mg/dL"],
+    }))
+
+
+def test_imports_record_only_changes(tmp_path):
+    storage = MemoryStorage()
+    queue = UploadQueue(lambda: storage, journal_dir=str(tmp_path), base_delay=0.01)
+    first = history.record_import(storage, queue, "u1", panel(100), imported_at="20250101T000000000000Z")
+    second = history.record_import(storage, queue, "u1", panel(90), imported_at="20250201T000000000000Z")
+    assert queue.drain(timeout=5)
+
+    assert (first["added"], second["changed"], second["added"]) == (2, 1, 0)
+    compared = history.compare(storage, "u1").set_index("name")
+    assert compared.loc["LDL", "delta"] == -10
+    assert compared.loc["HDL", "delta"] == 0
+
+
+def test_missing_history_is_empty():
+    storage = MemoryStorage()
+    assert history.latest(storage, "u1").empty
+    assert history.list_snapshots(storage, "u1") == []
+
+
+def test_storage_errors_are_not_treated_as_missing(tmp_path):
+    storage = BrokenStorage()
+    queue = UploadQueue(lambda: storage, journal_dir=str(tmp_path), base_delay=0.01)
+    with pytest.raises(StorageError):
+        history.record_import(storage, queue, "u1", panel(100))
+    assert queue.pending_ticket(history.latest_path("u1")) is None
@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from biosnap import issues
+from biosnap.storage import MemoryStorage, StorageError
+from biosnap.uploads import UploadQueue
+
+
+class FlakyStorage(MemoryStorage):
+    """Fails the next ``failures`` downloads of the issue index."""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 0
+
+    def download(self, path):
+        if path == issues.INDEX_PATH and self.failures:
+            self.failures -= 1
+            raise StorageError("connection reset")
+        return super().download(path)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    # Each test is a fresh process as far as this writer's segments go
+    monkeypatch.setattr(issues, "_segments", {})
+    monkeypatch.setattr(issues, "_written", {})
+    return FlakyStorage()
+
+
+def make_queue(storage, tmp_path, name="queue"):
+    return UploadQueue(lambda: storage, journal_dir=str(tmp_path / name), base_delay=0.01, max_attempts=2)
+
+
+def test_submit_list_resolve(storage, tmp_path):
+    queue = make_queue(storage, tmp_path)
+    first = issues.submit_issue("u1", "prenuvo", "name visible", document=b"pdf", page=2,
+                                storage=storage, upload_queue=queue)
+    second = issues.submit_issue("u2", "trudiagnostic", "age visible", storage=storage, upload_queue=queue)
+
+    # Listed before the uploads finish
+    listed = issues.list_issues(with_text=True, storage=storage, upload_queue=queue)
+    assert {issue["id"]: issue["text"] for issue in listed} == {first: "name visible", second: "age visible"}
+    assert [i["id"] for i in issues.list_issues(report_type="prenuvo", storage=storage, upload_queue=queue)] == [first]
+
+    assert issues.resolve([first, "unknown"], storage=storage, upload_queue=queue) == [first]
+    assert issues.resolve([first], storage=storage, upload_queue=queue) == []
+    assert queue.drain(timeout=5)
+    assert [i["id"] for i in issues.list_issues(storage=storage, upload_queue=queue)] == [second]
+    assert issues.summary(storage=storage, upload_queue=queue)["open"] == 1
+
+
+def test_failed_index_read_does_not_drop_reports(storage, tmp_path):
+    queue = make_queue(storage, tmp_path)
+    ids = [issues.submit_issue(f"u{i}", "prenuvo", "text", storage=storage, upload_queue=queue) for i in range(3)]
+    assert queue.drain(timeout=5)
+
+    storage.failures = 1
+    with pytest.raises(StorageError):
+        issues.submit_issue("u9", "prenuvo", "text", storage=storage, upload_queue=queue)
+    ids.append(issues.submit_issue("u9", "prenuvo", "text", storage=storage, upload_queue=queue))
+    assert queue.drain(timeout=5)
+    assert sorted(i["id"] for i in issues.list_issues(storage=storage, upload_queue=queue)) == sorted(ids)
+
+
+def test_replicas_write_separate_segments(storage, tmp_path, monkeypatch):
+    replica_a = make_queue(storage, tmp_path, "a")
+    replica_b = make_queue(storage, tmp_path, "b")
+    monkeypatch.setattr(issues, "WRITER", "a")
+    a = issues.submit_issue("u1", "prenuvo", "a", storage=storage, upload_queue=replica_a)
+    assert replica_a.drain(timeout=5)
+    stale = storage.download(issues.INDEX_PATH)
+    monkeypatch.setattr(issues, "WRITER", "b")
+    b = issues.submit_issue("u2", "prenuvo", "b", storage=storage, upload_queue=replica_b)
+    assert replica_b.drain(timeout=5)
+
+    day = issues._today()
+    assert sorted(e["name"] for e in storage.list(f"{issues.LOG_PREFIX}/{day}")) == ["a.jsonl", "b.jsonl"]
+
+    # A write that raced with b's wins: b is missing until b writes again or the index is rebuilt
+    storage.upload(issues.INDEX_PATH, stale)
+    assert [i["id"] for i in issues.list_issues(storage=storage, upload_queue=replica_b)] == [a]
+    c = issues.submit_issue("u3", "prenuvo", "c", storage=storage, upload_queue=replica_b)
+    assert replica_b.drain(timeout=5)
+    assert sorted(i["id"] for i in issues.list_issues(storage=storage, upload_queue=replica_a)) == sorted([a, b, c])
+
+    storage.remove([issues.INDEX_PATH])
+    assert issues.rebuild_index(storage=storage, upload_queue=replica_a) == 3
+    assert issues.summary(storage=storage, upload_queue=replica_a)["by_user"] == {"u1": 1, "u2": 1, "u3": 1}
+
+
+def test_compact_folds_finished_days(storage, tmp_path, monkeypatch):
+    queue = make_queue(storage, tmp_path)
+    monkeypatch.setattr(issues, "_now", lambda: datetime(2025, 1, 1, 12, tzinfo=timezone.utc))
+    for writer in ("a", "b"):
+        monkeypatch.setattr(issues, "WRITER", writer)
+        first = issues.submit_issue("u1", "prenuvo", f"from {writer}", storage=storage, upload_queue=queue)
+    issues.resolve([first], storage=storage, upload_queue=queue)
+    assert queue.drain(timeout=5)
+
+    with pytest.raises(ValueError):
+        issues.compact("2025-01-01", storage=storage, upload_queue=queue)
+    monkeypatch.setattr(issues, "_now", lambda: datetime(2025, 1, 5, tzinfo=timezone.utc))
+    assert issues.compact("2025-01-01", storage=storage, upload_queue=queue) == 3
+    assert storage.list(f"{issues.LOG_PREFIX}/2025-01-01") == []
+
+    listed = issues.list_issues(with_text=True, storage=storage, upload_queue=queue)
+    assert [i["text"] for i in listed] == ["from a"]
+    storage.remove([issues.INDEX_PATH])
+    assert issues.rebuild_index(storage=storage, upload_queue=queue) == 2
+    assert issues.summary(storage=storage, upload_queue=queue)["open"] == 1
+
+
+def test_migrating_twice_imports_once(storage, tmp_path):
+    queue = make_queue(storage, tmp_path)
+    storage.upload("GLC1/issues/issue_2024-05-01_10-00-00-000000.txt", b"name visible")
+    storage.upload("GLC1/issues/issue_2024-05-02_10-00-00-000000.txt", b"age visible")
+
+    assert issues.migrate_legacy(storage=storage, upload_queue=queue) == 2
+    assert issues.migrate_legacy(storage=storage, upload_queue=queue) == 0
+    assert queue.drain(timeout=5)
+    listed = issues.list_issues(with_text=True, storage=storage, upload_queue=queue)
+    assert [(i["day"], i["text"]) for i in listed] == [("2024-05-02", "age visible"), ("2024-05-01", "name visible")]
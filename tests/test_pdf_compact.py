@@ -0,0 +1,50 @@
+import random
+
+import fitz
+
+from biosnap import pdf_compact
+
+
+def pdf_with_image(pixels=1200, inches=2):
+    rng = random.Random(0)
+    samples = bytes(rng.randrange(256) for _ in range(pixels * pixels * 3))
+    image = fitz.Pixmap(fitz.csRGB, pixels, pixels, samples, False)
+    doc = fitz.open()
+    for _ in range(2):
+        page = doc.new_page()
+        page.insert_text((72, 72), "Patient: Jane Example")
+        page.insert_image(fitz.Rect(72, 100, 72 + inches * 72, 100 + inches * 72), pixmap=image)
+    return doc.tobytes()
+
+
+def image_widths(data):
+    doc = fitz.open(stream=data, filetype="pdf")
+    return [image[2] for page in doc for image in page.get_images(full=True)]
+
+
+def test_compact_without_downsampling_keeps_images():
+    data = pdf_with_image(pixels=200)
+    compacted, report = pdf_compact.compact_bytes(data, "test", image_dpi=0)
+    assert image_widths(compacted) == image_widths(data)
+    assert report["before_bytes"] == len(data) and report["after_bytes"] == len(compacted)
+    assert "Jane Example" in fitz.open(stream=compacted, filetype="pdf")[0].get_text()
+
+
+def test_downsamples_images_above_target_dpi():
+    data = pdf_with_image()  # 600 dpi
+    compacted, report = pdf_compact.compact_bytes(data, "test", image_dpi=150)
+    assert all(width == 300 for width in image_widths(compacted))
+    assert report["saved_bytes"] > 0 and report["reduction"] > 0.5
+
+
+def test_images_near_target_are_left_alone():
+    doc = fitz.open(stream=pdf_with_image(pixels=310), filetype="pdf")  # 155 dpi
+    assert pdf_compact._downsample(doc, 150) == 0
+
+
+def test_save_compact_writes_file(tmp_path):
+    doc = fitz.open(stream=pdf_with_image(), filetype="pdf")
+    output = tmp_path / "out.pdf"
+    report = pdf_compact.save_compact(doc, str(output), 1000, "test", image_dpi=100)
+    assert report["after_bytes"] == output.stat().st_size
+    assert image_widths(output.read_bytes()) == [200, 200]
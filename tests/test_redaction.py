@@ -0,0 +1,72 @@
+import re
+
+import fitz
+
+from biosnap import redaction
+
+
+def make_pdf(path, pages):
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        y = 72
+        for line in lines:
+            page.insert_text((72, y), line)
+            y += 20
+    doc.save(str(path))
+
+
+def test_name_pattern_stays_on_one_line():
+    match = re.search(rf"Patient:\s+({redaction.NAME_PATTERN})", "Patient: Jane Example Doe\nDate of Birth: x")
+    assert match.group(1) == "Jane Example Doe"
+
+
+def test_prenuvo_redaction_flags_leftover_name_tokens(tmp_path):
+    source, output = tmp_path / "in.pdf", tmp_path / "out.pdf"
+    make_pdf(source, [
+        ["Patient: Jane Example Doe", "Date of Birth: 1980-01-02", "Findings are unremarkable."],
+        ["No acute findings."],
+        ["Discussed with Ms. Doe at follow-up."],
+    ])
+
+    report = redaction.redact_prenuvo_pdf(str(source), str(output))
+
+    text = fitz.open(str(output))[0].get_text()
+    assert "Jane" not in text and "1980-01-02" not in text
+    assert report["pages"] == 3
+    assert report["flagged"] == [3]
+    assert report["hits"][3] == [{"rule": "patient name", "text": "Doe"}]
+
+
+def test_verify_matches_name_tokens_case_insensitively(tmp_path):
+    path = tmp_path / "doc.pdf"
+    make_pdf(path, [["JANE was here"], ["nothing"], ["signed j. doe"]])
+
+    report = redaction.verify_redaction(str(path), rules=[], names=["Jane J Doe", None])
+
+    assert report["flagged"] == [1, 3]
+    assert report["hits"][1] == [{"rule": "patient name", "text": "JANE"}]
+
+
+def test_verify_clean_document_has_no_flags(tmp_path):
+    path = tmp_path / "doc.pdf"
+    make_pdf(path, [["Results within normal limits."]])
+    report = redaction.verify_redaction(str(path), rules=redaction.PRENUVO_RULES, names=["Jane Doe"])
+    assert report == {"pages": 1, "flagged": [], "hits": {}}
+
+
+def test_shared_cache_keeps_the_report_but_not_the_matched_text(tmp_path):
+    from biosnap.cache import MemoryCache, set_cache
+
+    shared = set_cache(MemoryCache())
+    source = tmp_path / "in.pdf"
+    make_pdf(source, [["Patient: Jane Example Doe"], ["Discussed with Ms. Doe at follow-up."]])
+    data = source.read_bytes()
+
+    pdf, report = redaction.redact_pdf_bytes("prenuvo", data)
+    assert report["hits"][2] == [{"rule": "patient name", "text": "Doe"}]
+    assert not any(b"Doe" in value for value, _ in shared._items.values())
+
+    cached_pdf, cached = redaction.redact_pdf_bytes("prenuvo", data)
+    assert cached_pdf == pdf
+    assert cached["flagged"] == [2] and cached["hits"][2] == [{"rule": "patient name"}]
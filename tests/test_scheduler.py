@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from biosnap.scheduler import DEFAULT_SCRAPE_SECONDS, BrowserScheduler, SchedulerBusy
+
+
+def hold(scheduler, started, release, on_wait=None):
+    """Thread that takes a slot, sets ``started`` and keeps it until ``release``."""
+    def run():
+        with scheduler.slot(on_wait):
+            started.set()
+            release.wait(5)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_limits_browsers_and_reports_positions():
+    scheduler = BrowserScheduler(max_browsers=1, max_queue=5, queue_timeout=5)
+    first_started, first_release = threading.Event(), threading.Event()
+    first = hold(scheduler, first_started, first_release)
+    assert first_started.wait(5)
+
+    positions = []
+    second_started, second_release = threading.Event(), threading.Event()
+    second = hold(scheduler, second_started, second_release,
+                  on_wait=lambda position, wait: positions.append((position, wait)))
+    wait_for(lambda: positions)
+    assert not second_started.is_set()
+    assert scheduler.stats() == {"active": 1, "waiting": 1, "max_browsers": 1}
+    assert positions == [(1, DEFAULT_SCRAPE_SECONDS)]
+
+    first_release.set()
+    assert second_started.wait(5)
+    second_release.set()
+    first.join(5)
+    second.join(5)
+    assert scheduler.stats() == {"active": 0, "waiting": 0, "max_browsers": 1}
+
+
+def test_estimated_wait_counts_rounds_of_browsers():
+    scheduler = BrowserScheduler(max_browsers=2)
+    assert scheduler.estimated_wait(1) == DEFAULT_SCRAPE_SECONDS
+    assert scheduler.estimated_wait(3) == 2 * DEFAULT_SCRAPE_SECONDS
+
+
+def test_full_queue_is_rejected():
+    scheduler = BrowserScheduler(max_browsers=1, max_queue=1, queue_timeout=5)
+    started, release = threading.Event(), threading.Event()
+    holder = hold(scheduler, started, release)
+    assert started.wait(5)
+    waiter = hold(scheduler, threading.Event(), release)
+    wait_for(lambda: scheduler.stats()["waiting"] == 1)
+
+    with pytest.raises(SchedulerBusy):
+        with scheduler.slot():
+            pass
+    release.set()
+    holder.join(5)
+    waiter.join(5)
+
+
+def test_waiting_too_long_gives_up_its_place():
+    scheduler = BrowserScheduler(max_browsers=1, max_queue=5, queue_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+    holder = hold(scheduler, started, release)
+    assert started.wait(5)
+
+    with pytest.raises(SchedulerBusy):
+        with scheduler.slot():
+            pass
+    assert scheduler.stats()["waiting"] == 0
+    release.set()
+    holder.join(5)
@@ -0,0 +1,39 @@
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from biosnap import scraper
+from biosnap.timeouts import CircuitBreaker, SourceUnavailable
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    monkeypatch.setattr(scraper, "get_circuit_breaker", lambda: breaker)
+    return breaker
+
+
+def failing_with(monkeypatch, error):
+    def scrape(email, password, progress):
+        raise error
+    monkeypatch.setattr(scraper, "_scrape_function_health", scrape)
+
+
+@pytest.mark.parametrize("error", [
+    scraper.BrowserLaunchFailed("chromedriver missing"),
+    ValueError("Login failed"),
+])
+def test_local_and_credential_errors_do_not_open_the_breaker(breaker, monkeypatch, error):
+    failing_with(monkeypatch, error)
+    with pytest.raises(type(error)):
+        scraper.scrape_function_health("a@example.com", "pw")
+    assert breaker.state == "closed"
+
+
+def test_site_timeouts_open_the_breaker(breaker, monkeypatch):
+    failing_with(monkeypatch, TimeoutException("biomarkers never loaded"))
+    with pytest.raises(TimeoutException):
+        scraper.scrape_function_health("a@example.com", "pw")
+    assert breaker.state == "open"
+
+    with pytest.raises(SourceUnavailable):
+        scraper.scrape_function_health("a@example.com", "pw")
@@ -0,0 +1,64 @@
+import gc
+import os
+
+from biosnap.session_data import SessionDataStore
+
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault("session_budget", 100)
+    kwargs.setdefault("global_budget", 1000)
+    kwargs.setdefault("idle_seconds", 300)
+    return SessionDataStore(spill_dir=str(tmp_path), **kwargs)
+
+
+def test_identical_bytes_are_kept_once(tmp_path):
+    store = make_store(tmp_path)
+    first = store.put(b"x" * 10, "s1")
+    second = store.put(b"x" * 10, "s1")
+    assert first.value is second.value
+    assert store.usage()["sessions"]["s1"]["payloads"] == 1
+
+
+def test_session_budget_spills_least_recently_used(tmp_path):
+    store = make_store(tmp_path)
+    older = store.put(b"a" * 80, "s1")
+    newer = store.put(b"b" * 80, "s1")
+    usage = store.usage()
+    assert (usage["resident_bytes"], usage["spilled_bytes"]) == (80, 80)
+    assert os.listdir(tmp_path) == [f"{older._key}.pkl"]
+
+    # Reading the spilled payload brings it back and spills the other one
+    assert older.value == b"a" * 80
+    assert os.listdir(tmp_path) == [f"{newer._key}.pkl"]
+    assert newer.value == b"b" * 80
+
+
+def test_global_budget_spills_the_least_recently_active_session(tmp_path):
+    store = make_store(tmp_path, global_budget=100)
+    idle = store.put(b"a" * 80, "s1")
+    busy = store.put(b"b" * 80, "s2")
+    sessions = store.usage()["sessions"]
+    assert sessions["s1"]["spilled_bytes"] == 80 and sessions["s2"]["resident_bytes"] == 80
+    assert idle.value == b"a" * 80 and busy.value == b"b" * 80
+
+
+def test_idle_sessions_are_spilled_and_restored(tmp_path):
+    store = make_store(tmp_path, idle_seconds=0)
+    frame = {"rows": list(range(10))}
+    handle = store.put(frame, "s1")
+    store.spill_idle()
+    assert store.usage()["resident_bytes"] == 0
+    assert handle.value == frame
+    assert os.listdir(tmp_path) == []
+
+
+def test_dropped_handles_free_memory_and_spill_files(tmp_path):
+    store = make_store(tmp_path, idle_seconds=0)
+    handle = store.put(b"a" * 50, "s1")
+    store.spill_idle()
+    assert os.listdir(tmp_path)
+
+    del handle
+    gc.collect()
+    assert store.usage()["sessions"] == {}
+    assert os.listdir(tmp_path) == []
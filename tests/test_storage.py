@@ -0,0 +1,66 @@
+import pytest
+
+from biosnap.storage import MemoryStorage, ObjectNotFound, StorageError, SupabaseStorage, object_etag
+from biosnap.uploads import UploadQueue
+
+
+class StrictBucket:
+    """storage3 < 0.7 behaviour: a second upload to a path is a duplicate unless x-upsert is set."""
+
+    id = "data"
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload(self, path, file, file_options=None):
+        options = file_options or {}
+        if path in self.objects and options.get("x-upsert", "false") != "true":
+            raise RuntimeError("The resource already exists (Duplicate)")
+        self.objects[path] = file
+        return type("Response", (), {})()
+
+    def download(self, path):
+        if path not in self.objects:
+            raise RuntimeError("Object not found")
+        return self.objects[path]
+
+
+def test_supabase_upload_overwrites_existing_object():
+    bucket = StrictBucket()
+    storage = SupabaseStorage(bucket)
+    storage.upload("u1/latest.parquet", b"one", "application/octet-stream")
+    storage.upload("u1/latest.parquet", b"two", "application/octet-stream")
+    assert storage.download("u1/latest.parquet") == b"two"
+
+
+def test_upload_queue_replaces_through_supabase(tmp_path):
+    storage = SupabaseStorage(StrictBucket())
+    queue = UploadQueue(lambda: storage, journal_dir=str(tmp_path), base_delay=0.01, max_attempts=1)
+    for payload in (b"one", b"two"):
+        ticket = queue.submit("_issues/index.json", payload, "application/json")
+        assert queue.drain(timeout=5)
+        assert queue.status(ticket) == "saved"
+    assert storage.download("_issues/index.json") == b"two"
+
+
+def test_supabase_download_missing_is_not_found():
+    with pytest.raises(ObjectNotFound):
+        SupabaseStorage(StrictBucket()).download("nope")
+
+
+def test_memory_storage_roundtrip():
+    storage = MemoryStorage()
+    storage.upload("u1/a.csv", b"x", "text/csv")
+    assert [entry["name"] for entry in storage.list("u1")] == ["a.csv"]
+    storage.remove(["u1/a.csv"])
+    with pytest.raises((ObjectNotFound, StorageError)):
+        storage.download("u1/a.csv")
+
+
+def test_object_etag_prefers_etag_over_timestamp():
+    storage = MemoryStorage()
+    storage.upload("u1/a.csv", b"x", "text/csv")
+    entry = storage.list("u1")[0]
+    assert object_etag(entry) == entry["metadata"]["eTag"]
+    assert object_etag({"metadata": {"eTag": '"abc"'}}) == "abc"
+    assert object_etag({"metadata": None, "updated_at": "2025-01-01T00:00:00Z"}) == "2025-01-01T00:00:00Z"
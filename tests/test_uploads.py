@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+
+import pytest
+
+from biosnap.storage import MemoryStorage, ObjectNotFound, StorageError
+from biosnap.uploads import CANCELLED, FAILED, LOCK_NAME, SAVED, SAVING, SUPERSEDED, UploadQueue
+
+
+class GatedStorage(MemoryStorage):
+    """Uploads block until ``gate`` is set; ``fail`` makes them raise."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = False
+        self.uploads = []
+
+    def upload(self, path, data, content_type="application/octet-stream"):
+        self.uploads.append(path)
+        self.gate.wait(5)
+        if self.fail:
+            raise StorageError("unavailable")
+        super().upload(path, data, content_type)
+
+
+@pytest.fixture
+def storage():
+    return GatedStorage()
+
+
+def make_queue(storage, tmp_path, **kwargs):
+    kwargs.setdefault("base_delay", 0.01)
+    kwargs.setdefault("max_attempts", 2)
+    return UploadQueue(lambda: storage, journal_dir=str(tmp_path), **kwargs)
+
+
+def journaled(queue):
+    return sorted(name for name in os.listdir(queue._journal_dir) if name != LOCK_NAME)
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_saves_and_notifies_listeners(storage, tmp_path):
+    queue = make_queue(storage, tmp_path)
+    seen = []
+    queue.add_listener(lambda path, data: seen.append((path, data)))
+    ticket = queue.submit("u1/a.csv", b"data", "text/csv")
+    assert queue.drain(timeout=5)
+    assert queue.status(ticket) == SAVED
+    assert storage.download("u1/a.csv") == b"data"
+    assert journaled(queue) == []
+    wait_for(lambda: seen)
+    assert seen == [("u1/a.csv", b"data")]
+
+
+def test_pending_data_and_supersede(storage, tmp_path):
+    storage.gate.clear()
+    queue = make_queue(storage, tmp_path, workers=1)
+    queue.submit("u1/other.csv", b"x")  # occupies the only worker
+    old = queue.submit("u1/a.csv", b"one")
+    new = queue.submit("u1/a.csv", b"two")
+    assert queue.pending_ticket("u1/a.csv") == new
+    assert queue.pending_data("u1/a.csv") == b"two"
+
+    storage.gate.set()
+    assert queue.drain(timeout=5)
+    assert queue.status(old) == SUPERSEDED and queue.status(new) == SAVED
+    assert storage.download("u1/a.csv") == b"two"
+    assert storage.uploads.count("u1/a.csv") == 1
+
+
+def test_cancel_during_upload_is_final(storage, tmp_path):
+    queue = make_queue(storage, tmp_path)
+    seen = []
+    queue.add_listener(lambda path, data: seen.append(path))
+    storage.gate.clear()
+    ticket = queue.submit("u1/biostarks.csv", b"data", "text/csv")
+    wait_for(lambda: queue.status(ticket) == SAVING and storage.uploads)
+
+    cancelled = threading.Thread(target=queue.cancel, args=("u1/biostarks.csv",))
+    cancelled.start()
+    time.sleep(0.05)
+    assert cancelled.is_alive()  # waits for the upload in flight
+    storage.gate.set()
+    cancelled.join(5)
+    storage.remove(["u1/biostarks.csv"])
+
+    assert queue.drain(timeout=5)
+    assert queue.status(ticket) == CANCELLED
+    with pytest.raises(ObjectNotFound):
+        storage.download("u1/biostarks.csv")
+    assert seen == []
+
+
+def test_failed_upload_can_be_retried(storage, tmp_path):
+    storage.fail = True
+    queue = make_queue(storage, tmp_path)
+    ticket = queue.submit("u1/a.csv", b"data")
+    assert queue.drain(timeout=5)
+    assert queue.status(ticket) == FAILED and "unavailable" in queue.error(ticket)
+
+    storage.fail = False
+    assert queue.retry(ticket)
+    assert queue.drain(timeout=5)
+    assert queue.status(ticket) == SAVED
+
+
+def test_journal_is_replayed_once_its_process_is_gone(storage, tmp_path):
+    storage.fail = True
+    first = make_queue(storage, tmp_path, max_attempts=1)
+    first.submit("u1/a.csv", b"data")
+    assert first.drain(timeout=5)
+    storage.fail = False
+
+    # A second process leaves a live process's journal alone
+    second = make_queue(storage, tmp_path)
+    assert second.drain(timeout=5)
+    with pytest.raises(ObjectNotFound):
+        storage.download("u1/a.csv")
+    assert len(journaled(first)) == 2
+
+    first.close()
+    third = make_queue(storage, tmp_path)
+    assert third.drain(timeout=5)
+    assert storage.download("u1/a.csv") == b"data"
+    assert journaled(third) == []
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(q._journal_dir) for q in (second, third))
+
+
+def test_finished_tickets_are_pruned(storage, tmp_path):
+    queue = make_queue(storage, tmp_path, retain=0)
+    first = queue.submit("u1/a.csv", b"data")
+    assert queue.drain(timeout=5)
+    storage.fail = True
+    failed = queue.submit("u2/b.csv", b"data")
+    assert queue.drain(timeout=5)
+    storage.fail = False
+    queue.submit("u3/c.csv", b"data")
+    assert queue.drain(timeout=5)
+
+    assert queue.status(first) is None
+    assert queue.status(failed) == FAILED
+    assert set(queue._path_locks) <= {"u2/b.csv", "u3/c.csv"}
+    assert "u1/a.csv" not in queue._latest